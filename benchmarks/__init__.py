@@ -0,0 +1,57 @@
+"""Performance benchmarks. Run from the project root, e.g.
+
+    python -m benchmarks.bench_db_analytics
+
+Benchmarks that touch the database use whatever DJANGO_SETTINGS_MODULE points
+at (finwise.settings by default), so point them at a scratch database. Their
+users and history come from seeded() (core/seeding.py, the same loader as
+manage.py seed_benchmark_data) and are deleted again when the benchmark ends.
+"""
+import contextlib
+import os
+import sys
+import time
+import statistics
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finwise.settings')
+    import django
+    django.setup()
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Run fn repeatedly; return (best, median) wall time in seconds"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:9.2f} ms"
+
+
+@contextlib.contextmanager
+def seeded(prefix, users=1, transactions=0, months=1, **options):
+    """Yield `users` fresh User objects, each with `transactions` spread over the last
+    `months` months (see core.seeding.seed for the other options); deleted on exit"""
+    from django.contrib.auth.models import User
+    from core.seeding import drop_users, seed, seed_users
+    leftovers = list(User.objects.filter(username__startswith=f"{prefix}_").values_list('pk', flat=True))
+    if leftovers:  # From an interrupted run
+        drop_users(leftovers)
+    user_ids = seed_users(prefix, users)
+    try:
+        seed(user_ids, transactions, months, **options)
+        yield list(User.objects.filter(pk__in=user_ids).order_by('pk'))
+    finally:
+        drop_users(user_ids)
@@ -0,0 +1,87 @@
+"""Hot-table latency and size before and after archiving old transactions.
+
+Seeds --count transactions spread over --users users and --months months of
+history, times the hot-path queries, archives everything older than --keep
+months (core/archive.py), and times them again. Also reports the Transaction
+table's size (table + indexes; after VACUUM FULL on PostgreSQL) and the
+compressed segments, and the full-history aggregate before (one table) and
+after (summaries + hot rows).
+
+    python -m benchmarks.bench_archive --count 2000000 --users 20 --months 36 --keep 3
+"""
+import argparse
+import time
+from benchmarks import setup_django, measure, fmt_ms, seeded
+
+
+def table_bytes():
+    from django.db import connection
+    from core.models import Transaction
+    table = Transaction._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"VACUUM FULL ANALYZE {table}")  # DELETE alone gives no space back
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                           "(SELECT name FROM sqlite_master WHERE tbl_name = %s)", [table])
+        else:
+            return None
+        return cursor.fetchone()[0]
+
+
+def fmt_mb(size):
+    return f"{size / 1e6:8.1f} MB" if size is not None else "       n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--months', type=int, default=36, help="Months of history per user")
+    parser.add_argument('--keep', type=int, default=3, help="Months kept hot before the current one")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from core import archive
+    from core.analytics import _month_bounds, spending_by_category
+    from core.models import ArchivedMonth, Transaction
+
+    with seeded('bench_archive', args.users, args.count // args.users, args.months) as users:
+        user = users[0]
+        month = _month_bounds()
+        recent = _month_bounds(archive.horizon(args.keep))[0]
+        queries = [
+            ('this month by category', lambda: spending_by_category(user.pk, *month)),
+            (f'last {args.keep + 1} months by cat.', lambda: spending_by_category(user.pk, recent)),
+            ('latest 50 transactions', lambda: list(Transaction.objects.filter(user=user)
+                                                   .order_by('-created_at')[:50])),
+            ('table row count', lambda: Transaction.objects.count()),
+        ]
+
+        def report(label):
+            print(f"{label}: {Transaction.objects.count():,} hot rows, table {fmt_mb(table_bytes())}")
+            for name, fn in queries:
+                best, median = measure(fn, repeat=args.repeat)
+                print(f"  {name:>28}: best {fmt_ms(best)}  median {fmt_ms(median)}")
+
+        report("Before")
+        before = measure(lambda: spending_by_category(user.pk), repeat=3)
+        months = archive.archivable_months(args.keep, [u.pk for u in users])
+        moved = 0
+        started = time.perf_counter()
+        for user_id, period in months:
+            moved += archive.archive_month(user_id, period)
+        seconds = time.perf_counter() - started
+        segments = sum(ArchivedMonth.objects.filter(user__in=users).values_list('file_bytes', flat=True))
+        print(f"Archived {moved:,} rows into {len(months)} segments ({fmt_mb(segments).strip()}) "
+              f"in {seconds:.1f}s")
+        report("After")
+        after = measure(lambda: archive.spending_by_category(user.pk), repeat=3)
+        print(f"  {'full history by category':>28}: {fmt_ms(before[1])} from the table, "
+              f"{fmt_ms(after[1])} merged (medians)")
+
+
+if __name__ == "__main__":
+    main()
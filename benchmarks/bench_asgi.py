@@ -0,0 +1,149 @@
+"""Throughput under many concurrent clients: WSGI + sync views vs ASGI + async views.
+
+Starts the project under gunicorn (gthread workers) and under uvicorn with the
+same number of worker processes, then drives each endpoint with --clients
+concurrent keep-alive clients for --seconds, and reports requests/sec, p50/p99
+latency and errors. The sync views under ASGI are included for contrast: Django
+runs them one at a time on a single thread per worker, whereas the async
+variants only hand CPU work to their thread pool.
+
+    python -m benchmarks.bench_asgi --clients 128 --seconds 10 --workers 2
+
+Uses DJANGO_SETTINGS_MODULE's database as is (seed it with manage.py seed_benchmark_data
+for the database paths) and the static market data source unless
+FINWISE_MARKET_SOURCE is set. Needs gunicorn, uvicorn (preferably
+uvicorn[standard], for uvloop and httptools) and httpx installed. The load
+generator shares the machine with the servers, so give it spare cores.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import time
+from benchmarks import PROJECT_ROOT
+
+# name -> (method, sync path, async path, form body)
+ENDPOINTS = {
+    'investment': ('GET', '/core/api/investment/', '/core/api/async/investment/', None),
+    'chatbot': ('POST', '/core/api/chatbot/', '/core/api/async/chatbot/', {'query': 'how much did i spend on food'}),
+    'report': ('GET', '/core/api/report/', '/core/api/async/report/', None),
+}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port, workers, threads, env):
+    if kind == 'wsgi':
+        command = ['gunicorn', 'finwise.wsgi:application', '-k', 'gthread', '-w', str(workers),
+                   '--threads', str(threads), '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    else:
+        command = ['uvicorn', 'finwise.asgi:application', '--workers', str(workers), '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    server = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"{kind} server exited: {server.stderr.read().decode()[-2000:]}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"{kind} server did not start")
+
+
+async def drive(base_url, method, path, body, clients, seconds):
+    """Closed-loop load: each client sends its next request as soon as the last one returns"""
+    import httpx
+
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Warm every worker's caches and models before timing
+        await asyncio.gather(*(client.request(method, path, data=body) for _ in range(clients)),
+                             return_exceptions=True)
+        stop = time.perf_counter() + seconds
+
+        async def one_client():
+            nonlocal errors
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, data=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_client() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else float('nan'),
+        'p99': latencies[int(len(latencies) * 0.99)] if latencies else float('nan'),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=128)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help="Server processes, for both servers")
+    parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker")
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    args = parser.parse_args()
+
+    missing = [tool for tool in ('gunicorn', 'uvicorn') if shutil.which(tool) is None]
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        missing.append('httpx')
+    if missing:
+        raise SystemExit(f"Not installed: {', '.join(missing)}")
+
+    env = {**os.environ, 'FINWISE_WARMUP': os.environ.get('FINWISE_WARMUP', '')}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'finwise.settings')
+    env.setdefault('FINWISE_MARKET_SOURCE', 'static')
+    names = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(names) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    print(f"{args.clients} clients, {args.seconds:g} s per run, {args.workers} workers "
+          f"(gunicorn: {args.threads} threads each)")
+    print(f"{'endpoint':<12}{'server':<20}{'req/s':>9}{'p50':>11}{'p99':>11}{'errors':>8}")
+    # server -> (label, use the async view)
+    runs = {'wsgi': [('WSGI sync views', False)], 'asgi': [('ASGI sync views', False), ('ASGI async views', True)]}
+    for kind, views in runs.items():
+        port = _free_port()
+        server = start_server(kind, port, args.workers, args.threads, env)
+        try:
+            for name in names:
+                method, sync_path, async_path, body = ENDPOINTS[name]
+                for label, use_async in views:
+                    path = async_path if use_async else sync_path
+                    result = asyncio.run(drive(f'http://127.0.0.1:{port}', method, path, body,
+                                               args.clients, args.seconds))
+                    print(f"{name:<12}{label:<20}{result['rps']:9.1f}{result['p50'] * 1000:9.1f}ms"
+                          f"{result['p99'] * 1000:9.1f}ms{result['errors']:8d}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Chatbot latency per intent, cold (empty facts cache) and warm (within the TTL).
+
+Tips and help answers should not touch analytics at all; spending/savings pay
+for one analytics run when cold; investment questions include market data.
+
+    python -m benchmarks.bench_chatbot_intents --user-id 1
+"""
+import argparse
+from benchmarks import setup_django, measure, fmt_ms
+
+QUERIES = {
+    'tips': "Give me some advice",
+    'help': "Hello there",
+    'spending': "How much did I spend on food?",
+    'savings': "What is my potential savings?",
+    'inflation': "What about inflation next year?",
+    'investment': "Where should I invest?",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--user-id', type=int, default=None, help="Database user (default: anonymous CSV path)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-network', action='store_true', help="Leave out the investment intent")
+    args = parser.parse_args()
+
+    setup_django()
+    from ml.chatbot import chatbot_query, classify_intent, clear_fact_cache
+
+    for intent, query in QUERIES.items():
+        if args.skip_network and intent == 'investment':
+            continue
+        assert classify_intent(query) == intent, (query, classify_intent(query))
+
+        def cold():
+            clear_fact_cache()
+            chatbot_query(query, args.user_id)
+
+        cold_times = measure(cold, repeat=args.repeat)
+        warm_times = measure(lambda: chatbot_query(query, args.user_id), repeat=args.repeat)
+        print(f"{intent:<11} cold: median {fmt_ms(cold_times[1])}   warm: median {fmt_ms(warm_times[1])}")
+
+
+if __name__ == "__main__":
+    main()
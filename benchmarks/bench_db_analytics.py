@@ -0,0 +1,36 @@
+"""Latency of the DB-backed analytics engine vs. the data.csv row lookup.
+
+    python -m benchmarks.bench_db_analytics --sizes 1000 100000 1000000
+"""
+import argparse
+from benchmarks import setup_django, measure, fmt_ms, seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from core.analytics import spending_by_category, transaction_analytics, _month_bounds
+    from ml.analytics import csv_analytics
+
+    start, end = _month_bounds()
+
+    try:
+        best, median = measure(csv_analytics, repeat=args.repeat)
+        print(f"{'csv row lookup':>24}: best {fmt_ms(best)}  median {fmt_ms(median)}")
+    except FileNotFoundError:
+        print("data.csv not found; skipping the CSV baseline")
+
+    for size in args.sizes:
+        with seeded(f'bench_analytics_{size}', transactions=size, counters=False) as (user,):
+            agg = measure(lambda: spending_by_category(user.pk, start, end), repeat=args.repeat)
+            full = measure(lambda: transaction_analytics(user.pk), repeat=args.repeat)
+            print(f"{size:>10,} txs aggregate: best {fmt_ms(agg[0])}  median {fmt_ms(agg[1])}")
+            print(f"{size:>10,} txs  analytics: best {fmt_ms(full[0])}  median {fmt_ms(full[1])}  (incl. chart)")
+
+
+if __name__ == "__main__":
+    main()
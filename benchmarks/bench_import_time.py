@@ -0,0 +1,74 @@
+"""Start-up import cost of the Django app, from `python -X importtime`.
+
+Imports Django plus core.views (what every worker and manage.py command pays)
+in a fresh interpreter, lists the slowest modules, and fails if any of the
+heavy optional libraries got imported or the total exceeds the budget.
+
+    python -m benchmarks.bench_import_time --budget-ms 1500
+    python -m benchmarks.bench_import_time --warmup all   # Also time the warm-up tasks
+"""
+import argparse
+import os
+import subprocess
+import sys
+from benchmarks import PROJECT_ROOT
+
+TARGET = "import django; django.setup(); import core.views, core.urls"
+# Must only load inside the code paths that use them
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'cv2', 'pytesseract', 'matplotlib', 'reportlab',
+                 'xgboost', 'tensorflow', 'h5py']
+
+
+def import_times(env):
+    """{module: (self_us, cumulative_us, depth)} for one fresh interpreter"""
+    child = subprocess.run([sys.executable, '-X', 'importtime', '-c', TARGET],
+                           cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if child.returncode != 0:
+        raise SystemExit(child.stderr.strip()[-2000:])
+    times = {}
+    for line in child.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget-ms', type=float, default=1500, help="Fail above this total import time")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--warmup', help="Also run these FINWISE_WARMUP tasks and time them")
+    args = parser.parse_args()
+
+    env = {**os.environ, 'FINWISE_WARMUP': ''}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'finwise.settings')
+    times = import_times(env)
+    total_ms = sum(cumulative for _, cumulative, depth in times.values() if depth == 0) / 1000
+
+    print(f"Total import time: {total_ms:.0f} ms ({len(times)} modules)")
+    print("Slowest top-level imports (cumulative):")
+    top_level = sorted(((c, name) for name, (_, c, d) in times.items() if d <= 1), reverse=True)
+    for cumulative, name in top_level[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {name}")
+
+    failures = [f"heavy module imported at start-up: {name}" for name in HEAVY_MODULES if name in times]
+    if total_ms > args.budget_ms:
+        failures.append(f"total {total_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    if args.warmup:
+        from benchmarks import setup_django
+        setup_django()
+        from core import warmup
+        warmup.run(args.warmup)  # Prints its own per-task timings
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
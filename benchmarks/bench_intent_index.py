@@ -0,0 +1,81 @@
+"""Intent matching throughput and accuracy.
+
+Compares batched matching against one query at a time, and against the old
+approach of vectorizing the known queries again on every call. Accuracy is
+measured on held-out phrasings that are not in the example bank.
+
+    python -m benchmarks.bench_intent_index --batch 1000
+"""
+import argparse
+import time
+from benchmarks import fmt_ms
+
+# Held-out (query, expected intent) pairs
+LABELLED = [
+    ("How much did I spend on food last week?", 'spending'),
+    ("what did i spend last month", 'spending'),
+    ("show me my expenses", 'spending'),
+    ("how much went on eating out", 'spending'),
+    ("transport spending", 'spending'),
+    ("how much can I save?", 'savings'),
+    ("tell me my possible savings", 'savings'),
+    ("where could i cut my costs", 'savings'),
+    ("how do i reduce expenses", 'savings'),
+    ("will inflation hurt my budget", 'inflation'),
+    ("what will things cost next year", 'inflation'),
+    ("forecast my future spending", 'inflation'),
+    ("should I invest in bitcoin", 'investment'),
+    ("is gold a good investment", 'investment'),
+    ("where to invest my savings", 'investment'),
+    ("any budgeting tips?", 'tips'),
+    ("give me financial advice", 'tips'),
+    ("tips for managing money", 'tips'),
+    ("hi", 'help'),
+    ("what can you help with", 'help'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch', type=int, default=1000, help="Queries per batched match() call")
+    args = parser.parse_args()
+
+    from sklearn.metrics.pairwise import cosine_similarity
+    from ml.intent_index import IntentIndex, INTENT_EXAMPLES
+
+    start = time.perf_counter()
+    index = IntentIndex()
+    print(f"Index build ({sum(map(len, INTENT_EXAMPLES.values()))} examples): {fmt_ms(time.perf_counter() - start)}")
+
+    queries = [q for q, _ in LABELLED]
+    results = index.match(queries)
+    correct = sum(intent == expected for (intent, _), (_, expected) in zip(results, LABELLED))
+    print(f"Accuracy: {correct}/{len(LABELLED)} ({correct / len(LABELLED):.0%})")
+    for (query, expected), (intent, confidence) in zip(LABELLED, results):
+        if intent != expected:
+            print(f"  miss: {query!r} -> {intent} ({confidence:.2f}), expected {expected}")
+
+    batch = (queries * (args.batch // len(queries) + 1))[:args.batch]
+    start = time.perf_counter()
+    index.match(batch)
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in batch:
+        index.match_one(query)
+    single = time.perf_counter() - start
+
+    # The old chatbot_assistance path: re-vectorize the known queries for every call
+    known = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+    sample = batch[:max(1, len(batch) // 10)]
+    start = time.perf_counter()
+    for query in sample:
+        cosine_similarity(index.vectorizer.transform([query]), index.vectorizer.transform(known))
+    naive = (time.perf_counter() - start) * len(batch) / len(sample)
+
+    for name, seconds in [("batched match()", batched), ("match_one() loop", single), ("re-vectorize per call", naive)]:
+        print(f"{name:<22} {len(batch) / seconds:>12,.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
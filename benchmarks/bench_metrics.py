@@ -0,0 +1,109 @@
+"""Metrics registry cost: per-update overhead and multi-worker scrapes.
+
+Times counter and histogram updates with in-process storage and with the
+mmap'd files used under gunicorn (FINWISE_METRICS_DIR), each in a fresh
+interpreter. It then forks workers that update the shared files at the same
+time, checks that one scrape adds every worker's counts up exactly, and times
+that scrape.
+
+    python -m benchmarks.bench_metrics --workers 4 --updates 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks import PROJECT_ROOT, measure, fmt_ms
+
+OPS = 10000
+
+
+def run_mode(mode, workers, updates):
+    """Runs inside the child process (FINWISE_METRICS_DIR already set for 'mmap'); prints one JSON line"""
+    from core import metrics
+    counter = metrics.CACHE_REQUESTS.labels(cache='bench', result='hit')
+    histogram = metrics.REQUEST_SECONDS.labels(view='bench', method='GET', status=200)
+
+    def counter_ops():
+        for _ in range(OPS):
+            counter.inc()
+
+    def histogram_ops():
+        for i in range(OPS):
+            histogram.observe(i * 1e-6)
+
+    def labelled_ops():
+        for _ in range(OPS):
+            metrics.CACHE_REQUESTS.labels(cache='bench', result='hit').inc()
+
+    result = {name: measure(fn)[1] / OPS for name, fn in
+              [('inc', counter_ops), ('observe', histogram_ops), ('labels_inc', labelled_ops)]}
+
+    if mode == 'mmap':
+        pids = []
+        for _ in range(workers):
+            pid = os.fork()
+            if pid == 0:
+                child = metrics.CACHE_REQUESTS.labels(cache='bench', result='worker')
+                for _ in range(updates):
+                    child.inc()
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        start = time.perf_counter()
+        text = metrics.render()
+        result['scrape'] = time.perf_counter() - start
+        line = next(l for l in text.splitlines() if l.startswith('finwise_cache_requests_total{cache="bench",result="worker"}'))
+        result['merged'] = float(line.rsplit(' ', 1)[1])
+        result['expected'] = workers * updates
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--updates', type=int, default=100000, help="Counter increments per worker")
+    parser.add_argument('--mode', choices=['dict', 'mmap'], help=argparse.SUPPRESS)  # Child mode
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.workers, args.updates)
+        return
+
+    failures = []
+    for mode in ('dict', 'mmap'):
+        env = {**os.environ}
+        env.pop('FINWISE_METRICS_DIR', None)
+        directory = None
+        if mode == 'mmap':
+            directory = env['FINWISE_METRICS_DIR'] = tempfile.mkdtemp(prefix='finwise-metrics-')
+        try:
+            child = subprocess.run([sys.executable, '-m', 'benchmarks.bench_metrics', '--mode', mode,
+                                    '--workers', str(args.workers), '--updates', str(args.updates)],
+                                   cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+        finally:
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+        if child.returncode != 0:
+            raise SystemExit(child.stderr.strip()[-2000:])
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{mode:>5}: inc {result['inc'] * 1e9:6.0f} ns, observe {result['observe'] * 1e9:6.0f} ns, "
+              f"labels().inc {result['labels_inc'] * 1e9:6.0f} ns")
+        if mode == 'mmap':
+            print(f"       {args.workers} workers x {args.updates} increments -> scrape {fmt_ms(result['scrape'])}, "
+                  f"merged {result['merged']:.0f} (expected {result['expected']})")
+            if result['merged'] != result['expected']:
+                failures.append("multi-process counts do not add up")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
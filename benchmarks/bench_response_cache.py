@@ -0,0 +1,44 @@
+"""Cached read endpoints: full recompute vs. cache hit vs. 304 revalidation.
+
+Seeds a user with --transactions this month, then times each endpoint through
+the full middleware stack: a miss right after a version bump, a hit, and a
+conditional GET with the ETag the client already holds. The cache backend is
+whatever FINWISE_RESPONSE_CACHE names in the settings.
+
+    python -m benchmarks.bench_response_cache --transactions 100000
+"""
+import argparse
+from benchmarks import setup_django, measure, fmt_ms, seeded
+
+ENDPOINTS = ['/core/api/analytics/', '/core/api/inflation/', '/core/api/investment/']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import Client
+    from core.response_cache import bump_version
+
+    print(f"Cache: {settings.FINWISE_RESPONSE_CACHE or 'off'}")
+    with seeded('bench_response_cache', transactions=args.transactions) as (user,):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        for path in ENDPOINTS:
+            def miss():
+                bump_version(user.pk)
+                client.get(path)
+
+            etag = client.get(path).get('ETag')
+            hit = measure(lambda: client.get(path), repeat=args.repeat)
+            not_modified = measure(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), repeat=args.repeat)
+            cold = measure(miss, repeat=args.repeat)
+            print(f"{path:<24} miss {fmt_ms(cold[1])}  hit {fmt_ms(hit[1])}  304 {fmt_ms(not_modified[1])}  (medians)")
+
+
+if __name__ == "__main__":
+    main()
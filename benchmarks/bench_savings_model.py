@@ -0,0 +1,69 @@
+"""Savings model inference: pure NumPy vs. TensorFlow/Keras.
+
+Each backend runs in a fresh interpreter so import time and peak memory are
+measured in isolation, then reports latency for single and batched predictions.
+The TensorFlow side is skipped when TensorFlow is not installed.
+
+    python -m benchmarks.bench_savings_model --batch 1000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from benchmarks import PROJECT_ROOT, measure, fmt_ms
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run_backend(backend, batch, repeat):
+    """Runs inside the child process; prints one JSON line"""
+    start = time.perf_counter()
+    from ml.savings_model import get_model, load_keras_model
+    from ml.dataset import get_dataset
+    numpy_model = get_model()  # Feature scaling is shared, so both backends see identical inputs
+    ds = get_dataset()
+    X = numpy_model.features([ds.row(i % len(ds)) for i in range(batch)])
+    if backend == 'tf':
+        model = load_keras_model()
+        predict = lambda x: model.predict_on_batch(x)
+    else:
+        predict = numpy_model.predict
+    predict(X[:1])
+    load = time.perf_counter() - start
+
+    single = measure(lambda: predict(X[:1]), repeat=repeat * 10)
+    batched = measure(lambda: predict(X), repeat=repeat)
+    print(json.dumps({'load': load, 'single': single[1], 'batched': batched[1],
+                      'rss_mb': _rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--backend', choices=['numpy', 'tf'], help=argparse.SUPPRESS)  # Child mode
+    args = parser.parse_args()
+
+    if args.backend:
+        run_backend(args.backend, args.batch, args.repeat)
+        return
+
+    for backend in ('numpy', 'tf'):
+        child = subprocess.run([sys.executable, '-m', 'benchmarks.bench_savings_model', '--backend', backend,
+                                '--batch', str(args.batch), '--repeat', str(args.repeat)],
+                               cwd=PROJECT_ROOT, capture_output=True, text=True)
+        if child.returncode != 0:
+            reason = 'TensorFlow not installed' if 'No module named' in child.stderr else child.stderr.strip()[-300:]
+            print(f"{backend:<6} skipped: {reason}")
+            continue
+        r = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{backend:<6} import+load {fmt_ms(r['load'])}  single {fmt_ms(r['single'])}  "
+              f"batch of {args.batch} {fmt_ms(r['batched'])}  peak RSS {r['rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
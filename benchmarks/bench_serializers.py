@@ -0,0 +1,50 @@
+"""Serializing and rendering many transactions: ModelSerializer + JSONRenderer
+vs. the lean read serializers + FastJSONRenderer.
+
+Seeds --count transactions and times the two stacks from queryset to JSON
+bytes, each stage separately, after checking that both produce the same JSON.
+
+    python -m benchmarks.bench_serializers --count 10000
+"""
+import argparse
+import json
+from benchmarks import setup_django, measure, fmt_ms, seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from core.models import Transaction
+    from core.renderers import FastJSONRenderer, orjson
+    from core.serializers import TransactionSerializer, TransactionReadSerializer
+
+    with seeded('bench_serializers', transactions=args.count, counters=False) as (user,):
+        queryset = Transaction.objects.filter(user=user).order_by('pk')
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+
+        current_data = TransactionSerializer(queryset, many=True).data
+        lean_data = TransactionReadSerializer.many(queryset)
+        if json.loads(stock.render(current_data)) != json.loads(fast.render(lean_data)):
+            raise SystemExit("FAIL: the lean stack's JSON differs from the ModelSerializer's")
+
+        print(f"{args.count:,} transactions (orjson {'installed' if orjson else 'NOT installed'})")
+        stages = [
+            ('ModelSerializer', lambda: TransactionSerializer(queryset, many=True).data),
+            ('JSONRenderer', lambda: stock.render(current_data)),
+            ('current total', lambda: stock.render(TransactionSerializer(queryset, many=True).data)),
+            ('lean serializer', lambda: TransactionReadSerializer.many(queryset)),
+            ('FastJSONRenderer', lambda: fast.render(lean_data)),
+            ('lean total', lambda: fast.render(TransactionReadSerializer.many(queryset))),
+        ]
+        for label, fn in stages:
+            best, median = measure(fn, repeat=args.repeat)
+            print(f"{label:>18}: best {fmt_ms(best)}  median {fmt_ms(median)}")
+
+
+if __name__ == "__main__":
+    main()
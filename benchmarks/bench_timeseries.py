@@ -0,0 +1,40 @@
+"""Trend analytics cost vs. length of transaction history.
+
+The counter-backed trends read a fixed number of monthly rows, so latency
+should stay flat while a full-history GROUP BY grows with the row count.
+
+    python -m benchmarks.bench_timeseries --history 1000 10000 100000 --months 36
+"""
+import argparse
+from benchmarks import setup_django, measure, fmt_ms, seeded
+
+
+def full_history_aggregate(user):
+    from django.db.models import DateField, Sum
+    from django.db.models.functions import TruncMonth
+    from core.models import Transaction
+    return list(Transaction.objects.filter(user=user)
+                .annotate(period=TruncMonth('created_at', output_field=DateField()))
+                .values('period', 'category__name').annotate(total=Sum('amount')).order_by())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--history', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from core.timeseries import spending_trends
+
+    for count in args.history:
+        with seeded(f'bench_trends_{count}', transactions=count, months=args.months) as (user,):
+            trends = measure(lambda: spending_trends(user, 12), repeat=args.repeat)
+            naive = measure(lambda: full_history_aggregate(user), repeat=args.repeat)
+            print(f"{count:>10,} txs  trends (counters): median {fmt_ms(trends[1])}   "
+                  f"full-history GROUP BY: median {fmt_ms(naive[1])}")
+
+
+if __name__ == "__main__":
+    main()
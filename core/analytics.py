@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Sum
+from django.utils import timezone
+from .models import Transaction
+from .response_cache import cached_value
+from .tracker import period_start, UNCATEGORIZED
+from .tracing import span, traced
+from ml.allocation_profile import ALLOCATION_CATEGORIES, savings_ratios
+from ml.analytics import build_analytics_result
+
+
+def _month_bounds(period=None):
+    start = period or period_start()
+    end = (start + timedelta(days=32)).replace(day=1)
+    return (timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end, time.min)))
+
+
+def _spending_query(user_id, start, end):
+    qs = Transaction.objects.filter(user_id=user_id)
+    if start is not None:
+        qs = qs.filter(created_at__gte=start)
+    if end is not None:
+        qs = qs.filter(created_at__lt=end)
+    return qs.values_list('category__name').annotate(total=Sum('amount')).order_by()
+
+
+@traced('analytics_db')
+def spending_by_category(user_id, start=None, end=None):
+    """Category -> total spent, aggregated in the database (one GROUP BY query)"""
+    return {name or UNCATEGORIZED: float(total) for name, total in _spending_query(user_id, start, end)}
+
+
+async def aspending_by_category(user_id, start=None, end=None):
+    """spending_by_category() on the async ORM"""
+    with span('analytics_db'):
+        return {name or UNCATEGORIZED: float(total) async for name, total in _spending_query(user_id, start, end)}
+
+
+def potential_savings(summary):
+    # Dataset-wide avoidable share per category; no profile -> no estimate
+    try:
+        ratios = savings_ratios()
+    except FileNotFoundError:
+        return 0.0
+    return sum(amount * ratios.get(cat, 0.0) for cat, amount in summary.items())
+
+
+def transaction_analytics(user_id, period=None):
+    """Monthly analytics from the user's own transactions, in ml.analytics' response shape.
+
+    Returns None when the user has no transactions that month so callers can fall
+    back to the dataset.
+    """
+    by_category = spending_by_category(user_id, *_month_bounds(period))
+    if not by_category:
+        return None
+    return analytics_from_spending(by_category)
+
+
+def cached_transaction_analytics(user_id, period=None):
+    """transaction_analytics(), memoized per (user, month) until the user's data changes"""
+    period = period or period_start()
+    return cached_value('transaction_analytics', user_id, lambda: transaction_analytics(user_id, period),
+                        f"{period:%Y-%m}")
+
+
+async def amonthly_spending(user_id, period=None):
+    """The month's category totals that transaction_analytics() builds on, read on the async ORM"""
+    return await aspending_by_category(user_id, *_month_bounds(period))
+
+
+def analytics_from_spending(by_category):
+    # Keep the fixed category order of the CSV backend, then anything user-specific
+    categories = ALLOCATION_CATEGORIES + sorted(set(by_category) - set(ALLOCATION_CATEGORIES))
+    spending = [by_category.get(cat, 0.0) for cat in categories]
+    return build_analytics_result(categories, spending, potential_savings(by_category))
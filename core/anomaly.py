@@ -0,0 +1,51 @@
+import math
+from django.db import transaction as db_transaction
+from .models import SpendStats
+from .tracker import UNCATEGORIZED
+
+MIN_HISTORY = 5         # Observations needed before anything is flagged
+Z_THRESHOLD = 4.0       # Flag amounts this many standard deviations above the mean...
+MEDIAN_MULTIPLE = 10.0  # ...or this many times the typical (median) amount
+MEDIAN_RATE = 0.05      # Step of the running median estimate, relative to its value
+
+
+def score(state, amount):
+    """(z-score, is_anomaly) of amount against the state *before* it is added"""
+    if state.count < 2:
+        return None, False
+    std = math.sqrt(state.m2 / (state.count - 1))
+    z = (amount - state.mean) / std if std > 0 else None  # Identical history: only the median rule applies
+    flagged = state.count >= MIN_HISTORY and (
+        (z is not None and z >= Z_THRESHOLD) or (state.median > 0 and amount >= MEDIAN_MULTIPLE * state.median))
+    return z, flagged
+
+
+def update(state, amount):
+    """Fold amount into the state in O(1): Welford mean/variance + decayed median"""
+    state.count += 1
+    delta = amount - state.mean
+    state.mean += delta / state.count
+    state.m2 += delta * (amount - state.mean)
+    if state.count == 1:
+        state.median = amount
+    elif amount != state.median:
+        # Frugal streaming median: a small step towards each new point, so old history fades
+        step = MEDIAN_RATE * max(state.median, 1.0)
+        state.median += step if amount > state.median else -step
+
+
+def score_transaction(tx):
+    """Score tx against its (user, category) stats and update them atomically.
+
+    The stats row is locked for the read-score-update, so parallel inserts
+    for the same user and category apply one after another.
+    """
+    amount = float(tx.amount)
+    category = tx.category.name if tx.category_id else UNCATEGORIZED
+    with db_transaction.atomic():
+        SpendStats.objects.get_or_create(user_id=tx.user_id, category=category)
+        state = SpendStats.objects.select_for_update().get(user_id=tx.user_id, category=category)
+        tx.anomaly_score, tx.is_anomaly = score(state, amount)
+        update(state, amount)
+        state.save(update_fields=['count', 'mean', 'm2', 'median', 'updated_at'])
+    return tx.anomaly_score, tx.is_anomaly
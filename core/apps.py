@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        from . import signals  # Connects the spend tracker receivers
+        from . import warmup
+        warmup.run()  # No-op unless FINWISE_WARMUP is set
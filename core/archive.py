@@ -0,0 +1,200 @@
+"""Hot/cold storage for transaction history.
+
+Transactions older than FINWISE_ARCHIVE_AFTER_MONTHS are moved out of the
+Transaction table into one gzip-compressed, columnar JSON segment per user and
+month under FINWISE_ARCHIVE_DIR. An ArchivedMonth row keeps the month's
+per-category totals in the database. The monthly spend counters are left as
+they are, so budget status, trends and alerts read the same numbers as before.
+
+Reads that may reach past the horizon (exports, long-range analytics) go
+through iter_transactions() and spending_by_category() here, which merge the
+segments with the hot rows. Whole archived months are answered from their
+summary row; a segment is only opened for a month the range cuts through.
+"""
+import gzip
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import DateField
+from django.db.models.functions import TruncMonth
+from .analytics import _month_bounds, spending_by_category as hot_spending_by_category
+from .models import ArchivedMonth, Category, Receipt, Transaction
+from .serializers import TransactionReadSerializer
+from .timeseries import month_sequence
+from .tracker import UNCATEGORIZED, period_start
+from . import response_cache
+
+FORMAT_VERSION = 1
+FIELDS = TransactionReadSerializer.fields
+DELETE_CHUNK = 500  # Ids per DELETE statement
+EXPORT_CHUNK = 5000  # Hot rows per query when streaming an export
+
+
+def archive_dir():
+    return str(getattr(settings, 'FINWISE_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive')))
+
+
+def horizon(months=None):
+    """First day of the oldest month that stays hot: the current month and `months` before it"""
+    if months is None:
+        months = getattr(settings, 'FINWISE_ARCHIVE_AFTER_MONTHS', 12)
+    return month_sequence(period_start(), months + 1)[0]
+
+
+def write_segment(path, rows, receipts):
+    """Write rows (and their receipts' line items) to a segment file; returns its size in bytes"""
+    path = os.path.join(archive_dir(), path)
+    columns = {field: [row[field] for row in rows] for field in FIELDS}
+    columns['created_at'] = [value.isoformat() for value in columns['created_at']]
+    payload = {'version': FORMAT_VERSION, 'columns': columns, 'receipts': receipts}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_segment(path):
+    """(rows, receipts) of a segment file; rows are TransactionReadSerializer dicts, oldest first"""
+    with gzip.open(os.path.join(archive_dir(), path), 'rt', encoding='utf-8') as f:
+        payload = json.load(f)
+    columns = payload['columns']
+    columns['created_at'] = [datetime.fromisoformat(value) for value in columns['created_at']]
+    rows = [dict(zip(FIELDS, values)) for values in zip(*(columns[field] for field in FIELDS))]
+    return rows, payload['receipts']
+
+
+def remove_segment(path):
+    try:
+        os.remove(os.path.join(archive_dir(), path))
+    except FileNotFoundError:
+        pass
+
+
+def _summary(rows):
+    names = dict(Category.objects.values_list('id', 'name'))
+    by_category = defaultdict(lambda: [Decimal('0.00'), 0])
+    for row in rows:
+        entry = by_category[names.get(row['category'], UNCATEGORIZED)]
+        entry[0] += Decimal(row['amount'])
+        entry[1] += 1
+    return {cat: [str(spent), count] for cat, (spent, count) in by_category.items()}
+
+
+def _delete(table, column, ids):
+    # Raw delete: archiving must not look like spending being reversed to the delete signals
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[i:i + DELETE_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def archive_month(user_id, period):
+    """Move one user-month of hot transactions into its segment; returns the number of rows moved.
+
+    A month archived before (e.g. rows that arrived late) is rewritten as a new
+    segment holding both, and the old file is removed once the switch commits.
+    """
+    start, end = _month_bounds(period)
+    with db_transaction.atomic():
+        qs = Transaction.objects.filter(user_id=user_id, created_at__gte=start, created_at__lt=end)
+        rows = TransactionReadSerializer.many(qs.order_by('created_at', 'id'))
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+        receipts = {str(r['transaction_id']): r for r in Receipt.objects.filter(transaction_id__in=ids).values(
+            'transaction_id', 'merchant', 'items', 'printed_total', 'image')}
+        for receipt in receipts.values():
+            del receipt['transaction_id']
+            if receipt['printed_total'] is not None:
+                receipt['printed_total'] = str(receipt['printed_total'])
+
+        month = ArchivedMonth.objects.select_for_update().filter(user_id=user_id, period=period).first()
+        merged = rows
+        if month is not None:
+            old_rows, old_receipts = read_segment(month.path)
+            merged = sorted(old_rows + rows, key=lambda row: (row['created_at'], row['id']))
+            receipts = {**old_receipts, **receipts}
+
+        # A new file name per write, so readers never see a segment that disagrees with the table
+        path = os.path.join(str(user_id), f"{period:%Y-%m}.{uuid.uuid4().hex[:8]}.json.gz")
+        size = write_segment(path, merged, receipts)
+        by_category = _summary(merged)
+        ArchivedMonth.objects.update_or_create(user_id=user_id, period=period, defaults={
+            'path': path, 'transaction_count': len(merged), 'file_bytes': size, 'by_category': by_category,
+            'total': sum((Decimal(spent) for spent, _ in by_category.values()), Decimal('0.00')),
+        })
+        _delete(Receipt._meta.db_table, 'transaction_id', ids)
+        _delete(Transaction._meta.db_table, 'id', ids)
+        if month is not None:
+            db_transaction.on_commit(lambda: remove_segment(month.path))
+        response_cache.bump_version_on_commit(user_id)
+    return len(ids)
+
+
+def archivable_months(months=None, user_ids=None):
+    """(user_id, period) of every month with hot transactions older than the horizon"""
+    cutoff = _month_bounds(horizon(months))[0]
+    qs = Transaction.objects.filter(created_at__lt=cutoff)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    return list(qs.annotate(period=TruncMonth('created_at', output_field=DateField()))
+                .values_list('user_id', 'period').distinct().order_by('user_id', 'period'))
+
+
+def _archived(user_id, start, end):
+    months = ArchivedMonth.objects.filter(user_id=user_id).order_by('period')
+    if start is not None:
+        months = months.filter(period__gte=period_start(start))
+    if end is not None:
+        months = months.filter(period__lt=end)
+    return months
+
+
+def _in_range(row, start, end):
+    return (start is None or row['created_at'] >= start) and (end is None or row['created_at'] < end)
+
+
+def iter_transactions(user_id, start=None, end=None):
+    """The user's transactions in [start, end), archived and hot, oldest first, as TransactionReadSerializer dicts"""
+    for month in _archived(user_id, start, end):
+        for row in read_segment(month.path)[0]:
+            if _in_range(row, start, end):
+                yield row
+    qs = Transaction.objects.filter(user_id=user_id)
+    if start is not None:
+        qs = qs.filter(created_at__gte=start)
+    if end is not None:
+        qs = qs.filter(created_at__lt=end)
+    last = None
+    while True:
+        page = qs.filter(pk__gt=last) if last is not None else qs
+        rows = TransactionReadSerializer.many(page.order_by('pk')[:EXPORT_CHUNK])
+        yield from rows
+        if len(rows) < EXPORT_CHUNK:
+            return
+        last = rows[-1]['id']
+
+
+def spending_by_category(user_id, start=None, end=None):
+    """Category -> total spent in [start, end), over hot rows and archived months alike"""
+    totals = defaultdict(float, hot_spending_by_category(user_id, start, end))
+    names = None
+    for month in _archived(user_id, start, end):
+        month_start, month_end = _month_bounds(month.period)
+        if (start is None or start <= month_start) and (end is None or month_end <= end):
+            for category, (spent, _) in month.by_category.items():
+                totals[category] += float(spent)
+            continue
+        if names is None:
+            names = dict(Category.objects.values_list('id', 'name'))
+        for row in read_segment(month.path)[0]:
+            if _in_range(row, start, end):
+                totals[names.get(row['category'], UNCATEGORIZED)] += float(row['amount'])
+    return dict(totals)
@@ -0,0 +1,168 @@
+"""Async variants of the I/O-bound endpoints, for ASGI servers:
+
+    uvicorn finwise.asgi:application --workers 2
+
+They live under /core/api/async/ and return the same responses as the sync
+views in core/views.py. The database is read on the async ORM, and market
+prices come from ml.market_data's aget() over an httpx AsyncClient. CPU-bound
+work (intent matching, the savings model, analytics/PDF/chart rendering) runs
+on a small fixed-size thread pool, so the event loop only ever waits on I/O.
+Requests are authenticated as the sync views' are, through DRF's configured
+authentication classes (AsyncAPIView).
+Under WSGI they still answer, but each request gets its own event loop.
+"""
+import os
+import json
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .analytics import amonthly_spending, analytics_from_spending
+from .metrics import ANALYTICS_REQUESTS
+from .response_cache import acached_response
+from .savings import DEFAULT_SAVINGS, advice_savings, asavings_features
+from ml.analytics import ANALYTICS_SOURCE, csv_analytics, render_pdf_report
+from ml.chatbot import ANALYTICS_INTENTS, ChatFacts, answer_intent, classify_intent
+from ml.investment_insights import investment_insights
+from ml.market_data import get_provider
+
+# Threads for CPU-bound work, per process. More than the cores only adds GIL contention.
+CPU_WORKERS = int(os.environ.get('FINWISE_CPU_WORKERS') or min(4, os.cpu_count() or 1))
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='finwise-cpu')
+    return _executor
+
+
+def _after_fork_in_child():
+    global _executor
+    _executor = None  # The parent's threads don't exist in the child
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+async def run_cpu(fn, *args):
+    """Run fn(*args) on the CPU pool, inside this request's trace and metrics context"""
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+
+async def analytics(user_id):
+    """generate_analytics() with the month's totals read on the async ORM"""
+    if ANALYTICS_SOURCE == 'db' and user_id is not None:
+        by_category = await amonthly_spending(user_id)
+        if by_category:
+            ANALYTICS_REQUESTS.labels(source='db').inc()
+            return await run_cpu(analytics_from_spending, by_category)
+    ANALYTICS_REQUESTS.labels(source='csv').inc()
+    return await run_cpu(csv_analytics, user_id)
+
+
+def _authenticate(request):
+    """(user, None), or (None, error response) when credentials were sent but don't check out"""
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        return Request(request, authenticators=authenticators).user, None
+    except APIException as e:
+        # APIView.handle_exception()'s status rule: 401 only if the first authenticator can challenge
+        status, headers = e.status_code, {}
+        if isinstance(e, (AuthenticationFailed, NotAuthenticated)):
+            challenge = authenticators[0].authenticate_header(request) if authenticators else None
+            if challenge:
+                headers['WWW-Authenticate'] = challenge
+            else:
+                status = 403
+        return None, JsonResponse({'detail': e.detail}, status=status, headers=headers)
+
+
+class AsyncAPIView(View):
+    """An async View that authenticates like the sync APIViews: request.user comes
+    from DRF's DEFAULT_AUTHENTICATION_CLASSES (session, with its CSRF check on
+    unsafe methods, and basic), not just the session."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))  # SessionAuthentication enforces CSRF, as in DRF
+
+    async def dispatch(self, request, *args, **kwargs):
+        user, error = await sync_to_async(_authenticate)(request)
+        if error is not None:
+            return error
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+async def _investment_user_id(request):
+    # As views._investment_user_id: anonymous requests get the first user's advice
+    if request.user.is_authenticated:
+        return request.user.id
+    return await User.objects.order_by('pk').values_list('pk', flat=True).afirst()
+
+
+async def _market_snapshot(request):
+    return repr(sorted((await get_provider().aget()).items()))
+
+
+class AsyncInvestmentView(AsyncAPIView):
+    @acached_response('async_investment', user_id=_investment_user_id, vary=_market_snapshot)
+    async def get(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            user = await User.objects.afirst()
+
+        async def savings():
+            record = await asavings_features(user) if user else None
+            if record is None:
+                return DEFAULT_SAVINGS
+            return await run_cpu(advice_savings, record)
+
+        # The database and the market cache are independent; wait on both at once
+        savings_amount, market = await asyncio.gather(savings(), get_provider().aget())
+        return JsonResponse(investment_insights(savings_amount, market))
+
+
+class AsyncChatbotView(AsyncAPIView):
+    async def post(self, request):
+        user = request.user
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        else:
+            data = request.POST
+        query = str(data.get('query', '')).lower().strip()
+        user_id = user.id if user.is_authenticated else None
+
+        intent = await run_cpu(classify_intent, query)
+        facts = ChatFacts(user_id)
+        # Do the I/O here on the loop, so the answer itself is pure computation on cached facts
+        if intent in ANALYTICS_INTENTS and not facts.has('analytics'):
+            facts.prime('analytics', await analytics(user_id))
+        if intent == 'investment':
+            await get_provider().aget()
+        return JsonResponse({"response": await run_cpu(answer_intent, intent, query, facts)})
+
+
+class AsyncReportView(AsyncAPIView):
+    async def get(self, request):
+        result = await analytics(request.user.id if request.user.is_authenticated else None)
+        pdf_bytes = await run_cpu(render_pdf_report, result)  # Also waits for the chart render, off the loop
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="spending_report.pdf"'
+        return response
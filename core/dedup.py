@@ -0,0 +1,173 @@
+"""Duplicate detection for expense ingestion (SMS re-syncs, receipt re-uploads).
+
+Three layers, cheapest first:
+
+1. Idempotency-Key: a client retrying a request it already sent gets the first
+   request's transactions back, without anything being parsed.
+2. Input hash: the same raw input (receipt image bytes, SMS text) from the
+   same user within one time bucket is answered before OCR runs.
+3. Fingerprint: each parsed SMS or receipt transaction is fingerprinted from
+   (user, amount, normalized text, source, time bucket), which is unique on
+   Transaction. A batch is checked with one IN query, so known rows skip
+   categorization, and the unique index settles concurrent inserts of the
+   same transaction.
+
+Layers 2 and 3 only apply to synced and scanned inputs, which arrive again
+on their own. A manual or voice entry repeated within the day is a second
+purchase (two teas), so those are only deduplicated by an Idempotency-Key.
+
+The first two are hints kept in the FINWISE_IDEMPOTENCY_CACHE cache; the
+index is the authority. Identical transactions within one
+FINWISE_DEDUP_WINDOW_SECONDS bucket count as one, except for repeats inside a
+single input (two identical receipt lines), which are numbered.
+"""
+import collections
+import hashlib
+import json
+import os
+import re
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from .metrics import INGEST_DUPLICATES
+from .models import Transaction
+
+IN_PROGRESS = 'in-progress'
+CLAIM_SECONDS = 300  # A claimed key frees itself if its request dies without answering
+FILE_INPUTS = ('receipt_image', 'receipt_annotation')  # 'data' is a path; the file's bytes are hashed
+DEDUP_INPUTS = ('sms',) + FILE_INPUTS  # Input types that get an input hash
+DEDUP_SOURCES = ('sms', 'receipt', 'receipt_annotation')  # Transaction sources that get a fingerprint
+LOOKUP_CHUNK = 500  # Fingerprints per IN query
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _cache():
+    alias = getattr(settings, 'FINWISE_IDEMPOTENCY_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+def _timeout():
+    return getattr(settings, 'FINWISE_IDEMPOTENCY_SECONDS', 86400)
+
+
+def _digest(*parts):
+    return hashlib.blake2b('\x1f'.join(map(str, parts)).encode(), digest_size=16).hexdigest()
+
+
+def time_bucket(when=None):
+    window = getattr(settings, 'FINWISE_DEDUP_WINDOW_SECONDS', 86400)
+    return int((when or timezone.now()).timestamp()) // window
+
+
+def normalize_text(text):
+    """Case, punctuation and spacing folded away: 'Rs. KFC - Lahore ' -> 'rs kfc lahore'"""
+    return ' '.join(_NON_WORD.sub(' ', (text or '').casefold()).split())
+
+
+def fingerprint(user_id, amount, text, source, bucket, occurrence=0):
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    return _digest(user_id, f"{amount:f}", normalize_text(text), source, bucket, occurrence)
+
+
+def fingerprint_all(user_id, txs, bucket):
+    """Set tx['fingerprint'] on each parsed transaction of one input (None outside DEDUP_SOURCES)"""
+    seen = collections.Counter()
+    for tx in txs:
+        if tx['source'] not in DEDUP_SOURCES:
+            tx['fingerprint'] = None
+            continue
+        base = fingerprint(user_id, tx['amount'], tx['text'], tx['source'], bucket)
+        if seen[base]:
+            tx['fingerprint'] = fingerprint(user_id, tx['amount'], tx['text'], tx['source'], bucket, seen[base])
+        else:
+            tx['fingerprint'] = base
+        seen[base] += 1
+    return txs
+
+
+def existing(fingerprints):
+    """{fingerprint: Transaction} for those already stored, in a query per LOOKUP_CHUNK"""
+    fingerprints = list(set(fingerprints) - {None})
+    found = {}
+    for i in range(0, len(fingerprints), LOOKUP_CHUNK):
+        for tx in Transaction.objects.filter(fingerprint__in=fingerprints[i:i + LOOKUP_CHUNK]):
+            found[tx.fingerprint] = tx
+    if found:
+        INGEST_DUPLICATES.labels(layer='fingerprint').inc(len(found))
+    return found
+
+
+def save_unique(tx):
+    """Insert tx; (row, created). If a concurrent request inserted the same fingerprint first, its row."""
+    try:
+        with db_transaction.atomic():  # Savepoint: the signals' spend/anomaly updates roll back with the insert
+            tx.save()
+        return tx, True
+    except IntegrityError:
+        winner = Transaction.objects.filter(fingerprint=tx.fingerprint).first() if tx.fingerprint else None
+        if winner is None:
+            raise
+        INGEST_DUPLICATES.labels(layer='conflict').inc()
+        return winner, False
+
+
+def request_key(user_id, idempotency_key):
+    return f"finwise:idempotency:{_digest(user_id, idempotency_key)}"
+
+
+def input_key(user_id, input_data, bucket):
+    """Cache key of the raw input, or None for input types that aren't deduplicated by content"""
+    kind, data = input_data.get('type'), input_data.get('data')
+    if kind not in DEDUP_INPUTS:
+        return None
+    if kind in FILE_INPUTS and isinstance(data, str) and os.path.isfile(data):
+        h = hashlib.blake2b(digest_size=16)
+        with open(data, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                h.update(block)
+        content = h.hexdigest()  # The same image under another name still matches
+    else:
+        content = json.dumps(data, sort_keys=True, default=str)
+    return f"finwise:input:{_digest(user_id, kind, content, bucket)}"
+
+
+def claim(key):
+    """Reserve an Idempotency-Key: None if this request now owns it, else IN_PROGRESS or the stored ids"""
+    cache = _cache()
+    if cache is None or cache.add(key, IN_PROGRESS, timeout=CLAIM_SECONDS):
+        return None
+    stored = cache.get(key)
+    if stored is not None:
+        INGEST_DUPLICATES.labels(layer='key').inc()
+    return stored
+
+
+def release(key):
+    # The request failed: let the client retry with the same key
+    cache = _cache()
+    if cache is not None:
+        cache.delete(key)
+
+
+def recall(key):
+    """Transaction ids stored for an input key, or None"""
+    cache = _cache()
+    ids = cache.get(key) if cache is not None else None
+    if ids is not None:
+        INGEST_DUPLICATES.labels(layer='input').inc()
+    return ids
+
+
+def remember(keys, ids):
+    cache = _cache()
+    if cache is not None:
+        cache.set_many({key: ids for key in keys}, timeout=_timeout())
+
+
+def stored(user, ids):
+    """The still existing transactions among ids, in their original order"""
+    rows = Transaction.objects.filter(user=user).in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
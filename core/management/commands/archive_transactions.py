@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from core.archive import archivable_months, archive_month, horizon
+
+
+class Command(BaseCommand):
+    help = "Move transactions older than the archive horizon into compressed per-user monthly segments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=None,
+                            help="Months kept hot before the current one (default: FINWISE_ARCHIVE_AFTER_MONTHS)")
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Only this user id (repeatable)")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the user-months that would be archived")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        months = archivable_months(options['months'], options['users'])
+        self.stdout.write(f"Archiving transactions before {horizon(options['months']):%Y-%m}: "
+                          f"{len(months)} user-months")
+        if options['dry_run']:
+            for user_id, period in months:
+                self.stdout.write(f"  user {user_id} {period:%Y-%m}")
+            return
+
+        moved = 0
+        for user_id, period in months:
+            moved += archive_month(user_id, period)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} transactions in {len(months)} segments in {time.perf_counter() - started:.1f}s"))
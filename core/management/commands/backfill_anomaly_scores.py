@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from core.anomaly import score, update
+from core.models import SpendStats, Transaction
+from core.tracker import UNCATEGORIZED
+
+
+class Command(BaseCommand):
+    help = "Replay transaction history in chunks to rebuild anomaly stats and per-transaction scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Only this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        qs = Transaction.objects.all()
+        if options['users']:
+            qs = qs.filter(user_id__in=options['users'])
+
+        # State per (user, category) lives in memory; history is streamed in id order
+        states = {}
+        last_id = 0
+        replayed = flagged = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id).order_by('id')
+                         .select_related('category').only('id', 'user_id', 'amount', 'category__name')[:chunk_size])
+            if not chunk:
+                break
+            for tx in chunk:
+                key = (tx.user_id, tx.category.name if tx.category_id else UNCATEGORIZED)
+                state = states.setdefault(key, SimpleNamespace(count=0, mean=0.0, m2=0.0, median=0.0))
+                amount = float(tx.amount)
+                tx.anomaly_score, tx.is_anomaly = score(state, amount)
+                update(state, amount)
+                flagged += tx.is_anomaly
+            Transaction.objects.bulk_update(chunk, ['anomaly_score', 'is_anomaly'])
+            replayed += len(chunk)
+            last_id = chunk[-1].id
+            self.stdout.write(f"  replayed {replayed} transactions")
+
+        with db_transaction.atomic():
+            existing = SpendStats.objects.filter(user_id__in=options['users']) if options['users'] else SpendStats.objects.all()
+            existing.delete()
+            SpendStats.objects.bulk_create([
+                SpendStats(user_id=user_id, category=category, count=s.count, mean=s.mean, m2=s.m2, median=s.median)
+                for (user_id, category), s in states.items()
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {replayed} transactions into {len(states)} stats rows; {flagged} flagged as anomalies"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from core.receipts import GAP_SECONDS, consolidate_receipts
+
+
+class Command(BaseCommand):
+    help = "Merge receipts stored as one transaction per OCR line into one transaction with its line items"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Only this user id (repeatable)")
+        parser.add_argument('--gap', type=float, default=GAP_SECONDS,
+                            help="Seconds between two line rows that starts a new receipt")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be merged")
+
+    def handle(self, *args, **options):
+        receipts, removed = consolidate_receipts(options['users'], options['gap'], options['dry_run'])
+        verb = "Would merge" if options['dry_run'] else "Merged"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {receipts} receipts, removing {removed} line transactions"))
+        if receipts and not options['dry_run']:
+            self.stdout.write("Anomaly stats still include the old lines; run backfill_anomaly_scores to rebuild them")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.tracker import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly per-category spend counters from transaction history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Only this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        count = rebuild_counters(options['users'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} monthly category counters"))
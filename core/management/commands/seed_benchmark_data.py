@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.seeding import BATCH_SIZE, drop_users, seed, seed_users
+
+
+class Command(BaseCommand):
+    help = ("Seed synthetic users with budgets, savings goals and transaction history for benchmarks, "
+            "through COPY (PostgreSQL) or batched executemany (SQLite)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions', type=int, default=10_000, help="Transactions per user")
+        parser.add_argument('--months', type=int, default=12, help="Months of history the transactions span")
+        parser.add_argument('--budgets', type=int, default=1, help="Budgets per user")
+        parser.add_argument('--goals', type=int, default=2, help="Savings goals per user")
+        parser.add_argument('--prefix', default='bench_seed', help="Usernames are <prefix>_<n>")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed, for a reproducible dataset")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--replace', action='store_true', help="Delete existing <prefix>_* users first")
+        parser.add_argument('--drop', action='store_true', help="Only delete existing <prefix>_* users")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        existing = list(User.objects.filter(username__startswith=f"{prefix}_").values_list('pk', flat=True))
+        if existing and (options['replace'] or options['drop']):
+            drop_users(existing)
+            self.stdout.write(f"Deleted {len(existing)} {prefix}_* users")
+        elif existing:
+            raise CommandError(f"{len(existing)} {prefix}_* users already exist; use --replace or another --prefix")
+        if options['drop']:
+            return
+
+        self.stdout.write(f"Seeding {options['users']} users x {options['transactions']:,} transactions "
+                          f"over {options['months']} months into {connection.vendor}")
+        user_ids = seed_users(prefix, options['users'])
+        stats = seed(user_ids, options['transactions'], options['months'], options['budgets'], options['goals'],
+                     options['seed'], batch_size=options['batch_size'])
+        for table, (rows, seconds) in stats.items():
+            rate = f"{rows / seconds:12,.0f} rows/s" if seconds else ""
+            self.stdout.write(f"  {table:>15}: {rows:>12,} rows in {seconds:7.1f}s {rate}")
+        self.stdout.write(self.style.SUCCESS(f"Seeded {len(user_ids)} users ({prefix}_0 .. {prefix}_{len(user_ids) - 1})"))
@@ -0,0 +1,452 @@
+"""Process metrics (counters, gauges, fixed-bucket histograms) in the Prometheus
+text format, served at /core/api/metrics/.
+
+    OCR_SECONDS.observe(elapsed)
+    CACHE_REQUESTS.labels(cache='chart', result='hit').inc()
+    with MODEL_LOAD_SECONDS.labels(model='categorizer').time():
+        ...
+
+Every metric is declared at the bottom of this module, so any process can render
+all of them. Values live in a dict in this process by default. Under a pre-fork
+server, point FINWISE_METRICS_DIR at a directory shared by the workers: each
+process then keeps its values in mmap'd files there (counter_<pid>.db,
+gauge_<pid>.db), and a scrape served by any worker merges every file. Empty the
+directory before the server starts, and call mark_process_dead(worker.pid) from
+gunicorn's child_exit hook so exited workers drop out of the gauges (their
+counter and histogram counts are kept). Plain Python only, like core/tracing.py.
+"""
+import bisect
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+METRICS_DIR = os.environ.get('FINWISE_METRICS_DIR') or None
+INITIAL_FILE_BYTES = 64 * 1024
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (.05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+# File layout: [bytes used][pad] then entries of (key length, utf-8 key, pad to 8, float64 value)
+_HEADER = struct.Struct('<I4x')
+_KEY_LEN = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+
+
+def _entry_size(key_length):
+    head = _KEY_LEN.size + key_length
+    return head + (-head % 8) + _VALUE.size
+
+
+def _read_entries(data, used):
+    """(key, value offset, value) for each entry of a metrics file"""
+    pos = _HEADER.size
+    end = min(used, len(data))
+    while pos + _KEY_LEN.size <= end:
+        length = _KEY_LEN.unpack_from(data, pos)[0]
+        key = bytes(data[pos + _KEY_LEN.size:pos + _KEY_LEN.size + length]).decode()
+        pos += _entry_size(length)
+        if pos > end:
+            break
+        yield key, pos - _VALUE.size, _VALUE.unpack_from(data, pos - _VALUE.size)[0]
+
+
+class _DictValues:
+    """Single-process storage: sample key -> value"""
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+        self._lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def close(self):
+        pass
+
+
+class _MmapValues:
+    """This process's samples in an mmap'd file other workers can read"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._capacity = os.fstat(self._fd).st_size
+        if self._capacity < INITIAL_FILE_BYTES:
+            self._capacity = INITIAL_FILE_BYTES
+            os.ftruncate(self._fd, self._capacity)
+        self._mmap = mmap.mmap(self._fd, self._capacity)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        # A reused pid carries on from the old file
+        self._offsets = {key: offset for key, offset, _ in _read_entries(self._mmap, self._used)}
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is None:
+            encoded = key.encode()
+            size = _entry_size(len(encoded))
+            if self._used + size > self._capacity:
+                self._grow(self._used + size)
+            start = self._used
+            _KEY_LEN.pack_into(self._mmap, start, len(encoded))
+            self._mmap[start + _KEY_LEN.size:start + _KEY_LEN.size + len(encoded)] = encoded
+            offset = start + size - _VALUE.size
+            _VALUE.pack_into(self._mmap, offset, 0.0)
+            self._used += size
+            _HEADER.pack_into(self._mmap, 0, self._used)  # Written last, so readers never see half an entry
+            self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._mmap.close()
+        os.ftruncate(self._fd, capacity)
+        self._mmap = mmap.mmap(self._fd, capacity)
+        self._capacity = capacity
+
+    def add(self, key, amount):
+        with self._lock:
+            offset = self._offset(key)
+            _VALUE.pack_into(self._mmap, offset, _VALUE.unpack_from(self._mmap, offset)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            _VALUE.pack_into(self._mmap, self._offset(key), value)
+
+    def items(self):
+        with self._lock:
+            return [(key, _VALUE.unpack_from(self._mmap, offset)[0]) for key, offset in self._offsets.items()]
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+_stores = {}  # 'counter' (counters and histograms) / 'gauge' -> this process's storage
+_stores_lock = threading.Lock()
+
+
+def _store(kind):
+    store = _stores.get(kind)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(kind)
+            if store is None:
+                if METRICS_DIR:
+                    store = _MmapValues(os.path.join(METRICS_DIR, f"{kind}_{os.getpid()}.db"))
+                else:
+                    store = _DictValues()
+                _stores[kind] = store
+    return store
+
+
+def _after_fork_in_child():
+    # Each worker writes its own files; in single-process mode it keeps a copy of what it inherited
+    global _stores_lock
+    _stores_lock = threading.Lock()
+    inherited = dict(_stores)
+    _stores.clear()
+    for kind, store in inherited.items():
+        if isinstance(store, _DictValues):
+            _stores[kind] = _DictValues(store._values)
+        else:
+            store.close()  # The parent's file, still open in the parent
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def mark_process_dead(pid):
+    """Drop an exited worker's gauges (gunicorn child_exit hook)"""
+    if METRICS_DIR:
+        try:
+            os.remove(os.path.join(METRICS_DIR, f"gauge_{pid}.db"))
+        except FileNotFoundError:
+            pass
+
+
+def _key(sample, labels):
+    return json.dumps([sample, labels], separators=(',', ':'))
+
+
+class _Timer:
+    __slots__ = ('observe', 'start')
+
+    def __init__(self, observe):
+        self.observe = observe
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _Metric:
+    type = None
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in _registry:
+            raise ValueError(f"Metric {name} is already registered")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._default = None if self.labelnames else self.labels()
+        _registry[name] = self
+
+    def labels(self, **labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {list(self.labelnames)}, got {sorted(labels)}")
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._child(list(zip(self.labelnames, values)))
+        return child
+
+    def _unlabelled(self):
+        if self._default is None:
+            raise ValueError(f"{self.name} needs labels {list(self.labelnames)}")
+        return self._default
+
+
+class _CounterChild:
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        _store('counter').add(self.key, amount)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _child(self, labels):
+        return _CounterChild(_key(self.name, labels))
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def render(self, samples, gauges):
+        for labels, value in samples.get(self.name, ()):
+            yield _line(self.name, labels, value)
+
+
+class _GaugeChild:
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def set(self, value):
+        _store('gauge').set(self.key, value)
+
+    def inc(self, amount=1):
+        _store('gauge').add(self.key, amount)
+
+    def dec(self, amount=1):
+        _store('gauge').add(self.key, -amount)
+
+
+class Gauge(_Metric):
+    """mode decides how worker values combine: 'sum', 'max', or 'all' (one series per pid)"""
+    type = 'gauge'
+    kind = 'gauge'
+    MODES = ('sum', 'max', 'all')
+
+    def __init__(self, name, documentation, labelnames=(), mode='sum'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown gauge mode {mode!r}, expected one of {self.MODES}")
+        self.mode = mode
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self, labels):
+        return _GaugeChild(_key(self.name, labels))
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def render(self, samples, gauges):
+        for labels, per_pid in gauges.get(self.name, ()):
+            if self.mode == 'all':
+                for pid, value in per_pid:
+                    yield _line(self.name, labels + [['pid', pid]], value)
+            else:
+                combine = sum if self.mode == 'sum' else max
+                yield _line(self.name, labels, combine(value for _, value in per_pid))
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'bucket_keys', 'sum_key')
+
+    def __init__(self, upper_bounds, bucket_keys, sum_key):
+        self.upper_bounds = upper_bounds
+        self.bucket_keys = bucket_keys
+        self.sum_key = sum_key
+
+    def observe(self, value):
+        # Buckets are stored per interval; render() makes them cumulative, so an observation is two writes
+        store = _store('counter')
+        store.add(self.bucket_keys[bisect.bisect_left(self.upper_bounds, value)], 1)
+        store.add(self.sum_key, value)
+
+    def time(self):
+        return _Timer(self.observe)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _child(self, labels):
+        bucket_keys = [_key(f"{self.name}_bucket", labels + [['le', _format(bound)]]) for bound in self.upper_bounds]
+        return _HistogramChild(self.upper_bounds, bucket_keys, _key(f"{self.name}_sum", labels))
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def render(self, samples, gauges):
+        buckets = {}
+        for labels, value in samples.get(f"{self.name}_bucket", ()):
+            buckets.setdefault(json.dumps(labels[:-1]), {})[labels[-1][1]] = value
+        sums = {json.dumps(labels): value for labels, value in samples.get(f"{self.name}_sum", ())}
+        for series, counts in buckets.items():
+            labels = json.loads(series)
+            cumulative = 0.0
+            for bound in self.upper_bounds:
+                le = _format(bound)
+                cumulative += counts.get(le, 0.0)
+                yield _line(f"{self.name}_bucket", labels + [['le', le]], cumulative)
+            yield _line(f"{self.name}_sum", labels, sums.get(series, 0.0))
+            yield _line(f"{self.name}_count", labels, cumulative)
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{label}="{_escape(v)}"' for label, v in labels) + '}'
+    return f"{name} {_format(value)}"
+
+
+def _collect():
+    """Every process's values: ({sample: [(labels, summed value)]}, {gauge: [(labels, [(pid, value)])]})"""
+    counters, gauges = {}, {}
+    if METRICS_DIR:
+        sources = []
+        for path in glob.glob(os.path.join(METRICS_DIR, '*_*.db')):
+            kind, _, pid = os.path.basename(path)[:-len('.db')].partition('_')
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:  # Worker marked dead mid-scrape
+                continue
+            if len(data) >= _HEADER.size:
+                entries = _read_entries(data, _HEADER.unpack_from(data, 0)[0])
+                sources.append((kind, pid, [(key, value) for key, _, value in entries]))
+    else:
+        pid = str(os.getpid())
+        sources = [(kind, pid, store.items()) for kind, store in list(_stores.items())]
+
+    for kind, pid, items in sources:
+        for key, value in items:
+            if kind == 'gauge':
+                gauges.setdefault(key, []).append((pid, value))
+            else:
+                counters[key] = counters.get(key, 0.0) + value
+
+    samples, per_pid = {}, {}
+    for key, value in counters.items():
+        sample, labels = json.loads(key)
+        samples.setdefault(sample, []).append((labels, value))
+    for key, values in gauges.items():
+        sample, labels = json.loads(key)
+        per_pid.setdefault(sample, []).append((labels, values))
+    return samples, per_pid
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    samples, gauges = _collect()
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.render(samples, gauges))
+    return '\n'.join(lines) + '\n'
+
+
+_registry = {}  # name -> metric, in declaration order
+
+REQUEST_SECONDS = Histogram('finwise_request_duration_seconds', "Request latency by view",
+                            ['view', 'method', 'status'])
+REQUESTS_IN_PROGRESS = Gauge('finwise_requests_in_progress', "Requests currently being handled")
+DB_QUERIES = Histogram('finwise_db_queries_per_request', "Database queries run while handling a request",
+                       ['view'], buckets=COUNT_BUCKETS)
+CATEGORIZE_SECONDS = Histogram('finwise_categorizer_duration_seconds', "Expense categorizer latency per call",
+                               ['mode'])
+CATEGORIZE_BATCH_SIZE = Histogram('finwise_categorizer_batch_size', "Descriptions per categorizer call",
+                                  ['mode'], buckets=COUNT_BUCKETS)
+CATEGORIZE_ERRORS = Counter('finwise_categorizer_errors_total', "Predictions that fell back to Miscellaneous")
+CATEGORIES_CREATED = Counter('finwise_categories_created_total', "Categories auto-created for new categorizer labels")
+OCR_SECONDS = Histogram('finwise_ocr_duration_seconds', "Receipt OCR time (image load, preprocessing, tesseract)",
+                        buckets=SLOW_BUCKETS)
+MODEL_LOAD_SECONDS = Histogram('finwise_model_load_seconds', "Time to load or build a model, per load",
+                               ['model'], buckets=SLOW_BUCKETS)
+CACHE_REQUESTS = Counter('finwise_cache_requests_total', "Cache lookups by cache and result", ['cache', 'result'])
+ANALYTICS_REQUESTS = Counter('finwise_analytics_total', "Analytics computed, by data source", ['source'])
+INGEST_DUPLICATES = Counter('finwise_ingest_duplicates_total', "Duplicate expense submissions caught, by layer",
+                            ['layer'])
+MARKET_FETCHES = Counter('finwise_market_data_fetches_total', "Upstream market price fetches", ['result'])
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import logging
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from .tracing import start_trace, end_trace
+from .metrics import REQUEST_SECONDS, REQUESTS_IN_PROGRESS, DB_QUERIES
+
+logger = logging.getLogger('finwise.tracing')
+_TOKEN_RE = re.compile(r'[^A-Za-z0-9_.-]')  # Server-Timing metric names must be HTTP tokens
+_queries = ContextVar('finwise_queries', default=None)  # [count] for the current request
+
+
+def _flag(name, default):
+    """Boolean setting, overridable from the environment ("0"/"false" to turn off)"""
+    value = os.environ.get(name)
+    if value is None:
+        return bool(getattr(settings, name, default))
+    return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+def server_timing(trace, total):
+    entries = []
+    for name, (seconds, count) in trace.spans.items():
+        entry = f"{_TOKEN_RE.sub('_', name)};dur={seconds * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+
+class TracingMiddleware:
+    """Collects the request's spans into a Server-Timing header and an optional JSON log line.
+
+    With FINWISE_TRACING off the middleware removes itself at start-up, and
+    every span() call in the app becomes a no-op.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _flag('FINWISE_TRACING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.log = _flag('FINWISE_TRACE_LOG', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        trace, token = start_trace()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_trace(token)
+        self._report(request, response, trace)
+        return response
+
+    async def __acall__(self, request):
+        trace, token = start_trace()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_trace(token)
+        self._report(request, response, trace)
+        return response
+
+    def _report(self, request, response, trace):
+        total = trace.elapsed()
+        response['Server-Timing'] = server_timing(trace, total)
+        if self.log:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'spans': {name: {'ms': round(seconds * 1000, 2), 'count': count}
+                          for name, (seconds, count) in trace.spans.items()},
+            }))
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """Records per-view latency and database query counts into core.metrics.
+
+    Queries are counted by an execute wrapper on every connection, into a
+    context variable, so async views and sync views run in threads both count.
+    With FINWISE_METRICS off the middleware removes itself at start-up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _flag('FINWISE_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(_install_query_counter, dispatch_uid='finwise_query_counter')
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection=connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._finish(token)
+        self._record(request, response, counter, start)
+        return response
+
+    async def __acall__(self, request):
+        counter, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._finish(token)
+        self._record(request, response, counter, start)
+        return response
+
+    def _start(self):
+        REQUESTS_IN_PROGRESS.inc()
+        counter = [0]
+        return counter, _queries.set(counter), time.perf_counter()
+
+    def _finish(self, token):
+        _queries.reset(token)
+        REQUESTS_IN_PROGRESS.dec()
+
+    def _record(self, request, response, counter, start):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'  # Not the raw path, which would explode the label set
+        REQUEST_SECONDS.labels(view=view, method=request.method, status=response.status_code).observe(
+            time.perf_counter() - start)
+        DB_QUERIES.labels(view=view).observe(counter[0])
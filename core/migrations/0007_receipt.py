@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant', models.CharField(blank=True, max_length=100)),
+                ('items', models.JSONField(default=list)),
+                ('printed_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('image', models.CharField(blank=True, max_length=255)),
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='receipt', to='core.transaction')),
+            ],
+        ),
+    ]
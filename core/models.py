@@ -56,7 +56,75 @@ class Transaction(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     confidence = models.FloatField(default=0.0, validators=[MinValueValidator(0), MaxValueValidator(100)])
     explanation = models.TextField(blank=True)
+    anomaly_score = models.FloatField(null=True, blank=True)  # z-score vs. the user's history in this category
+    is_anomaly = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    fingerprint = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)  # core.dedup; null = not deduplicated
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'])]  # Per-user period aggregation
+
+    def __str__(self):
+        return f"{self.amount} - {self.category or 'Uncategorized'} ({self.source})"
+
+class Receipt(models.Model):
+    # A scanned receipt is one Transaction (its total); the lines are kept here, not as rows of their own
+    transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='receipt')
+    merchant = models.CharField(max_length=100, blank=True)
+    items = models.JSONField(default=list)  # [[text, amount], ...]
+    printed_total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # None: amount = sum of items
+    image = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"{self.merchant or 'Receipt'} - {len(self.items)} items"
+
+class ArchivedMonth(models.Model):
+    # A month of a user's transactions moved out of the Transaction table by core.archive
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_months')
+    period = models.DateField()  # First day of the month
+    path = models.CharField(max_length=255)  # Segment file, relative to FINWISE_ARCHIVE_DIR
+    transaction_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    by_category = models.JSONField(default=dict)  # {category: [spent, count]}, spent as a decimal string
+    file_bytes = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period')
+
+    def __str__(self):
+        return f"{self.user.username} {self.period:%Y-%m}: {self.transaction_count} archived"
+
+class CategorySpend(models.Model):
+    # Running monthly total per category, maintained by core.tracker as transactions are saved
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_spends')
+    period = models.DateField()  # First day of the month
+    category = models.CharField(max_length=50)
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    allocation = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)  # Snapshot of the budget limit
+    alert_level = models.PositiveSmallIntegerField(default=0)  # Highest threshold crossed (0, 80, 100)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period', 'category')
+
+    def __str__(self):
+        return f"{self.user.username} {self.period:%Y-%m} {self.category}: {self.spent}"
+
+class SpendStats(models.Model):
+    # Online per-(user, category) amount statistics used by core.anomaly to score new transactions
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spend_stats')
+    category = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)  # Welford sum of squared deviations
+    median = models.FloatField(default=0.0)  # Exponentially decayed running median estimate
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'category')
+        verbose_name_plural = "Spend stats"
 
     def __str__(self):
-        return f"{self.amount} - {self.category or 'Uncategorized'} ({self.source})"
\ No newline at end of file
+        return f"{self.user.username} {self.category}: n={self.count} mean={self.mean:.2f}"
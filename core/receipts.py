@@ -0,0 +1,93 @@
+from decimal import Decimal
+from django.db import connection, transaction as db_transaction
+from ml.multi_modal_input import SUMMARY_LINE, TOTAL_LINE, build_receipt
+from .models import Receipt, Transaction
+from . import response_cache, tracker
+
+LINE_SOURCES = ('receipt', 'receipt_annotation')
+GAP_SECONDS = 5  # Lines of one upload were saved together; a longer pause starts the next receipt
+
+
+def save_receipt(transaction, parsed):
+    """Store the line items of a receipt parsed by build_receipt() next to its transaction"""
+    return Receipt.objects.create(
+        transaction=transaction,
+        merchant=parsed['merchant'][:100],
+        items=parsed['items'],
+        printed_total=parsed['printed_total'],
+        image=parsed['image'][:255],
+    )
+
+
+def _is_total(text):
+    return bool(TOTAL_LINE.search(text)) and not SUMMARY_LINE.search(text)
+
+
+def _uploads(rows, gap):
+    """Group one user's line rows (in id order) into uploads: saved within gap seconds, ending at a total line"""
+    run = []
+    for tx in rows:
+        if run and (tx.created_at - run[-1].created_at).total_seconds() > gap:
+            yield run
+            run = []
+        run.append(tx)
+        if _is_total(tx.text):
+            yield run
+            run = []
+    if run:
+        yield run
+
+
+def _consolidate(run, dry_run=False):
+    """Fold one upload's line rows into its first row plus a Receipt; returns the number of rows deleted"""
+    parsed = build_receipt([(tx.text, float(tx.amount), False) for tx in run])
+    if 'error' in parsed:
+        return 0
+    if dry_run:
+        return len(run) - 1
+    items = {(text, amount) for text, amount in parsed['items']}
+    # A header + total upload has no items: the total row (the priced one) decides instead
+    matches = [tx for tx in run if (tx.text, round(float(tx.amount), 2)) in items]
+    main = max(matches or run, key=lambda tx: tx.amount)
+    parent, rest = run[0], [tx.pk for tx in run[1:]]
+
+    # The first row keeps the upload's id and date; it takes the category of the largest item
+    Transaction.objects.filter(pk=parent.pk).update(
+        text=parsed['text'], amount=Decimal(str(parsed['amount'])), category_id=main.category_id,
+        confidence=main.confidence, explanation=main.explanation, fingerprint=None,
+        anomaly_score=None, is_anomaly=False,
+    )
+    save_receipt(parent, parsed)
+    # Raw delete: no per-row signals, the user's counters are rebuilt once afterwards
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {Transaction._meta.db_table} WHERE id IN ({', '.join(['%s'] * len(rest))})", rest)
+    return len(rest)
+
+
+def consolidate_receipts(user_ids=None, gap=GAP_SECONDS, dry_run=False):
+    """Turn receipts stored as one Transaction per OCR line into one Transaction + Receipt each.
+
+    Users are converted one at a time, each in a single transaction that also
+    rebuilds their spend counters. Returns (receipts, rows removed). Anomaly
+    stats still count the old lines; rerun backfill_anomaly_scores afterwards.
+    """
+    qs = (Transaction.objects.filter(source__in=LINE_SOURCES, receipt__isnull=True).select_related('category')
+          .order_by('id'))
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+
+    receipts = removed = 0
+    for user_id in list(qs.order_by().values_list('user_id', flat=True).distinct()):
+        with db_transaction.atomic():
+            merged = 0
+            for run in _uploads(list(qs.filter(user_id=user_id)), gap):
+                if len(run) < 2:
+                    continue  # Already a single row
+                n = _consolidate(run, dry_run)
+                receipts += n > 0
+                merged += n
+            if merged and not dry_run:
+                tracker.rebuild_counters([user_id])
+                response_cache.bump_version_on_commit(user_id)
+        removed += merged
+    return receipts, removed
@@ -0,0 +1,203 @@
+"""Per-user response cache for read endpoints whose inputs are the user's own data.
+
+    class AnalyticsView(APIView):
+        @cached_response('analytics')
+        def get(self, request): ...
+
+(acached_response() does the same for the async views, and cached_value() for
+data that several views or jobs build on.)
+
+Entries are keyed by the user's data version, which the Transaction/Budget
+signals replace after every save or delete commits (core/signals.py). Nothing
+is ever deleted: a bump makes the old entries unreachable, and they age out
+after FINWISE_RESPONSE_CACHE_SECONDS. Every response carries an ETag derived
+from the same key, so a client revalidating with If-None-Match gets a 304
+without the view running or the cached body being read.
+
+The store is the Django cache named by FINWISE_RESPONSE_CACHE. Use LocMemCache
+for tests and a single process, and FileBasedCache, DatabaseCache or Redis when
+several workers must share versions. Bulk writes (bulk_create, queryset
+update/delete) bypass signals; call bump_version() for the users they touch.
+"""
+import functools
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.response import Response
+from .metrics import CACHE_REQUESTS
+from .tracing import span
+
+ANONYMOUS = 'anon'
+
+
+def _cache():
+    alias = getattr(settings, 'FINWISE_RESPONSE_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+def _timeout():
+    return getattr(settings, 'FINWISE_RESPONSE_CACHE_SECONDS', 3600)
+
+
+def _version_key(user_id):
+    return f"finwise:version:{user_id if user_id is not None else ANONYMOUS}"
+
+
+def get_version(user_id):
+    """The user's current data version, created on first use (or after the cache lost it)"""
+    cache = _cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)  # add(): concurrent first readers agree on one value
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate everything cached for the user. A fresh random token, so racing bumps can't collide."""
+    cache = _cache()
+    if cache is not None:
+        cache.set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def bump_version_on_commit(user_id):
+    # After commit, so a concurrent request can't cache pre-commit data under the new version
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+def request_user_id(request):
+    return request.user.id if request.user.is_authenticated else None
+
+
+async def arequest_user_id(request):
+    return request_user_id(request)
+
+
+def _entry(name, uid, version, request, vary):
+    """(ETag, cache key) of a response"""
+    parts = [name, str(uid if uid is not None else ANONYMOUS), version, request.META.get('QUERY_STRING', ''), vary]
+    digest = hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"', f"finwise:response:{digest}"
+
+
+def _not_modified(etag):
+    CACHE_REQUESTS.labels(cache='response', result='not_modified').inc()
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def _revalidate(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'  # Clients keep it, but revalidate every time
+    return response
+
+
+def cached_response(name, user_id=request_user_id, vary=None):
+    """Cache an APIView GET handler's 200 responses per user and data version.
+
+    user_id(request) picks whose data the response is built from; vary(request)
+    returns anything else the response depends on (e.g. market prices) as a string.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            cache = _cache()
+            if cache is None:
+                return get(view, request, *args, **kwargs)
+
+            with span('cache'):
+                uid = user_id(request)
+                etag, key = _entry(name, uid, get_version(uid), request, vary(request) if vary else '')
+                if etag in request.headers.get('If-None-Match', ''):
+                    return _not_modified(etag)
+                data = cache.get(key)
+
+            if data is not None:
+                CACHE_REQUESTS.labels(cache='response', result='hit').inc()
+                response = Response(data)
+            else:
+                CACHE_REQUESTS.labels(cache='response', result='miss').inc()
+                response = get(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                with span('cache'):
+                    cache.set(key, response.data, timeout=_timeout())
+            return _revalidate(response, etag)
+        return wrapper
+    return decorator
+
+
+def cached_value(name, user_id, compute, *parts):
+    """compute()'s result, cached per user and data version like the responses.
+
+    parts (strings) tell apart values of the same name, e.g. the month. None is
+    a valid result and is cached too.
+    """
+    cache = _cache()
+    if cache is None:
+        return compute()
+    with span('cache'):
+        uid = str(user_id if user_id is not None else ANONYMOUS)
+        digest = hashlib.blake2b('\x1f'.join([name, uid, get_version(user_id), *parts]).encode(),
+                                 digest_size=16).hexdigest()
+        key = f"finwise:value:{digest}"
+        entry = cache.get(key)
+    if entry is not None:
+        CACHE_REQUESTS.labels(cache='value', result='hit').inc()
+        return entry[0]
+    CACHE_REQUESTS.labels(cache='value', result='miss').inc()
+    value = compute()
+    with span('cache'):
+        cache.set(key, (value,), timeout=_timeout())  # Wrapped, so a cached None isn't a miss
+    return value
+
+
+async def aget_version(user_id):
+    """get_version() on the cache's async API"""
+    cache = _cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def acached_response(name, user_id=arequest_user_id, vary=None):
+    """cached_response() for async View handlers that return a JsonResponse.
+
+    user_id and vary are coroutine functions here. The body is cached as bytes,
+    so entries are kept apart from the sync views' (use another name).
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        async def wrapper(view, request, *args, **kwargs):
+            cache = _cache()
+            if cache is None:
+                return await get(view, request, *args, **kwargs)
+
+            with span('cache'):
+                uid = await user_id(request)
+                etag, key = _entry(name, uid, await aget_version(uid), request, await vary(request) if vary else '')
+                if etag in request.headers.get('If-None-Match', ''):
+                    return _not_modified(etag)
+                content = await cache.aget(key)
+
+            if content is not None:
+                CACHE_REQUESTS.labels(cache='response', result='hit').inc()
+                response = HttpResponse(content, content_type='application/json')
+            else:
+                CACHE_REQUESTS.labels(cache='response', result='miss').inc()
+                response = await get(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                with span('cache'):
+                    await cache.aset(key, response.content, timeout=_timeout())
+            return _revalidate(response, etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+import logging
+from ml.allocation_profile import ALLOCATION_CATEGORIES
+from ml.savings_model import CATEGORICAL_FEATURES, predict_savings
+from .models import Budget, CategorySpend
+from .tracker import period_start
+
+# Model inputs the app does not collect yet; request parameters override them
+DEFAULT_PROFILE = {'Age': 30, 'Dependents': 0, 'Occupation': 'Professional', 'City_Tier': 'Tier_2'}
+PROFILE_FIELDS = {'age': 'Age', 'dependents': 'Dependents', 'occupation': 'Occupation', 'city_tier': 'City_Tier'}
+DEFAULT_SAVINGS = 15000  # Used by investment advice until the user has a budget
+
+logger = logging.getLogger('finwise.ml')
+
+
+def _profile_value(column, value):
+    if column in CATEGORICAL_FEATURES:
+        if value not in CATEGORICAL_FEATURES[column]:
+            raise ValueError(f"{column} must be one of {', '.join(CATEGORICAL_FEATURES[column])}")
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} must be an integer")
+
+
+def _latest_budget(user):
+    return Budget.objects.filter(user=user).order_by('-created_at')
+
+
+def _month_spent(user):
+    return (CategorySpend.objects.filter(user=user, period=period_start(), category__in=ALLOCATION_CATEGORIES)
+            .values_list('category', 'spent'))
+
+
+def savings_features(user, overrides=None):
+    """Model input record from the latest budget and this month's spending; None without a budget"""
+    budget = _latest_budget(user).first()
+    if budget is None:
+        return None
+    return _features(budget, dict(_month_spent(user)), overrides)
+
+
+async def asavings_features(user, overrides=None):
+    """savings_features() on the async ORM"""
+    budget = await _latest_budget(user).afirst()
+    if budget is None:
+        return None
+    return _features(budget, {cat: spent async for cat, spent in _month_spent(user)}, overrides)
+
+
+def _features(budget, spent, overrides):
+    income = float(budget.income)
+    record = {
+        **DEFAULT_PROFILE,
+        'Income': income,
+        'Disposable_Income': float(budget.disposable_income),
+        'Desired_Savings': income * budget.savings_percentage / 100,
+    }
+    record.update({cat: float(spent.get(cat, 0)) for cat in ALLOCATION_CATEGORIES})
+    for field, column in PROFILE_FIELDS.items():
+        value = (overrides or {}).get(field)
+        if value not in (None, ''):
+            record[column] = _profile_value(column, value)
+    return record
+
+
+def predict_user_savings(user, overrides=None):
+    """{'inputs', 'per_category', 'total'} from the savings model, or None without a budget"""
+    record = savings_features(user, overrides)
+    if record is None:
+        return None
+    return {'inputs': record, **predict_savings([record])[0]}
+
+
+def advice_savings(record):
+    """Monthly savings to base investment advice on: the model's prediction for
+    record, or DEFAULT_SAVINGS without a budget or a loadable model"""
+    if record is None:
+        return DEFAULT_SAVINGS
+    try:
+        return predict_savings([record])[0]['total']
+    except Exception as e:  # No h5py, no exported model, a corrupt export...
+        logger.warning("Savings prediction failed, advising on the default: %s", e)
+        return DEFAULT_SAVINGS
@@ -0,0 +1,232 @@
+"""Bulk loader for benchmark databases: synthetic users with budgets, savings
+goals and months of transaction history (manage.py seed_benchmark_data, and the
+benchmarks' shared fixture).
+
+Rows are generated a batch at a time and written with the backend's fastest
+bulk path: COPY ... FROM STDIN from an in-memory buffer on PostgreSQL,
+executemany() elsewhere (SQLite). Each batch commits on its own, so memory stays
+flat however many rows are loaded. Descriptions and amounts come from the
+categorizer's training-data generators (ml/create_training_data.py); incomes
+and fixed costs are drawn from data.csv.
+
+Model save() and signals are bypassed. The spend counters are rebuilt from the
+loaded history afterwards; anomaly stats are not (run backfill_anomaly_scores
+if a benchmark needs them).
+"""
+import io
+import itertools
+import json
+import random
+import re
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction as db_transaction
+from django.utils import timezone
+from .analytics import _month_bounds
+from .models import Budget, Category, Receipt, SavingsGoal, Transaction
+from .timeseries import month_sequence
+from .tracker import period_start, rebuild_counters
+from . import response_cache
+
+BATCH_SIZE = 20_000  # Rows per COPY / executemany() and per commit
+SOURCES = ('sms', 'manual', 'voice', 'receipt')
+SOURCE_WEIGHTS = (0.5, 0.3, 0.05, 0.15)
+GOAL_NAMES = ('Emergency Fund', 'Hajj', 'New Car', 'Wedding', 'Laptop', 'House Deposit', 'Education', 'Vacation')
+TRANSACTION_COLUMNS = ('user_id', 'text', 'amount', 'source', 'category_id', 'confidence', 'explanation',
+                       'anomaly_score', 'is_anomaly', 'created_at', 'fingerprint')
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_WORD = re.compile(r'[a-z]+')
+
+
+def _copy_value(value):
+    # PostgreSQL COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy(cursor, table, columns, batch):
+    buffer = io.StringIO()
+    for row in batch:
+        buffer.write('\t'.join(map(_copy_value, row)))
+        buffer.write('\n')
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    raw = cursor.cursor
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        buffer.seek(0)
+        raw.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _adapters(model, columns):
+    # executemany() gets raw DB-API values: dates and JSON go through the field, as the ORM would send them
+    adapters = []
+    for i, name in enumerate(columns):
+        field = model._meta.get_field(name)
+        if isinstance(field, (models.DateField, models.JSONField)):  # DateTimeField is a DateField
+            adapters.append((i, field))
+    return adapters
+
+
+def bulk_insert(model, columns, rows, batch_size=BATCH_SIZE):
+    """Stream rows (tuples in `columns` order) into model's table; returns (rows, seconds)"""
+    qn = connection.ops.quote_name
+    table, quoted = qn(model._meta.db_table), [qn(name) for name in columns]
+    adapters = _adapters(model, columns)
+    insert = f"INSERT INTO {table} ({', '.join(quoted)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    rows = iter(rows)
+    count, seconds = 0, 0.0
+    while True:
+        started = time.perf_counter()
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return count, seconds
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                _copy(cursor, table, quoted, batch)
+            else:
+                if adapters:
+                    batch = [list(row) for row in batch]
+                    for row in batch:
+                        for i, field in adapters:
+                            row[i] = field.get_db_prep_value(row[i], connection)
+                cursor.executemany(insert, batch)
+        count += len(batch)
+        seconds += time.perf_counter() - started
+
+
+def _description_pools(categories):
+    """Per category: (descriptions, matching categorizer-style explanations)"""
+    from ml.create_training_data import create_variations, generic_items, merchants
+    pools = []
+    for name in categories:
+        texts = sorted({v for base in merchants.get(name, []) + generic_items.get(name, [])
+                        for v in create_variations(base)}) or [name]
+        explanations = [f"Top contributing words: {', '.join(_WORD.findall(text.lower())[:5])} (matched to {name})"
+                        for text in texts]
+        pools.append((texts, explanations))
+    return pools
+
+
+def transaction_rows(user_ids, per_user, months, rng, chunk=10_000):
+    """Generate per_user transactions for each user, spread evenly over the last `months` months (oldest first)"""
+    from ml.create_training_data import AMOUNT_RANGES
+    names = list(AMOUNT_RANGES)
+    category_ids = [Category.objects.get_or_create(name=name)[0].pk for name in names]
+    pools = _description_pools(names)
+    pool_sizes = np.array([len(texts) for texts, _ in pools])
+    low = np.array([AMOUNT_RANGES[name][0] for name in names], dtype=float)
+    high = np.array([AMOUNT_RANGES[name][1] for name in names], dtype=float)
+    mu = np.log(low + (high - low) / 4)  # ml.create_training_data.generate_amount, vectorized
+
+    now = timezone.now()
+    periods = month_sequence(period_start(), months)
+    for user_id in user_ids:
+        for m, period in enumerate(periods):
+            k = per_user // months + (1 if m >= months - per_user % months else 0)  # Remainder goes to recent months
+            start, end = _month_bounds(period)
+            end = min(end, now)
+            step = (end - start).total_seconds() / max(k, 1)
+            base = start.timestamp()
+            for offset in range(0, k, chunk):
+                n = min(chunk, k - offset)
+                cats = rng.integers(len(names), size=n)
+                amounts = np.clip(np.exp(mu[cats] + rng.standard_normal(n)), low[cats], high[cats]).round(2)
+                picks = (rng.random(n) * pool_sizes[cats]).astype(int)
+                sources = rng.choice(len(SOURCES), size=n, p=SOURCE_WEIGHTS)
+                confidence = rng.uniform(55, 99.5, size=n).round(2)
+                stamps = base + (np.arange(offset, offset + n) + rng.random(n)) * step
+                for c, amount, pick, source, conf, ts in zip(cats.tolist(), amounts.tolist(), picks.tolist(),
+                                                              sources.tolist(), confidence.tolist(), stamps.tolist()):
+                    texts, explanations = pools[c]
+                    yield (user_id, texts[pick], f"{amount:.2f}", SOURCES[source], category_ids[c], conf,
+                           explanations[pick], None, False, datetime.fromtimestamp(ts, tz=dt_timezone.utc), None)
+
+
+def budget_rows(user_ids, per_user, months, rng):
+    """Budgets from data.csv profiles, the first at the start of the history and the rest spread after it"""
+    from ml.budget_initialization import initialize_budget
+    from ml.dataset import get_dataset
+    dataset = get_dataset()
+    periods = month_sequence(period_start(), months)
+    for user_id in user_ids:
+        row = dataset.row(int(rng.integers(len(dataset))))
+        fixed = {'Rent': row['Rent'], 'Loan_Repayment': row['Loan_Repayment'], 'Insurance': row['Insurance']}
+        pct = round(float(row['Desired_Savings_Percentage']), 2)
+        budget = initialize_budget(row['Income'], fixed, pct)
+        for b in range(per_user):
+            period = periods[b * len(periods) // per_user]
+            yield (user_id, f"{row['Income']:.2f}", f"{row['Rent']:.2f}", f"{row['Loan_Repayment']:.2f}",
+                   f"{row['Insurance']:.2f}", pct, f"{budget['disposable_income']:.2f}", f"{budget['savings_goal']:.2f}",
+                   {cat: round(v, 2) for cat, v in budget['allocations'].items()}, budget['explanation'],
+                   timezone.make_aware(datetime.combine(period, datetime.min.time())))
+
+
+def goal_rows(user_ids, per_user, rng):
+    today = timezone.localdate()
+    for user_id in user_ids:
+        for name in rng.choice(GOAL_NAMES, size=min(per_user, len(GOAL_NAMES)), replace=False).tolist():
+            target = round(float(rng.uniform(50_000, 2_000_000)), -3)
+            current = round(target * float(rng.random()), 2)
+            yield (user_id, name, f"{target:.2f}", f"{current:.2f}",
+                   today + timedelta(days=int(rng.integers(90, 1825))), round(min(current / target * 100, 100), 2))
+
+
+def seed_users(prefix, count):
+    """Create users prefix_0 .. prefix_{count-1}; returns their ids"""
+    now = timezone.now()
+    rows = ((f"{prefix}_{i}", '!', None, False, '', '', '', False, True, now) for i in range(count))  # '!': no login
+    bulk_insert(User, ('username', 'password', 'last_login', 'is_superuser', 'first_name', 'last_name', 'email',
+                       'is_staff', 'is_active', 'date_joined'), rows)
+    return list(User.objects.filter(username__startswith=f"{prefix}_").order_by('pk').values_list('pk', flat=True))
+
+
+def seed(user_ids, transactions=0, months=12, budgets=0, goals=0, random_seed=None, counters=True,
+         batch_size=BATCH_SIZE):
+    """Load budgets, goals and `transactions` per user for existing users; returns {table: (rows, seconds)}"""
+    rng = np.random.default_rng(random_seed)
+    random.seed(random_seed)  # create_variations() draws from the random module
+    stats = {}
+    if budgets:
+        stats['budgets'] = bulk_insert(Budget, (
+            'user_id', 'income', 'rent', 'loan_repayment', 'insurance', 'savings_percentage', 'disposable_income',
+            'savings_goal', 'allocations', 'explanation', 'created_at'), budget_rows(user_ids, budgets, months, rng),
+            batch_size)
+    if goals:
+        stats['savings goals'] = bulk_insert(SavingsGoal, (
+            'user_id', 'name', 'target_amount', 'current_amount', 'deadline', 'progress'),
+            goal_rows(user_ids, goals, rng), batch_size)
+    if transactions:
+        stats['transactions'] = bulk_insert(Transaction, TRANSACTION_COLUMNS,
+                                            transaction_rows(user_ids, transactions, months, rng), batch_size)
+        if counters:
+            started = time.perf_counter()
+            stats['spend counters'] = rebuild_counters(user_ids), time.perf_counter() - started
+    for user_id in user_ids:
+        response_cache.bump_version(user_id)  # Nothing above went through the signals
+    return stats
+
+
+def drop_users(user_ids):
+    """Delete seeded users; their transactions go with raw deletes instead of a signal per row"""
+    qn = connection.ops.quote_name
+    tx_table = qn(Transaction._meta.db_table)
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(user_ids), 500):
+            chunk = list(user_ids[i:i + 500])
+            marks = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {qn(Receipt._meta.db_table)} WHERE transaction_id IN "
+                           f"(SELECT id FROM {tx_table} WHERE user_id IN ({marks}))", chunk)
+            cursor.execute(f"DELETE FROM {tx_table} WHERE user_id IN ({marks})", chunk)
+        User.objects.filter(pk__in=user_ids).delete()
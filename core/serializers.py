@@ -1,5 +1,7 @@
+from decimal import Decimal
+from django.db import models
 from rest_framework import serializers
-from .models import Budget, Transaction 
+from .models import Budget, Transaction
 class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
@@ -8,4 +10,59 @@ class BudgetSerializer(serializers.ModelSerializer):
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class LeanSerializer:
+    """Read-only serializer with the output of the matching '__all__' ModelSerializer.
+
+    Field metadata is resolved once per class, not per row: querysets are read
+    with values_list() straight into dicts, instances by attribute. Decimals are
+    quantized to strings as DRF's DecimalField does; datetimes are left to the
+    JSON renderer (core/renderers.py), which writes them the way DRF does.
+    """
+    model = None
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.model._meta
+        model_fields = [meta.get_field(name) for name in cls.fields]
+        cls.columns = [field.attname for field in model_fields]  # 'user' -> 'user_id'
+        cls.decimals = [(i, Decimal(1).scaleb(-field.decimal_places)) for i, field in enumerate(model_fields)
+                        if isinstance(field, models.DecimalField)]
+        cls.floats = [i for i, field in enumerate(model_fields) if isinstance(field, models.FloatField)]
+
+    @classmethod
+    def _row(cls, values):
+        for i, quantum in cls.decimals:
+            value = values[i]
+            if value is not None:
+                if not isinstance(value, Decimal):
+                    value = Decimal(str(value))  # Unsaved instances may still hold floats
+                values[i] = f"{value.quantize(quantum):f}"
+        return dict(zip(cls.fields, values))
+
+    @classmethod
+    def many(cls, queryset):
+        return [cls._row(list(values)) for values in queryset.values_list(*cls.columns)]
+
+    @classmethod
+    def one(cls, instance):
+        values = [getattr(instance, column) for column in cls.columns]
+        for i in cls.floats:
+            if values[i] is not None:
+                values[i] = float(values[i])  # e.g. NumPy scalars from the models
+        return cls._row(values)
+
+
+class TransactionReadSerializer(LeanSerializer):
+    model = Transaction
+    fields = ('id', 'text', 'amount', 'source', 'confidence', 'explanation', 'anomaly_score', 'is_anomaly',
+              'created_at', 'fingerprint', 'user', 'category')
+
+
+class BudgetReadSerializer(LeanSerializer):
+    model = Budget
+    fields = ('id', 'income', 'rent', 'loan_repayment', 'insurance', 'savings_percentage', 'disposable_income',
+              'savings_goal', 'allocations', 'explanation', 'created_at', 'user')
@@ -0,0 +1,63 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .models import ArchivedMonth, Budget, Category, Transaction
+from . import tracker, anomaly, response_cache, archive
+
+
+@receiver(pre_save, sender=Transaction)
+def score_transaction_anomaly(sender, instance, raw=False, **kwargs):
+    # Only new rows are scored; the score is stored on the row being inserted
+    if instance._state.adding and not raw:
+        anomaly.score_transaction(instance)
+
+
+SPEND_FIELDS = {'user', 'user_id', 'amount', 'category', 'category_id', 'created_at'}
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_stored_spend(sender, instance, raw=False, update_fields=None, **kwargs):
+    # An edit moves the spend between counters; what they counted is only in the database now
+    instance._stored_spend = None
+    if instance._state.adding or raw or (update_fields is not None and not SPEND_FIELDS & set(update_fields)):
+        return
+    instance._stored_spend = tracker.stored_spend(instance.pk)
+
+
+@receiver(post_save, sender=Transaction)
+def track_transaction_spend(sender, instance, created, **kwargs):
+    if created:
+        tracker.record_transaction(instance)
+    elif getattr(instance, '_stored_spend', None) is not None:
+        tracker.update_transaction(instance._stored_spend, instance)
+        instance._stored_spend = None
+
+
+@receiver(pre_delete, sender=Category)
+def uncategorize_spend(sender, instance, **kwargs):
+    tracker.uncategorize(instance)
+
+
+@receiver(post_delete, sender=Transaction)
+def untrack_transaction_spend(sender, instance, **kwargs):
+    tracker.reverse_transaction(instance)
+
+
+@receiver(post_save, sender=Budget)
+def refresh_budget_allocations(sender, instance, **kwargs):
+    tracker.apply_budget(instance)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def invalidate_cached_responses(sender, instance, raw=False, **kwargs):
+    if not raw:
+        response_cache.bump_version_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=ArchivedMonth)
+def remove_archive_segment(sender, instance, **kwargs):
+    # e.g. the user was deleted; the file goes once the delete commits
+    transaction.on_commit(lambda: archive.remove_segment(instance.path))
@@ -1 +1,1379 @@
-from django.test import TestCase
\ No newline at end of file
+import asyncio
+import base64
+import csv
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from ml import allocation_profile, charts, chatbot, cohort_stats, dataset, inflation_engine, intent_index, savings_model
+from ml.allocation_profile import ALLOCATION_CATEGORIES
+from ml.budget_initialization import initialize_budget
+from ml.budget_simulator import MAX_SCENARIOS, expand_axis, simulate_budgets
+from ml.analytics import csv_analytics, generate_analytics
+from ml.dataset import get_dataset
+from ml.inflation_forecast import forecast_expenses
+from ml.market_data import (FALLBACK_PRICES, CircuitBreaker, CoinGeckoSource, FileSource, MarketDataProvider,
+                            StaticSource, make_source)
+from ml.multi_modal_input import build_receipt
+from . import analytics, anomaly, archive, async_views, dedup, metrics, response_cache, seeding, tracing, views, warmup
+from .analytics import _month_bounds
+from .management.commands.generate_monthly_reports import _render_user_report
+from .middleware import server_timing
+from .models import ArchivedMonth, Budget, Category, CategorySpend, Receipt, SavingsGoal, SpendStats, Transaction
+from .receipts import consolidate_receipts
+from .renderers import FastJSONRenderer
+from .savings import DEFAULT_SAVINGS
+from .serializers import BudgetReadSerializer, BudgetSerializer, TransactionReadSerializer, TransactionSerializer
+from .timeseries import MAX_MONTHS, month_sequence, rolling_mean, spending_trends
+from .tracker import alert_level, budget_status, period_start, rebuild_counters, record_spend
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-responses'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheTestCase(TestCase):
+    """Starts with empty caches: user ids repeat between tests, so versions and idempotency keys would too"""
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+
+class DatasetTestCase(TestCase):
+    """Gives each test a scratch directory for CSVs, with the dataset cache inside it"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        cache_root = patch('ml.dataset.CACHE_ROOT', os.path.join(self.tmp, 'cache'))
+        cache_root.start()
+        self.addCleanup(cache_root.stop)
+        self.addCleanup(dataset.clear_cache)
+        self.addCleanup(allocation_profile.clear_cache)
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+
+def counters(user):
+    return sorted(CategorySpend.objects.filter(user=user).values_list('period', 'category', 'spent', 'transaction_count'))
+
+
+class BuildReceiptTests(TestCase):
+    def test_items_total_and_merchant(self):
+        receipt = build_receipt([('KFC Lahore', 0.0, False), ('Zinger', 650.0, False), ('Fries', 250.0, False),
+                                 ('Sub Total', 900.0, False), ('GST', 45.0, False), ('Total', 945.0, False)])
+        self.assertEqual(receipt['merchant'], 'KFC Lahore')
+        self.assertEqual(receipt['items'], [['Zinger', 650.0], ['Fries', 250.0], ['GST', 45.0]])
+        self.assertEqual(receipt['printed_total'], 945.0)
+        self.assertEqual(receipt['amount'], 945.0)  # The printed total, not the items plus the totals
+        self.assertEqual(receipt['text'], 'KFC Lahore: Zinger, Fries, GST')
+
+    def test_sum_of_items_without_a_total(self):
+        receipt = build_receipt([('Milk', 220.0, False), ('Bread', 150.5, False)])
+        self.assertIsNone(receipt['printed_total'])
+        self.assertEqual(receipt['amount'], 370.5)
+
+    def test_annotated_total(self):
+        receipt = build_receipt([('Chai', 80.0, False), ('', 80.0, True)])
+        self.assertEqual(receipt['items'], [['Chai', 80.0]])
+        self.assertEqual(receipt['printed_total'], 80.0)
+
+    def test_header_and_total_only(self):
+        receipt = build_receipt([('KFC Lahore 0', 0.0, False), ('Total', 500.0, False)])
+        self.assertEqual(receipt['items'], [])
+        self.assertEqual(receipt['amount'], 500.0)
+
+    def test_nothing_priced(self):
+        self.assertIn('error', build_receipt([('KFC Lahore', 0.0, False), ('Thank you', 0.0, False)]))
+
+
+class ConsolidateReceiptsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='receipts')
+        self.food = Category.objects.create(name='Eating_Out')
+
+    def lines(self, *lines):
+        return [Transaction.objects.create(user=self.user, text=text, amount=amount, source='receipt',
+                                           category=self.food)
+                for text, amount in lines]
+
+    def test_one_transaction_per_upload(self):
+        first = self.lines(('KFC Lahore', 0), ('Zinger', 650), ('Fries', 250), ('Total', 900))
+        second = self.lines(('Chai', 80), ('Total', 80))
+        self.assertEqual(consolidate_receipts([self.user.pk]), (2, 4))
+
+        rows = list(Transaction.objects.filter(user=self.user).order_by('id'))
+        self.assertEqual([tx.pk for tx in rows], [first[0].pk, second[0].pk])
+        self.assertEqual(rows[0].amount, Decimal('900.00'))
+        self.assertEqual(rows[0].text, 'KFC Lahore: Zinger, Fries')
+        self.assertEqual(rows[0].receipt.items, [['Zinger', 650.0], ['Fries', 250.0]])
+        self.assertEqual(rows[1].receipt.printed_total, Decimal('80.00'))
+        self.assertEqual(counters(self.user), [(period_start(), 'Eating_Out', Decimal('980.00'), 2)])
+
+    def test_header_and_total_only(self):
+        header, total = self.lines(('KFC Lahore 0', 0), ('Total', 500))
+        self.assertEqual(consolidate_receipts([self.user.pk]), (1, 1))
+        tx = Transaction.objects.get(user=self.user)
+        self.assertEqual(tx.pk, header.pk)
+        self.assertEqual(tx.amount, Decimal('500.00'))
+        self.assertEqual(tx.receipt.items, [])
+
+    def test_dry_run_changes_nothing(self):
+        self.lines(('Zinger', 650), ('Total', 650))
+        self.assertEqual(consolidate_receipts([self.user.pk], dry_run=True), (1, 1))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Receipt.objects.exists())
+
+    def test_single_rows_are_left_alone(self):
+        self.lines(('Receipt: Zinger, Fries', 900))
+        self.assertEqual(consolidate_receipts([self.user.pk]), (0, 0))
+
+
+class ExpenseInputTests(CacheTestCase):
+    url = '/core/api/expenses/input/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='expenses')
+
+    def post(self, kind, data, **headers):
+        return self.client.post(self.url, {'type': kind, 'data': data}, content_type='application/json', **headers)
+
+    def test_fingerprint_all(self):
+        txs = dedup.fingerprint_all(1, [
+            {'text': 'Chai', 'amount': 80, 'source': 'receipt'},
+            {'text': 'chai.', 'amount': 80.0, 'source': 'receipt'},  # The same line twice on one receipt
+            {'text': 'Chai', 'amount': 80, 'source': 'manual'},
+        ], bucket=1)
+        self.assertEqual(len({txs[0]['fingerprint'], txs[1]['fingerprint']}), 2)
+        self.assertEqual(txs[0]['fingerprint'], dedup.fingerprint(1, '80.00', 'CHAI', 'receipt', 1))
+        self.assertIsNone(txs[2]['fingerprint'])
+
+    def test_sms_resync_is_stored_once(self):
+        first = self.post('sms', 'Rs.1200 debited for KFC Lahore')
+        again = self.post('sms', 'Rs.1200 debited for KFC Lahore')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()[0]['id'], first.json()[0]['id'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_fingerprint_catches_what_the_input_hash_misses(self):
+        self.post('sms', 'Rs.1200 debited for KFC Lahore')
+        again = self.post('sms', 'Rs 1200 debited for kfc lahore')  # Other raw text, same transaction
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_repeated_manual_entries_are_separate_purchases(self):
+        self.assertEqual(self.post('manual', 'Tea|50').status_code, 201)
+        self.assertEqual(self.post('manual', 'Tea|50').status_code, 201)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+    def test_idempotency_key(self):
+        first = self.post('manual', 'Tea|50', HTTP_IDEMPOTENCY_KEY='retry-1')
+        again = self.post('manual', 'Tea|50', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(again.json()[0]['id'], first.json()[0]['id'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_deleted_transaction_can_be_entered_again(self):
+        first = self.post('sms', 'Rs.300 debited for Careem')
+        Transaction.objects.filter(pk=first.json()[0]['id']).delete()
+        self.assertEqual(self.post('sms', 'Rs.300 debited for Careem').status_code, 201)
+
+
+class ArchiveTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_dir = tempfile.mkdtemp()
+        self.archive_settings = override_settings(FINWISE_ARCHIVE_DIR=self.archive_dir)
+        self.archive_settings.enable()
+        self.user = User.objects.create(username='archive')
+        food, transport = Category.objects.create(name='Eating_Out'), Category.objects.create(name='Transport')
+        self.old = month_sequence(period_start(), 15)[0]
+        for text, amount, category in [('Zinger', '650.00', food), ('Careem', '320.50', transport),
+                                       ('Fries', '250.00', food), ('Misc', '99.99', None)]:
+            Transaction.objects.create(user=self.user, text=text, amount=amount, source='manual', category=category)
+        Transaction.objects.create(user=self.user, text='Chai', amount='80.00', source='manual', category=food)
+        old_ids = list(Transaction.objects.exclude(text='Chai').values_list('pk', flat=True))
+        Transaction.objects.filter(pk__in=old_ids).update(
+            created_at=timezone.make_aware(datetime.combine(self.old.replace(day=10), time(12))))
+        rebuild_counters([self.user.pk])
+
+    def tearDown(self):
+        self.archive_settings.disable()
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        before_counters = counters(self.user)
+        before_totals = archive.spending_by_category(self.user.pk)
+        before_rows = list(archive.iter_transactions(self.user.pk))
+        self.assertEqual(archive.archivable_months(12, [self.user.pk]), [(self.user.pk, self.old)])
+
+        self.assertEqual(archive.archive_month(self.user.pk, self.old), 4)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+        month = ArchivedMonth.objects.get(user=self.user, period=self.old)
+        self.assertEqual(month.total, Decimal('1320.49'))
+        self.assertEqual(month.by_category['Eating_Out'], ['900.00', 2])
+
+        # The counters are rebuilt to the same numbers from the summaries
+        rebuild_counters([self.user.pk])
+        self.assertEqual(counters(self.user), before_counters)
+        self.assertEqual(archive.spending_by_category(self.user.pk), before_totals)
+        self.assertEqual(list(archive.iter_transactions(self.user.pk)), before_rows)
+        # A range cutting through the archived month reads its segment
+        start, end = _month_bounds(self.old)
+        self.assertEqual(archive.spending_by_category(self.user.pk, start.replace(day=5), end),
+                         {'Eating_Out': 900.0, 'Transport': 320.5, 'Uncategorized': 99.99})
+
+    def test_late_rows_are_merged_into_the_segment(self):
+        archive.archive_month(self.user.pk, self.old)
+        path = ArchivedMonth.objects.get(user=self.user).path
+        late = Transaction.objects.create(user=self.user, text='Late', amount='10.00', source='manual')
+        Transaction.objects.filter(pk=late.pk).update(created_at=_month_bounds(self.old)[0])
+        self.assertEqual(archive.archive_month(self.user.pk, self.old), 1)
+
+        month = ArchivedMonth.objects.get(user=self.user)
+        self.assertNotEqual(month.path, path)
+        self.assertEqual(month.transaction_count, 5)
+        self.assertEqual(len(archive.read_segment(month.path)[0]), 5)
+
+    def test_export_and_history_need_a_login(self):
+        archive.archive_month(self.user.pk, self.old)
+        for url in ('/core/api/transactions/export/', '/core/api/analytics/history/'):
+            self.assertIn(self.client.get(url).status_code, (401, 403))
+
+        self.client.force_login(self.user)
+        export = self.client.get('/core/api/transactions/export/')
+        rows = list(csv.reader(StringIO(b''.join(export.streaming_content).decode())))
+        self.assertEqual(rows[0], list(archive.FIELDS))
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ['Careem', 'Chai', 'Fries', 'Misc', 'Zinger'])
+        history = self.client.get('/core/api/analytics/history/').json()
+        self.assertEqual(history['total'], 1400.49)
+        self.assertEqual(self.client.get('/core/api/analytics/history/?start=nope').status_code, 400)
+
+
+class SpendCounterTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='counters')
+        self.food, self.transport = Category.objects.create(name='Groceries'), Category.objects.create(name='Transport')
+
+    def spend(self, amount, category=None):
+        return Transaction.objects.create(user=self.user, text='bench', amount=amount, source='manual',
+                                          category=category or self.food)
+
+    def test_insert_and_delete(self):
+        first, second = self.spend('100.00'), self.spend('50.50')
+        self.assertEqual(counters(self.user), [(period_start(), 'Groceries', Decimal('150.50'), 2)])
+        first.delete()
+        self.assertEqual(counters(self.user), [(period_start(), 'Groceries', Decimal('50.50'), 1)])
+
+    def test_edit_then_delete(self):
+        tx = self.spend('100.00')
+        tx.amount, tx.category = Decimal('500.00'), self.transport
+        tx.save()
+        self.assertEqual(counters(self.user), [(period_start(), 'Groceries', Decimal('0.00'), 0),
+                                               (period_start(), 'Transport', Decimal('500.00'), 1)])
+        tx.text = 'renamed'
+        tx.save(update_fields=['text'])  # Not a spend field: nothing moves
+        tx.delete()
+        self.assertEqual(counters(self.user), [(period_start(), 'Groceries', Decimal('0.00'), 0),
+                                               (period_start(), 'Transport', Decimal('0.00'), 0)])
+
+    def test_edit_into_another_month(self):
+        tx = self.spend('80.00')
+        last_month = month_sequence(period_start(), 2)[0]
+        tx.created_at = timezone.make_aware(datetime.combine(last_month.replace(day=15), time(12)))
+        tx.save()
+        self.assertEqual(counters(self.user), [(last_month, 'Groceries', Decimal('80.00'), 1),
+                                               (period_start(), 'Groceries', Decimal('0.00'), 0)])
+
+    def test_deleted_category_moves_to_uncategorized(self):
+        tx = self.spend('70.00')
+        self.food.delete()
+        self.assertEqual(counters(self.user), [(period_start(), 'Groceries', Decimal('0.00'), 0),
+                                               (period_start(), 'Uncategorized', Decimal('70.00'), 1)])
+        Transaction.objects.get(pk=tx.pk).delete()
+        self.assertEqual(counters(self.user)[-1], (period_start(), 'Uncategorized', Decimal('0.00'), 0))
+
+    def test_counters_match_a_rebuild(self):
+        self.spend('120.00')
+        tx = self.spend('30.00', self.transport)
+        tx.amount = Decimal('45.00')
+        tx.save()
+        before = [row for row in counters(self.user) if row[3]]
+        rebuild_counters([self.user.pk])
+        self.assertEqual(counters(self.user), before)
+
+    def test_alerts(self):
+        Budget.objects.create(user=self.user, income=50000, allocations={'Groceries': 1000, 'Transport': 500})
+        self.assertIsNone(record_spend(self.user.pk, 'Groceries', 700))
+        self.assertEqual(record_spend(self.user.pk, 'Groceries', 100), 80)
+        self.assertIsNone(record_spend(self.user.pk, 'Groceries', 50))  # Already alerted at 80
+        self.assertEqual(record_spend(self.user.pk, 'Groceries', 150), 100)
+
+        status = budget_status(self.user)
+        groceries = next(row for row in status['categories'] if row['category'] == 'Groceries')
+        self.assertEqual((groceries['spent'], groceries['remaining'], groceries['alert']), (1000.0, 0.0, 100))
+        self.assertEqual(status['alerts'], ['Groceries'])
+        self.assertEqual(alert_level(Decimal('79.99'), Decimal('100')), 0)
+        self.assertEqual(alert_level(Decimal('10'), None), 0)
+
+
+class WarmupTests(TestCase):
+    def test_configured_tasks(self):
+        self.assertEqual(warmup.configured_tasks(''), [])
+        self.assertEqual(warmup.configured_tasks('all'), list(warmup.TASKS))
+        self.assertEqual(warmup.configured_tasks('charts, dataset'), ['dataset', 'charts'])  # In TASKS order
+        with self.assertRaisesRegex(ValueError, 'nope'):
+            warmup.configured_tasks('dataset,nope')
+
+    def test_failed_task_is_logged_and_skipped(self):
+        def broken():
+            raise RuntimeError('no model file')
+
+        with patch.dict(warmup.TASKS, {'dataset': broken, 'allocation_profile': lambda: None}), \
+                self.assertLogs('finwise.warmup') as logs:
+            timings = warmup.run('dataset,allocation_profile')
+        self.assertEqual(list(timings), ['allocation_profile'])
+        self.assertIn("WARNING:finwise.warmup:Warm-up 'dataset' failed: no model file", logs.output)
+        self.assertTrue(any(line.startswith('INFO:finwise.warmup:Warm-up: allocation_profile') for line in logs.output))
+
+
+def basic_auth(username, password):
+    return {'HTTP_AUTHORIZATION': 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()}
+
+
+class AsyncViewTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = User.objects.create_user('first', password='pw')
+        self.second = User.objects.create_user('second', password='pw')
+        provider = patch('ml.market_data._provider', MarketDataProvider(StaticSource()))
+        provider.start()
+        self.addCleanup(provider.stop)
+
+        async def features(user, overrides=None):
+            return {'user': user.username}
+
+        # Each user's "prediction" is recognizable in the advice
+        for target, value in (('asavings_features', features),
+                              ('advice_savings', lambda record: {'first': 1000, 'second': 50000}[record['user']])):
+            patcher = patch(f'core.async_views.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_investment_honours_basic_auth(self):
+        response = self.client.get('/core/api/async/investment/', **basic_auth('second', 'pw'))
+        self.assertEqual(response.json()['savings_amount_used'], 50000)
+        self.assertEqual(response.json()['market_data'], FALLBACK_PRICES)
+
+    def test_investment_session_and_anonymous(self):
+        self.assertEqual(self.client.get('/core/api/async/investment/').json()['savings_amount_used'], 1000)
+        self.client.force_login(self.second)
+        self.assertEqual(self.client.get('/core/api/async/investment/').json()['savings_amount_used'], 50000)
+
+    def test_bad_credentials_are_rejected(self):
+        response = self.client.get('/core/api/async/investment/', **basic_auth('second', 'wrong'))
+        self.assertEqual(response.status_code, 403)  # As the sync views: SessionAuthentication comes first
+        self.assertEqual(response.json(), {'detail': 'Invalid username/password.'})
+
+    def test_chatbot_csrf_only_for_session_logins(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.second)
+        self.assertEqual(client.post('/core/api/async/chatbot/', {'query': 'hello'},
+                                     content_type='application/json').status_code, 403)
+        client.logout()
+        response = client.post('/core/api/async/chatbot/', {'query': 'hello'}, content_type='application/json',
+                               **basic_auth('second', 'pw'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['response'])
+        self.assertEqual(client.post('/core/api/async/chatbot/', 'not json', content_type='application/json',
+                                     **basic_auth('second', 'pw')).status_code, 400)
+
+    def test_report_is_a_pdf(self):
+        response = self.client.get('/core/api/async/report/', **basic_auth('second', 'pw'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+
+class ResponseCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cached', password='pw')
+        self.client.force_login(self.user)
+        provider = patch('ml.market_data._provider', MarketDataProvider(StaticSource()))
+        provider.start()
+        self.addCleanup(provider.stop)
+
+    def spend(self):
+        with self.captureOnCommitCallbacks(execute=True):  # The version is bumped once the save commits
+            Transaction.objects.create(user=self.user, text='Chai', amount='80.00', source='manual')
+
+    def check_revalidation(self, url, module, compute):
+        with patch.object(module, compute, wraps=getattr(module, compute)) as calls:
+            first = self.client.get(url)
+            etag = first['ETag']
+            self.assertEqual(first['Cache-Control'], 'private, no-cache')
+            hit = self.client.get(url)
+            self.assertEqual((hit.status_code, hit['ETag'], hit.content), (200, etag, first.content))
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((not_modified.status_code, not_modified['ETag']), (304, etag))
+            self.assertEqual(calls.call_count, 1)  # Only the miss computed anything
+
+            self.spend()
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed['ETag'], etag)
+            self.assertEqual(calls.call_count, 2)
+
+    def test_sync_analytics(self):
+        self.check_revalidation('/core/api/analytics/', views, 'generate_analytics')
+
+    def test_sync_investment(self):
+        self.check_revalidation('/core/api/investment/', views, 'investment_insights')
+
+    def test_async_investment(self):
+        self.check_revalidation('/core/api/async/investment/', async_views, 'investment_insights')
+
+    def test_users_do_not_share_entries(self):
+        etag = self.client.get('/core/api/analytics/')['ETag']
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertNotEqual(self.client.get('/core/api/analytics/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class SavingsModelTests(TestCase):
+    def records(self, n=20):
+        dataset = get_dataset()
+        return [dataset.row(i) for i in range(n)]
+
+    def test_export_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            export_file = os.path.join(tmp, 'savings_model.npz')
+            exported = savings_model.export_model(export_file=export_file)
+            loaded = savings_model.SavingsModel.load(export_file)
+        records = self.records()
+        np.testing.assert_array_equal(loaded.predict_records(records), exported.predict_records(records))
+
+    def test_missing_model_is_unavailable(self):
+        with patch.multiple(savings_model, _model=None, MODEL_FILE='/nonexistent/model.h5'), \
+                self.assertRaises(savings_model.ModelUnavailable):
+            savings_model.get_model()
+
+    @skipUnless(find_spec('tensorflow'), "TensorFlow not installed")
+    def test_numpy_matches_keras(self):
+        model = savings_model.get_model()
+        X = model.features(self.records(200))
+        expected = savings_model.load_keras_model().predict_on_batch(X)
+        np.testing.assert_allclose(model.predict(X), expected, rtol=1e-4, atol=1e-2)
+
+
+class SavingsPredictionViewTests(CacheTestCase):
+    url = '/core/api/savings/predict/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('saver')
+        self.client.force_login(self.user)
+        provider = patch('ml.market_data._provider', MarketDataProvider(StaticSource()))
+        provider.start()
+        self.addCleanup(provider.stop)
+
+    def test_prediction(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)  # No budget yet
+        Budget.objects.create(user=self.user, income=80000, rent=20000, savings_percentage=10)
+        result = self.client.get(self.url, {'age': 40, 'occupation': 'Student'}).json()
+        self.assertEqual(set(result['per_category']), set(ALLOCATION_CATEGORIES))
+        self.assertAlmostEqual(result['total'], sum(result['per_category'].values()), places=1)
+        self.assertEqual((result['inputs']['Age'], result['inputs']['Occupation']), (40, 'Student'))
+        self.assertEqual(self.client.get(self.url, {'occupation': 'Pilot'}).status_code, 400)
+
+    def test_unloadable_model(self):
+        Budget.objects.create(user=self.user, income=80000, allocations={})
+        with patch('ml.savings_model.get_model', side_effect=savings_model.ModelUnavailable('OSError: no export')), \
+                self.assertLogs('finwise', 'WARNING'):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('error', response.json())
+            # Investment advice falls back to the default savings instead
+            advice = self.client.get('/core/api/investment/').json()
+            self.assertEqual(advice['savings_amount_used'], DEFAULT_SAVINGS)
+
+
+class ReportTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reporter', password='pw')
+        self.client.force_login(self.user)
+        groceries = Category.objects.create(name='Groceries')
+        Transaction.objects.create(user=self.user, text='Imtiaz', amount='2500.00', source='manual', category=groceries)
+
+    def test_report_is_rendered_in_memory(self):
+        response = self.client.get('/core/api/report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="spending_report.pdf"', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_batch_reuses_cached_analytics(self):
+        with patch.object(analytics, 'spending_by_category', wraps=analytics.spending_by_category) as compute, \
+                tempfile.TemporaryDirectory() as output_dir:
+            self.assertEqual(self.client.get('/core/api/analytics/').status_code, 200)
+            _, path, timings = _render_user_report(self.user.id, period_start(), output_dir)
+            self.assertEqual(compute.call_count, 1)  # The report reused the view's analytics
+            with open(path, 'rb') as f:
+                self.assertTrue(f.read().startswith(b'%PDF'))
+            self.assertEqual(set(timings), {'analytics', 'chart', 'pdf', 'write'})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Transaction.objects.create(user=self.user, text='Careem', amount='400.00', source='manual')
+            _render_user_report(self.user.id, period_start(), output_dir)
+            self.assertEqual(compute.call_count, 2)  # New data, new version
+
+    def test_months_are_cached_apart(self):
+        last_month = (period_start() - timedelta(days=1)).replace(day=1)
+        with patch.object(analytics, 'spending_by_category', wraps=analytics.spending_by_category) as compute:
+            self.assertIsNotNone(analytics.cached_transaction_analytics(self.user.id))
+            self.assertIsNone(analytics.cached_transaction_analytics(self.user.id, last_month))
+            self.assertIsNone(analytics.cached_transaction_analytics(self.user.id, last_month))  # A cached None
+        self.assertEqual(compute.call_count, 2)
+
+
+class AllocationProfileTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        # Groceries is flat, Eating_Out grows with income, so the bands differ
+        rows = []
+        for i in range(10):
+            row = {'Income': (i + 1) * 10000, **{cat: 100 for cat in ALLOCATION_CATEGORIES}}
+            row.update(Groceries=1000, Eating_Out=i * 200)
+            row.update({f'Potential_Savings_{cat}': 10 for cat in ALLOCATION_CATEGORIES}, Potential_Savings_Groceries=250)
+            rows.append(row)
+        self.data_file = self.write_csv('profile.csv', rows)
+
+    def test_ratios(self):
+        profile = allocation_profile.get_profile(self.data_file)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, 'profile.allocation_profile.json')))
+        overall = allocation_profile.allocation_ratios(profile=profile)
+        self.assertAlmostEqual(sum(overall.values()), 1.0)
+        self.assertAlmostEqual(overall['Groceries'], 10000 / (10000 + 9000 + 6 * 1000))  # Column sums over their total
+
+        low, high = allocation_profile.allocation_ratios(15000, profile), allocation_profile.allocation_ratios(95000, profile)
+        self.assertEqual((allocation_profile.income_band(15000, profile), allocation_profile.income_band(95000, profile)),
+                         (0, allocation_profile.INCOME_BANDS - 1))
+        self.assertAlmostEqual(sum(high.values()), 1.0)
+        self.assertGreater(low['Groceries'], high['Groceries'])
+        self.assertLess(low['Eating_Out'], high['Eating_Out'])
+        self.assertAlmostEqual(allocation_profile.savings_ratios(profile)['Groceries'], 0.25)
+
+    def test_artifact_is_reused_until_the_source_changes(self):
+        allocation_profile.get_profile(self.data_file)
+        allocation_profile.clear_cache()
+        with patch.object(allocation_profile, 'build_profile', wraps=allocation_profile.build_profile) as build:
+            allocation_profile.get_profile(self.data_file)  # A new process: reads the artifact
+            self.assertEqual(build.call_count, 0)
+            with open(self.data_file, 'a') as f:
+                f.write(','.join(['110000'] + ['100'] * (len(ALLOCATION_CATEGORIES) * 2)) + '\n')
+            allocation_profile.clear_cache()
+            dataset.clear_cache()
+            self.assertEqual(allocation_profile.get_profile(self.data_file)['rows'], 11)
+            self.assertEqual(build.call_count, 1)
+
+    def test_initialize_budget(self):
+        budget = initialize_budget(15000, {'Rent': 3000, 'Loan': 1000}, 20, self.data_file)
+        self.assertEqual((budget['savings_goal'], budget['disposable_income']), (3000, 8000))
+        self.assertAlmostEqual(sum(budget['allocations'].values()), 8000)
+        ratios = allocation_profile.allocation_ratios(15000, allocation_profile.get_profile(self.data_file))
+        self.assertEqual(budget['allocations'], {cat: 8000 * ratio for cat, ratio in ratios.items()})
+        self.assertIn('income band 1/5', budget['explanation'])
+
+
+class BudgetSimulatorTests(TestCase):
+    def test_grid_matches_initialize_budget(self):
+        grid = {'income': [40000, 120000], 'rent': {'start': 0, 'stop': 10000, 'step': 5000},
+                'insurance': 1500, 'savings_percentage': {'start': 10, 'stop': 20, 'num': 2}}
+        result = simulate_budgets(grid)
+        self.assertEqual((result['count'], result['shape']), (12, [2, 3, 1, 1, 2]))
+        self.assertEqual(result['axes']['rent'], [0, 5000, 10000])
+        # Row 7 of the C-order grid: income 120000, rent 0, savings 20%
+        budget = initialize_budget(120000, {'Rent': 0, 'Insurance': 1500}, 20)
+        self.assertEqual(result['columns']['savings_goal'][7], budget['savings_goal'])
+        self.assertEqual(result['columns']['disposable_income'][7], budget['disposable_income'])
+        for cat, amount in budget['allocations'].items():
+            self.assertAlmostEqual(result['allocations'][cat][7], amount, places=2)
+
+    def test_invalid_axes(self):
+        for spec in [{'start': 0, 'stop': 10, 'num': 0}, {'start': 0, 'stop': 10, 'num': MAX_SCENARIOS},
+                     {'start': 0, 'stop': 10, 'step': 0}, {'start': 0, 'stop': 1e9, 'step': 1},
+                     {'start': 'a', 'stop': 10, 'step': 1}, [], ['a'], 'lots']:
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                expand_axis('income', spec)
+        with self.assertRaisesMessage(ValueError, 'the limit is 10'):
+            simulate_budgets({'income': list(range(4)), 'rent': list(range(3))}, max_scenarios=10)
+
+    def test_view_is_read_only(self):
+        response = self.client.post('/core/api/budget/simulate/', {'income': [50000, 60000], 'rent': 10000},
+                                    content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['count']), (200, 2))
+        bad = self.client.post('/core/api/budget/simulate/', {'income': {'start': 0, 'stop': 10}},
+                               content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+        self.assertIn('step', bad.json()['error'])
+        self.assertFalse(Budget.objects.exists())
+
+
+@patch('ml.analytics.ANALYTICS_SOURCE', 'db')
+class DbAnalyticsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, other = User.objects.create(username='analytics'), User.objects.create(username='other')
+        food, self.gym = Category.objects.create(name='Groceries'), Category.objects.create(name='Gym')
+        for user, text, amount, category in [(self.user, 'Imtiaz', '1200.00', food), (self.user, 'Metro', '300.50', food),
+                                             (self.user, 'Membership', '4000.00', self.gym), (self.user, 'Misc', '99.50', None),
+                                             (other, 'Imtiaz', '7000.00', food)]:
+            Transaction.objects.create(user=user, text=text, amount=amount, source='manual', category=category)
+        last_month = Transaction.objects.create(user=self.user, text='Old', amount='999.00', source='manual', category=food)
+        Transaction.objects.filter(pk=last_month.pk).update(created_at=_month_bounds()[0] - timedelta(days=3))
+
+    def test_month_is_aggregated_per_category(self):
+        self.assertEqual(analytics.spending_by_category(self.user.id, *_month_bounds()),
+                         {'Groceries': 1500.5, 'Gym': 4000.0, 'Uncategorized': 99.5})
+        result = analytics.transaction_analytics(self.user.id)
+        self.assertEqual(list(result['summary'])[:len(ALLOCATION_CATEGORIES)], ALLOCATION_CATEGORIES)
+        self.assertEqual(list(result['summary'])[len(ALLOCATION_CATEGORIES):], ['Gym', 'Uncategorized'])
+        self.assertAlmostEqual(result['total_spend'], 5600.0)
+        ratio = allocation_profile.savings_ratios()['Groceries']
+        self.assertAlmostEqual(result['potential_savings'], 1500.5 * ratio)  # Gym/Uncategorized have no ratio
+        self.assertIn('Highest category: Gym', result['insights'])
+
+        last_month = (period_start() - timedelta(days=1)).replace(day=1)
+        self.assertEqual(analytics.transaction_analytics(self.user.id, last_month)['total_spend'], 999.0)
+
+    def test_csv_fallback(self):
+        self.assertEqual(generate_analytics(self.user.id)['total_spend'], 5600.0)
+        fresh = User.objects.create(username='fresh')
+        self.assertEqual(generate_analytics(fresh.id), csv_analytics(None))  # No transactions this month
+        self.assertEqual(generate_analytics(None), csv_analytics(None))
+        self.assertEqual(generate_analytics(self.user.id, source='csv'), csv_analytics(self.user.id))
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/core/api/analytics/').json()['summary']['Gym'], 4000.0)
+
+
+class DatasetCacheTests(DatasetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data_file = self.write_csv('users.csv', [
+            {'user_id': 7, 'Income': 50000.5, 'Occupation': 'Student'},
+            {'user_id': 3, 'Income': 80000.0, 'Occupation': 'Retired'},
+            {'user_id': 7, 'Income': 10.0, 'Occupation': 'Professional'},
+        ])
+
+    def test_columns_and_rows(self):
+        ds = get_dataset(self.data_file)
+        self.assertEqual(len(ds), 3)
+        self.assertIsInstance(ds.column('Income'), np.memmap)
+        self.assertEqual(ds.numeric_columns(), ['user_id', 'Income'])
+        self.assertEqual(ds.row(1), {'user_id': 3, 'Income': 80000.0, 'Occupation': 'Retired'})
+        self.assertEqual((ds.find_row(7), ds.find_row(3), ds.find_row(4), ds.find_row(99)), (0, 1, None, None))
+        np.testing.assert_array_equal(ds.matrix(['Income'], rows=[0, 2]), [[50000.5], [10.0]])
+        with self.assertRaises(KeyError):
+            ds.column('Age')
+
+    def test_text_user_ids_are_scanned(self):
+        ds = get_dataset(self.write_csv('named.csv', [{'user_id': 'a', 'Income': 1}, {'user_id': 'b', 'Income': 2}]))
+        self.assertNotIn('user_index', ds.meta)
+        self.assertEqual((ds.find_row('b'), ds.find_row('c')), (1, None))
+
+    def test_converted_once_until_the_csv_changes(self):
+        with patch.object(dataset, 'convert_csv', wraps=dataset.convert_csv) as convert:
+            first = get_dataset(self.data_file)
+            dataset.clear_cache()
+            self.assertEqual(get_dataset(self.data_file).cache_dir, first.cache_dir)  # A new process reuses it
+            self.assertEqual(convert.call_count, 1)
+
+            with open(self.data_file, 'a') as f:
+                f.write('5,1.0,Student\n')
+            dataset.clear_cache()
+            second = get_dataset(self.data_file)
+            self.assertEqual((len(second), second.find_row(5), convert.call_count), (4, 3, 2))
+        self.assertFalse(os.path.exists(first.cache_dir))  # The stale conversion is pruned
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            get_dataset(os.path.join(self.tmp, 'missing.csv'))
+
+
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        chart_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, chart_dir)
+        for name, value in [('CHART_DIR', chart_dir), ('_memory', charts._BytesLRU(1024 * 1024))]:
+            patcher = patch.object(charts, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rendered_once(self):
+        with patch.object(charts, 'render_chart', return_value=b'chart') as render:
+            key = charts.request_chart(['Groceries', 'Transport'], [1200, 300.5])
+            self.assertEqual(charts.get_chart(key), b'chart')
+            self.assertEqual(charts.request_chart(('Groceries', 'Transport'), np.array([1200, 300.5])), key)
+            charts._memory = charts._BytesLRU(1024 * 1024)  # Another worker: only the disk is shared
+            self.assertEqual(charts.request_chart(['Groceries', 'Transport'], [1200, 300.5]), key)
+            self.assertEqual(charts.get_chart(key), b'chart')
+        self.assertEqual(render.call_count, 1)
+        self.assertNotEqual(charts.chart_key(['Groceries', 'Transport'], [1200, 300.5], format='svg'), key)
+        self.assertIsNone(charts.get_chart('0' * 32))
+        self.assertIsNone(charts.get_chart('../settings'))
+
+    def test_failed_render_is_retried(self):
+        started = threading.Event()
+
+        def render(categories, values, **options):
+            if not started.is_set():
+                started.set()
+                raise RuntimeError("Agg failed")
+            return b'chart'
+
+        with patch.object(charts, 'render_chart', side_effect=render):
+            key = charts.request_chart(['Groceries'], [100])
+            future = charts._pending.get(key)
+            if future is not None:
+                with self.assertRaises(RuntimeError):
+                    future.result()
+            started.wait(5)
+            self.assertNotIn(key, charts._pending)
+            self.assertEqual(charts.get_chart(key), b'chart')  # Rendered again from the stored spec
+
+    def test_memory_is_bounded(self):
+        lru = charts._BytesLRU(10)
+        lru.put('a', b'123456')
+        lru.put('b', b'123456')
+        lru.put('huge', b'x' * 11)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('huge'), lru.size), (None, b'123456', None, 6))
+
+    def test_view(self):
+        key = charts.request_chart(['Groceries', 'Transport'], [0, 0], dpi=20)  # All zero: a placeholder
+        response = self.client.get(charts.chart_url(key))
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(charts.chart_url('0' * 32)).status_code, 404)
+
+
+class CohortStatsTests(DatasetTestCase, CacheTestCase):
+    def test_percentile_matches_a_scan(self):
+        stats = cohort_stats.get_stats()
+        ds = get_dataset()
+        bands = np.searchsorted(stats['income_edges'], ds.column('Income'), side='right')
+        for income, metric, value in [(20000, 'Eating_Out', 1500), (60000, 'Groceries', 8000),
+                                      (150000, 'Potential_Savings_Total', 5000)]:
+            band = np.searchsorted(stats['income_edges'], income, side='right')
+            if metric == 'Potential_Savings_Total':
+                column = ds.matrix(cohort_stats.SAVINGS_METRICS).sum(axis=1)
+            else:
+                column = np.asarray(ds.column(metric))
+            expected = (column[bands == band] < value).mean() * 100
+            with self.subTest(metric=metric):
+                self.assertAlmostEqual(cohort_stats.peer_percentile(income, metric, value, stats), expected, delta=1.5)
+
+    def test_empty_band(self):
+        rows = [{'Income': 100, **{cat: i for cat in ALLOCATION_CATEGORIES}} for i in range(5)]
+        stats = cohort_stats.build_stats(self.write_csv('flat.csv', rows))  # One income: every edge is 100
+        self.assertEqual(list(stats['counts']), [0, 0, 0, 0, 5])
+        self.assertIsNone(cohort_stats.peer_percentile(50, 'Groceries', 2, stats))
+        self.assertEqual(cohort_stats.peer_percentile(100, 'Groceries', 2, stats), 50.0)
+        self.assertEqual(cohort_stats.peer_percentile(100, 'Potential_Savings_Total', 1, stats), 100.0)
+
+    def test_view(self):
+        user = User.objects.create(username='peer')
+        Budget.objects.create(user=user, income=60000)
+        Transaction.objects.create(user=user, text='Imtiaz', amount='100000.00', source='manual',
+                                   category=Category.objects.create(name='Groceries'))
+        self.client.force_login(user)
+        result = self.client.get('/core/api/analytics/peers/').json()
+        self.assertEqual(result['income_band'], allocation_profile.income_band(60000) + 1)
+        self.assertEqual(list(result['categories']), ALLOCATION_CATEGORIES)
+        self.assertEqual(result['categories']['Groceries']['percentile'], 100.0)
+        self.assertIn('You spend more on Groceries than 100% of users in your income band.', result['insights'])
+
+
+class SpendingTrendsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='trends')
+        # Groceries doubles every month from January to June; Transport only in March
+        for k, month in enumerate(month_sequence(date(2026, 6, 1), 6)):
+            CategorySpend.objects.create(user=self.user, period=month, category='Groceries', spent=100 * 2 ** k)
+        CategorySpend.objects.create(user=self.user, period=date(2026, 3, 1), category='Transport', spent=90)
+
+    def test_windows(self):
+        trends = spending_trends(self.user, months=6, end=date(2026, 6, 1))
+        self.assertEqual(trends['periods'], ['2026-01', '2026-02', '2026-03', '2026-04', '2026-05', '2026-06'])
+        self.assertEqual(trends['categories'], ['Groceries', 'Transport'])
+        self.assertEqual(trends['spending']['Groceries'], [100, 200, 400, 800, 1600, 3200])
+        self.assertEqual(trends['total'][2], 490)
+        self.assertEqual(trends['mom_change']['Groceries'], [None, 100, 100, 100, 100, 100])  # December was zero
+        self.assertEqual(trends['mom_change']['Transport'], [None, None, None, -100, None, None])
+        self.assertEqual(trends['rolling']['3']['Groceries'][:3], [33.33, 100, 233.33])  # Earlier months count as zero
+        self.assertEqual(trends['rolling']['3']['total'][2], 263.33)
+        self.assertEqual(trends['rolling']['12']['Groceries'][-1], 525)
+        self.assertAlmostEqual(trends['growth_rate']['Groceries'], 100, delta=1)
+
+    def test_helpers(self):
+        self.assertEqual(month_sequence(date(2026, 2, 1), 3), [date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)])
+        rolled = rolling_mean(np.array([[1.0], [2.0], [6.0]]), 2)
+        np.testing.assert_array_equal(rolled[:, 0], [np.nan, 1.5, 4.0])
+        self.assertTrue(np.isnan(rolling_mean(np.ones((2, 1)), 3)).all())
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        self.assertEqual(len(self.client.get('/core/api/analytics/trends/', {'months': 1000}).json()['periods']), MAX_MONTHS)
+        self.assertEqual(self.client.get('/core/api/analytics/trends/', {'months': 'all'}).status_code, 400)
+
+
+class AnomalyTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.other = User.objects.create(username='anomaly'), User.objects.create(username='steady')
+        self.food = Category.objects.create(name='Groceries')
+
+    def spend(self, amount, user=None, category=None):
+        return Transaction.objects.create(user=user or self.user, text='spend', amount=amount, source='manual',
+                                          category=category or self.food)
+
+    def test_online_stats(self):
+        amounts = [120.0, 80.5, 300.0, 95.25, 150.0, 110.0]
+        state = SimpleNamespace(count=0, mean=0.0, m2=0.0, median=0.0)
+        for amount in amounts:
+            anomaly.update(state, amount)
+        self.assertAlmostEqual(state.mean, np.mean(amounts))
+        self.assertAlmostEqual(state.m2 / (state.count - 1), np.var(amounts, ddof=1))
+        self.assertTrue(anomaly.score(state, 5000)[1])
+        self.assertFalse(anomaly.score(state, 200)[1])
+
+        flat = SimpleNamespace(count=0, mean=0.0, m2=0.0, median=0.0)
+        for _ in range(anomaly.MIN_HISTORY):
+            anomaly.update(flat, 100.0)
+        self.assertEqual(anomaly.score(flat, 999), (None, False))  # No spread: only the median rule applies
+        self.assertEqual(anomaly.score(flat, 1000), (None, True))
+
+    def test_scored_at_ingestion(self):
+        for amount in ['500.00', '520.00', '480.00', '510.00']:
+            self.spend(amount)
+        self.assertFalse(self.spend('20000.00').is_anomaly)  # Too little history yet
+        for amount in ['505.00', '495.00', '500.00', '515.00']:
+            self.spend(amount)
+        spike = self.spend('30000.00')
+        self.assertTrue(spike.is_anomaly)
+        self.assertGreater(spike.anomaly_score, anomaly.Z_THRESHOLD)
+        self.assertTrue(Transaction.objects.get(pk=spike.pk).is_anomaly)
+        self.assertEqual(SpendStats.objects.get(user=self.user, category='Groceries').count, 10)
+        self.assertIsNone(self.spend('30000.00', user=self.other).anomaly_score)  # Per user
+        self.assertIsNone(self.spend('30000.00', category=Category.objects.create(name='Rent')).anomaly_score)
+
+    def test_backfill_replays_the_online_scores(self):
+        for i, amount in enumerate(['500', '520', '480', '510', '505', '9000', '495', '490']):
+            self.spend(amount)
+            self.spend(str(100 + i), user=self.other)
+        online = list(Transaction.objects.order_by('id').values_list('anomaly_score', 'is_anomaly'))
+        fields = ('user_id', 'category', 'count', 'mean', 'm2', 'median')
+        stats = list(SpendStats.objects.order_by('user_id').values_list(*fields))
+        self.assertIn(True, [flagged for _, flagged in online])
+
+        Transaction.objects.update(anomaly_score=None, is_anomaly=False)
+        SpendStats.objects.all().delete()
+        call_command('backfill_anomaly_scores', chunk_size=3, stdout=StringIO())
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list('anomaly_score', 'is_anomaly')), online)
+        self.assertEqual(list(SpendStats.objects.order_by('user_id').values_list(*fields)), stats)
+
+        SpendStats.objects.filter(user=self.other).update(count=99)
+        call_command('backfill_anomaly_scores', user=[self.user.pk], stdout=StringIO())
+        self.assertEqual(SpendStats.objects.get(user=self.other).count, 99)  # Only the given users are replayed
+        self.assertEqual(SpendStats.objects.get(user=self.user).count, 8)
+
+
+class ChatbotFactsTests(TestCase):
+    summary = {'Groceries': 4200.0, 'Transport': 800.0}
+    analytics = {'summary': summary, 'total_spend': 5000.0, 'potential_savings': 750.0}
+
+    def setUp(self):
+        chatbot.clear_fact_cache()
+        self.addCleanup(chatbot.clear_fact_cache)
+        patcher = patch.object(chatbot, 'generate_analytics', return_value=self.analytics)
+        self.compute = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_answers_compute_only_what_they_need(self):
+        self.assertTrue(chatbot.chatbot_query('Give me a tip', 1).startswith('Tip:'))
+        self.assertIn('FinWise assistant', chatbot.chatbot_query('hello', 1))
+        self.assertEqual(self.compute.call_count, 0)
+
+        self.assertEqual(chatbot.chatbot_query('How much did I spend on groceries?', 1),
+                         'You spent Rs 4200.00 on Groceries this month.')
+        self.assertEqual(chatbot.chatbot_query('What are my potential savings?', 1),
+                         'You could potentially save Rs 750.00 by optimizing your spending!')
+        self.assertFalse(chatbot.ChatFacts(1).has('forecast'))
+        self.compute.assert_called_once_with(1)  # Shared by the conversation's later questions
+
+    def test_facts_are_per_user_and_expire(self):
+        chatbot.ChatFacts(1).total_spend
+        chatbot.ChatFacts(2).total_spend
+        self.assertEqual(self.compute.call_count, 2)
+        chatbot.clear_fact_cache(1)
+        chatbot.ChatFacts(1).total_spend
+        chatbot.ChatFacts(2).total_spend
+        self.assertEqual(self.compute.call_count, 3)
+        with patch.object(chatbot, 'FACTS_TTL_SECONDS', 0):
+            chatbot.ChatFacts(3).total_spend
+            chatbot.ChatFacts(3).total_spend
+        self.assertEqual(self.compute.call_count, 5)
+
+    def test_primed_facts(self):
+        facts = chatbot.ChatFacts(1)
+        facts.prime('analytics', {**self.analytics, 'total_spend': 1.5})
+        self.assertEqual(chatbot.answer_intent('spending', 'total', facts), 'Your total spending this month is Rs 1.50.')
+        self.assertEqual(self.compute.call_count, 0)
+
+
+class IntentIndexTests(TestCase):
+    queries = {
+        'how much did i spnd on transport': 'spending',
+        'any budgetting tips': 'tips',
+        'will prices go up next year': 'inflation',
+        'Should I buy some gold?': 'investment',
+        'What are my potential savings?': 'savings',
+        'hi there': 'help',
+    }
+
+    def test_paraphrases_and_typos(self):
+        index = intent_index.get_index()
+        matches = index.match(list(self.queries))
+        self.assertEqual([intent for intent, _ in matches], list(self.queries.values()))
+        self.assertEqual(matches[3], index.match_one('Should I buy some gold?'))  # Batched = one at a time
+        intent, confidence = index.match_one('give me a tip')  # One of the examples
+        self.assertEqual(intent, 'tips')
+        self.assertAlmostEqual(confidence, 1.0)
+        self.assertEqual(index.match_one('xyz qqq'), (None, 0.0))
+        self.assertEqual(index.match([]), [])
+
+    def test_keyword_fallback(self):
+        unsure = intent_index.IntentIndex(min_confidence=1.01)  # Nothing is ever confident enough
+        with patch.object(intent_index, 'get_index', return_value=unsure):
+            self.assertEqual(chatbot.classify_intent('zzz save zzz'), 'savings')
+            self.assertEqual(chatbot.classify_intent('investment tip'), 'investment')  # Keywords are checked in order
+            self.assertEqual(chatbot.classify_intent('xyz qqq'), 'help')
+
+    def test_custom_examples(self):
+        index = intent_index.IntentIndex({'greet': ['hello', 'good morning'], 'bye': ['goodbye', 'see you later']})
+        self.assertEqual(index.intents, ['greet', 'bye'])
+        self.assertEqual(index.scores(['see you', 'hello']).shape, (2, 2))
+        self.assertEqual([intent for intent, _ in index.match(['see you soon', 'morning!'])], ['bye', 'greet'])
+
+
+class FakeSource:
+    """Returns (or raises) the given results in turn, then keeps returning the last one"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def fetch(self, assets):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def afetch(self, assets):
+        return self.fetch(assets)
+
+
+class MarketDataTests(TestCase):
+    def wait_for(self, condition):
+        deadline = time_module.monotonic() + 5
+        while not condition():
+            self.assertLess(time_module.monotonic(), deadline, "Background refresh never finished")
+            time_module.sleep(0.01)
+
+    def test_stale_while_revalidate(self):
+        source = FakeSource({'gold_per_gram_pkr': 1, 'bitcoin_pkr': 2}, {'gold_per_gram_pkr': 3})
+        provider = MarketDataProvider(source)
+        self.assertEqual(provider.get(), {'gold_per_gram_pkr': 1, 'bitcoin_pkr': 2})
+        provider.get()
+        self.assertEqual(source.calls, 1)  # Fresh: served from the snapshot
+
+        release, fetch = threading.Event(), source.fetch
+        source.fetch = lambda assets: release.wait(5) and fetch(assets)  # A slow upstream
+        provider.fetched_at -= provider.fresh_seconds
+        self.assertEqual(provider.get()['gold_per_gram_pkr'], 1)  # Stale is served at once...
+        release.set()
+        self.wait_for(lambda: provider.get()['gold_per_gram_pkr'] == 3)  # ...and refreshed behind it
+        self.assertEqual(provider.get()['bitcoin_pkr'], 2)  # Left out by the source: last known value
+        self.assertEqual(source.calls, 2)
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+        breaker.record_failure()
+        self.assertEqual((breaker.state, breaker.allow()), ('closed', True))
+        breaker.record_failure()
+        self.assertEqual((breaker.state, breaker.allow()), ('open', False))
+        breaker.opened_at -= 60
+        self.assertEqual((breaker.state, breaker.allow(), breaker.allow()), ('half-open', True, False))  # One trial
+        breaker.record_success()
+        self.assertEqual((breaker.state, breaker.failures), ('closed', 0))
+
+        source = FakeSource(ConnectionError("timed out"))
+        provider = MarketDataProvider(source, breaker=CircuitBreaker(failure_threshold=2))
+        self.assertEqual(provider.get(), FALLBACK_PRICES)  # Unreachable on a cold start
+        self.assertFalse(provider.refresh())
+        self.assertFalse(provider.refresh())
+        self.assertEqual(source.calls, 2)  # The open circuit stops calling the upstream
+        self.assertEqual(provider.status()['circuit'], 'open')
+        self.assertEqual(provider.status()['last_error'], 'ConnectionError: timed out')
+
+    def test_malformed_body(self):
+        source = CoinGeckoSource('http://upstream.invalid')
+        response = Mock(json=Mock(return_value=['not', 'a', 'dict']))
+        with patch.object(source.session, 'get', return_value=response):
+            provider = MarketDataProvider(source)
+            self.assertEqual(provider.get(), FALLBACK_PRICES)
+            self.assertTrue(provider.last_error.startswith('AttributeError'))
+            response.json.return_value = {'bitcoin': {'pkr': 20000000}, 'gold': {'usd': 80}}
+            self.assertTrue(provider.refresh())
+        self.assertEqual(provider.get(), {**FALLBACK_PRICES, 'bitcoin_pkr': 20000000})  # Gold has no PKR quote
+
+    def test_async_cold_fetch(self):
+        provider = MarketDataProvider(FakeSource({'gold_per_gram_pkr': 5, 'bitcoin_pkr': 6}))
+        self.assertEqual(asyncio.run(provider.aget()), {'gold_per_gram_pkr': 5, 'bitcoin_pkr': 6})
+        self.assertEqual(provider.get(), {'gold_per_gram_pkr': 5, 'bitcoin_pkr': 6})
+
+    def test_sources(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'gold_per_gram_pkr': 21000}, f)
+        self.addCleanup(os.remove, f.name)
+        self.assertIsInstance(make_source(f'file:{f.name}'), FileSource)
+        self.assertEqual(MarketDataProvider(make_source(f'file:{f.name}')).get()['gold_per_gram_pkr'], 21000)
+        self.assertIsInstance(make_source('static'), StaticSource)
+        self.assertEqual(make_source('http://127.0.0.1:8080/').base_url, 'http://127.0.0.1:8080')
+        with self.assertRaises(ValueError):
+            make_source('ftp://prices')
+
+
+def scalar_forecast(amount, category, annual_rate, months):
+    # The per-category loop forecast_expenses() used before the engine
+    multiplier = inflation_engine.CATEGORY_MULTIPLIERS.get(category, inflation_engine.DEFAULT_MULTIPLIER)
+    return amount * ((1 + annual_rate / 100 * multiplier) ** (months / 12))
+
+
+class InflationEngineTests(TestCase):
+    categories = ['Groceries', 'Transport', 'Entertainment', 'Gym']
+
+    def test_matches_the_scalar_formula(self):
+        spending = np.random.default_rng(1).uniform(0, 10000, size=(3, len(self.categories)))
+        horizons = [1, 6, 12, 60]
+        result = inflation_engine.forecast_batch(spending, self.categories, 6.0, horizons=horizons, monte_carlo=False)
+        self.assertEqual(result['projections'].shape, (3, 4, 4, 3))
+        self.assertEqual(result['scenarios'], ['low', 'base', 'high'])
+        expected = [[[[scalar_forecast(spending[u, c], cat, rate, h) for rate in result['scenario_rates']]
+                      for h in horizons] for c, cat in enumerate(self.categories)] for u in range(3)]
+        np.testing.assert_allclose(result['projections'], expected)
+        np.testing.assert_allclose(result['totals'], result['projections'].sum(axis=1))
+
+    def test_forecast_expenses_is_unchanged(self):
+        spending = {'Groceries': 6659, 'Transport': 2637, 'Eating_Out': 1652, 'Education': 0, 'Miscellaneous': 832}
+        for months in (12, 30):
+            expected = {cat: round(scalar_forecast(amount, cat, 6.0, months), 2) for cat, amount in spending.items()}
+            result = forecast_expenses(spending, months)
+            self.assertEqual(result['forecasted_spending'], expected)
+            self.assertEqual(result['forecast_total'], round(sum(expected.values()), 2))
+        self.assertEqual(forecast_expenses({'Groceries': 0})['increase_percent'], 0.0)
+
+    def test_monte_carlo_bands(self):
+        spending = np.array([[5000.0, 2000.0, 0.0, 900.0], [100.0, 0.0, 300.0, 0.0]])
+        run = lambda: inflation_engine.forecast_batch(spending, self.categories, 6.0, horizons=[3, 24], seed=7)
+        result = run()
+        bands = result['bands']
+        self.assertEqual((bands['projections'].shape, bands['totals'].shape), ((2, 4, 2, 3), (2, 2, 3)))
+        self.assertTrue((np.diff(bands['totals'], axis=-1) >= 0).all())  # 5% <= median <= 95%
+        spread = bands['totals'][0, :, 2] - bands['totals'][0, :, 0]
+        self.assertGreater(spread[1], spread[0])  # Uncertainty widens with the horizon
+        np.testing.assert_allclose(bands['totals'][:, :, 1], result['totals'][:, :, 1], rtol=0.02)
+        with patch.object(inflation_engine, 'BAND_CHUNK_ELEMENTS', 1):  # One user per chunk
+            np.testing.assert_allclose(run()['bands']['totals'], bands['totals'])
+
+    def test_validation(self):
+        for horizons in ([0], [61], []):
+            with self.subTest(horizons=horizons), self.assertRaises(ValueError):
+                inflation_engine.horizons_array(horizons)
+        with self.assertRaises(ValueError):
+            inflation_engine.forecast_batch([[1.0, 2.0]], self.categories, 6.0)
+
+    def test_command(self):
+        user = User.objects.create(username='inflation')
+        CategorySpend.objects.create(user=user, period=date(2026, 5, 1), category='Groceries', spent=1000)
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('forecast_inflation', period='2026-05', horizons=[12], paths=50, seed=1,
+                         output_dir=output_dir, stdout=StringIO())
+            with np.load(os.path.join(output_dir, 'forecasts', 'inflation_2026-05.npz')) as data:
+                self.assertEqual(list(data['user_ids']), [user.pk])
+                self.assertAlmostEqual(float(data['totals'][0, 0, 1]), scalar_forecast(1000, 'Groceries', 6.0, 12))
+
+
+class TracingTests(CacheTestCase):
+    def test_spans(self):
+        self.assertIs(tracing.span('parse'), tracing.span('ocr'))  # No trace: the shared no-op
+        predict = tracing.traced('predict')(lambda x: x * 2)
+        self.assertEqual(predict(2), 4)
+
+        trace, token = tracing.start_trace()
+        try:
+            for _ in range(2):
+                with tracing.span('model load'):
+                    pass
+            self.assertEqual(predict(3), 6)
+            self.assertIs(tracing.current_trace(), trace)
+        finally:
+            tracing.end_trace(token)
+        self.assertIsNone(tracing.current_trace())
+        self.assertEqual({name: count for name, (_, count) in trace.spans.items()}, {'model load': 2, 'predict': 1})
+
+        trace.spans = {'model load': [0.0123, 2], 'db_write': [0.001, 1]}
+        self.assertEqual(server_timing(trace, 0.05),
+                         'model_load;dur=12.3;desc="2 calls", db_write;dur=1.0, total;dur=50.0')
+
+    def test_header(self):
+        user = User.objects.create(username='traced')
+        Transaction.objects.create(user=user, text='Imtiaz', amount='250.00', source='manual')
+        self.client.force_login(user)
+        timing = self.client.get('/core/api/analytics/')['Server-Timing']
+        self.assertRegex(timing, r'analytics_db;dur=[0-9.]+')
+        self.assertRegex(timing, r'total;dur=[0-9.]+$')
+        with patch('ml.market_data._provider', MarketDataProvider(StaticSource())):
+            self.assertIn('total;dur=', self.client.get('/core/api/async/investment/')['Server-Timing'])
+
+    def test_settings(self):
+        with patch.dict(os.environ, {'FINWISE_TRACE_LOG': '1'}), self.assertLogs('finwise.tracing', 'INFO') as logs:
+            Client().get('/core/api/inflation/')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['method'], line['path'], line['status']), ('GET', '/core/api/inflation/', 200))
+        self.assertIn('cache', line['spans'])
+        with patch.dict(os.environ, {'FINWISE_TRACING': '0'}):
+            self.assertNotIn('Server-Timing', Client().get('/core/api/inflation/'))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        # Metrics declared here stay out of the app's registry and values
+        for registry in (metrics._registry, metrics._stores):
+            patcher = patch.dict(registry, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def declare(self):
+        return (metrics.Counter('t_requests_total', "Requests", ['path']),
+                metrics.Gauge('t_in_flight', "In flight"),
+                metrics.Histogram('t_seconds', "Latency", buckets=(1, 0.5)))
+
+    def test_render(self):
+        requests, in_flight, latency = self.declare()
+        requests.labels(path='/a"b').inc()
+        requests.labels(path='/a"b').inc(2)
+        in_flight.inc(3)
+        in_flight.dec()
+        for value in (0.25, 1, 7):
+            latency.observe(value)
+        self.assertEqual(metrics.render(), '\n'.join([
+            '# HELP t_requests_total Requests',
+            '# TYPE t_requests_total counter',
+            't_requests_total{path="/a\\"b"} 3',
+            '# HELP t_in_flight In flight',
+            '# TYPE t_in_flight gauge',
+            't_in_flight 2',
+            '# HELP t_seconds Latency',
+            '# TYPE t_seconds histogram',
+            't_seconds_bucket{le="0.5"} 1',
+            't_seconds_bucket{le="1"} 2',  # Upper bounds are inclusive
+            't_seconds_bucket{le="+Inf"} 3',
+            't_seconds_sum 8.25',
+            't_seconds_count 3',
+        ]) + '\n')
+        with latency.time():
+            pass
+        self.assertIn('t_seconds_bucket{le="0.5"} 2', metrics.render())
+
+    def test_misuse(self):
+        requests, in_flight, _ = self.declare()
+        for call in (lambda: requests.inc(), lambda: requests.labels(view='x'), lambda: in_flight.labels(path='x'),
+                     lambda: requests.labels(path='x').inc(-1), lambda: metrics.Counter('t_requests_total', "Again"),
+                     lambda: metrics.Gauge('t_other', "Other", mode='avg')):
+            with self.assertRaises(ValueError):
+                call()
+
+    def test_worker_files_are_merged(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        with patch.object(metrics, 'METRICS_DIR', metrics_dir):
+            requests, _, latency = self.declare()
+            busy = metrics.Gauge('t_busy', "Busy", mode='max')
+            per_worker = metrics.Gauge('t_rss', "RSS", mode='all')
+            pids = []
+            for worker in range(3):
+                pid = os.fork()
+                if pid == 0:  # A worker: its own files, written through mmap
+                    try:
+                        for i in range(3000):
+                            requests.labels(path=f'/{i % 1500}').inc()  # Enough keys to grow the file
+                        latency.observe(0.1)
+                        busy.set(worker + 1)
+                        per_worker.set(10)
+                    finally:
+                        os._exit(0)
+                pids.append(pid)
+            for pid in pids:
+                os.waitpid(pid, 0)
+
+            files = glob.glob(os.path.join(metrics_dir, 'counter_*.db'))
+            self.assertEqual(len(files), 3)
+            self.assertGreater(os.path.getsize(files[0]), metrics.INITIAL_FILE_BYTES)
+            rendered = metrics.render()
+            self.assertIn('t_requests_total{path="/0"} 6', rendered)  # 2 per worker
+            self.assertIn('t_seconds_count 3', rendered)
+            self.assertIn('t_busy 3', rendered)
+            self.assertEqual(rendered.count('t_rss{pid='), 3)
+
+            metrics.mark_process_dead(pids[2])
+            rendered = metrics.render()
+            self.assertIn('t_busy 2', rendered)  # Its gauges go...
+            self.assertIn('t_seconds_count 3', rendered)  # ...its counts stay
+
+            reopened = metrics._MmapValues(os.path.join(metrics_dir, f'counter_{pids[0]}.db'))  # A reused pid
+            self.addCleanup(reopened.close)
+            self.assertEqual(dict(reopened.items())[metrics._key('t_requests_total', [['path', '/0']])], 2)
+
+
+class MetricsEndpointTests(CacheTestCase):
+    def test_endpoint(self):
+        self.client.get('/core/api/inflation/')
+        response = self.client.get('/core/api/metrics/')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertRegex(response.content.decode(),
+                         r'finwise_request_duration_seconds_count\{view="inflation",method="GET",status="200"\} [1-9]')
+        self.assertIn('# TYPE finwise_cache_requests_total counter', response.content.decode())
+
+
+class LeanSerializerTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='lean')
+        food = Category.objects.create(name='Groceries')
+        for text, amount, category in [('Imtiaz', '1200.5', food), ('Careem \u2028ride', '99.99', None), ('Zinger', '650', food)]:
+            Transaction.objects.create(user=self.user, text=text, amount=amount, source='manual', category=category,
+                                       confidence=87.5, explanation='keywords')
+        Transaction.objects.filter(text='Zinger').update(fingerprint='f' * 32)
+        Budget.objects.create(user=self.user, income=50000, rent=12000, savings_percentage=12.5,
+                              allocations={'Groceries': 9000.25, 'Transport': 3000})
+
+    def assertSameJson(self, lean, full):
+        self.assertEqual(FastJSONRenderer().render(lean), JSONRenderer().render(full))
+
+    def test_same_output_as_the_model_serializers(self):
+        for lean, full, model in [(TransactionReadSerializer, TransactionSerializer, Transaction),
+                                  (BudgetReadSerializer, BudgetSerializer, Budget)]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(set(lean.fields), set(full().fields))
+                rows = model.objects.order_by('id')
+                self.assertSameJson(lean.many(rows), full(rows, many=True).data)
+                instance = rows.first()
+                self.assertSameJson(lean.one(instance), full(instance).data)
+
+    def test_unsaved_values(self):
+        tx = Transaction(user=self.user, text='Tea', amount=12.5, source='manual', confidence=np.float64(80.0))
+        row = TransactionReadSerializer.one(tx)
+        self.assertEqual((row['amount'], row['confidence'], row['category']), ('12.50', 80.0, None))
+        self.assertIs(type(row['confidence']), float)
+
+    def test_renderer(self):
+        data = {'amount': Decimal('10.50'), 'when': timezone.make_aware(datetime(2026, 5, 1, 12, 30, 15, 120000)),
+                'day': date(2026, 5, 1), 'gap': timedelta(hours=1), 'text': 'a\u2029b', 7: [1.5, None, True]}
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        self.assertEqual(FastJSONRenderer().render(np.float32(1.5)), b'1.5')
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        indented = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(indented, b'{\n  "a": 1\n}')
+
+
+class SeedingTests(CacheTestCase):
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_benchmark_data', prefix='t', users=3, transactions=25, months=4, budgets=2, goals=2, seed=1,
+                     batch_size=7, stdout=out, **options)
+        return out.getvalue()
+
+    def test_row_counts(self):
+        out = self.seed()
+        users = list(User.objects.filter(username__startswith='t_').order_by('username'))
+        self.assertEqual([user.username for user in users], ['t_0', 't_1', 't_2'])
+        months = month_sequence(period_start(), 4)
+        for user in users:
+            stamps = list(Transaction.objects.filter(user=user).values_list('created_at', flat=True))
+            per_month = [sum(1 for stamp in stamps if period_start(stamp) == month) for month in months]
+            self.assertEqual(per_month, [6, 6, 6, 7])  # The remainder goes to the latest month
+            self.assertLessEqual(max(stamps), timezone.now())
+            self.assertEqual((Budget.objects.filter(user=user).count(), SavingsGoal.objects.filter(user=user).count()),
+                             (2, 2))
+            spent = sum(CategorySpend.objects.filter(user=user).values_list('spent', flat=True))
+            self.assertEqual(spent, sum(Transaction.objects.filter(user=user).values_list('amount', flat=True)))
+        self.assertRegex(out, r'transactions:\s+75 rows')
+        self.assertRegex(out, r'budgets:\s+6 rows')
+
+    def test_existing_users(self):
+        self.seed()
+        with self.assertRaisesMessage(CommandError, 'use --replace'):
+            self.seed()
+        first = list(Transaction.objects.order_by('created_at').values_list('text', 'amount', 'category_id'))
+        self.seed(replace=True)  # Same --seed, same rows
+        self.assertEqual(list(Transaction.objects.order_by('created_at').values_list('text', 'amount', 'category_id')),
+                         first)
+        self.seed(drop=True)
+        self.assertFalse(User.objects.filter(username__startswith='t_').exists())
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_bypassed_signals_are_made_up_for(self):
+        [user_id] = seeding.seed_users('s', 1)
+        version = response_cache.get_version(user_id)
+        seeding.seed([user_id], transactions=10, months=2, random_seed=3)
+        self.assertNotEqual(response_cache.get_version(user_id), version)
+        self.assertEqual(CategorySpend.objects.filter(user_id=user_id).aggregate(n=Sum('transaction_count'))['n'], 10)
+        self.assertFalse(SpendStats.objects.exists())  # Anomaly stats are left to backfill_anomaly_scores
@@ -0,0 +1,88 @@
+import numpy as np
+from .models import CategorySpend
+from .tracker import period_start
+
+ROLLING_WINDOWS = (3, 6, 12)
+MAX_MONTHS = 60
+
+
+def month_sequence(end, months):
+    """The `months` month-start dates ending at (and including) end, oldest first"""
+    index = end.year * 12 + end.month - 1
+    return [end.replace(year=i // 12, month=i % 12 + 1, day=1) for i in range(index - months + 1, index + 1)]
+
+
+def monthly_matrix(user, months, end=None):
+    """(periods, categories, months x categories spend matrix) from the running monthly counters.
+
+    Reads at most months x categories counter rows, however long the
+    transaction history is.
+    """
+    periods = month_sequence(end or period_start(), months)
+    rows = CategorySpend.objects.filter(user=user, period__gte=periods[0], period__lte=periods[-1]) \
+        .values_list('period', 'category', 'spent')
+
+    position = {p: i for i, p in enumerate(periods)}
+    cells = [(position[period], category, float(spent)) for period, category, spent in rows]
+    categories = sorted({category for _, category, _ in cells})
+    column = {cat: j for j, cat in enumerate(categories)}
+    matrix = np.zeros((len(periods), len(categories)))
+    for i, category, spent in cells:
+        matrix[i, column[category]] += spent
+    return periods, categories, matrix
+
+
+def rolling_mean(matrix, window):
+    """Trailing mean over `window` months (NaN until a full window is available)"""
+    csum = np.cumsum(np.vstack([np.zeros((1, matrix.shape[1])), matrix]), axis=0)
+    out = np.full(matrix.shape, np.nan)
+    if len(matrix) >= window:
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def pct_change(matrix):
+    """Month-over-month change in percent (NaN where the previous month was zero)"""
+    out = np.full(matrix.shape, np.nan)
+    prev = matrix[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = np.where(prev > 0, (matrix[1:] - prev) / prev * 100, np.nan)
+    return out
+
+
+def growth_rates(matrix):
+    """Average monthly growth per category (percent), from a log-linear fit over the window"""
+    if len(matrix) < 2:
+        return np.full(matrix.shape[1], np.nan)
+    x = np.arange(len(matrix))
+    slopes = np.polyfit(x, np.log1p(matrix), 1)[0]  # One fit for all categories at once
+    return np.expm1(slopes) * 100
+
+
+def _chart_ready(values):
+    return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+
+def spending_trends(user, months=12, end=None):
+    """Monthly series, MoM change, rolling averages and growth rates, as arrays ready for charting"""
+    months = max(1, min(months, MAX_MONTHS))
+    history = months + max(ROLLING_WINDOWS) - 1  # Extra months so every visible point has full windows
+    periods, categories, matrix = monthly_matrix(user, history, end)
+    visible = slice(history - months, history)
+
+    totals = matrix.sum(axis=1, keepdims=True)
+    result = {
+        'periods': [p.strftime('%Y-%m') for p in periods[visible]],
+        'categories': categories,
+        'spending': {cat: _chart_ready(matrix[visible, j]) for j, cat in enumerate(categories)},
+        'total': _chart_ready(totals[visible, 0]),
+        'mom_change': {cat: _chart_ready(col) for cat, col in zip(categories, pct_change(matrix)[visible].T)},
+        'total_mom_change': _chart_ready(pct_change(totals)[visible, 0]),
+        'rolling': {},
+        'growth_rate': dict(zip(categories, _chart_ready(growth_rates(matrix[visible])))),
+    }
+    for window in ROLLING_WINDOWS:
+        rolled = rolling_mean(matrix, window)[visible]
+        result['rolling'][str(window)] = {cat: _chart_ready(col) for cat, col in zip(categories, rolled.T)}
+        result['rolling'][str(window)]['total'] = _chart_ready(rolling_mean(totals, window)[visible, 0])
+    return result
@@ -0,0 +1,103 @@
+"""Lightweight per-request stage timing.
+
+    with span('ocr'):
+        text = pytesseract.image_to_string(img)
+
+    @traced('categorize')
+    def categorize_expense(...): ...
+
+Spans are summed by name into the current trace, which TracingMiddleware
+starts per request and reports as a Server-Timing header (and optionally a
+JSON log line). Outside a trace, span() hands back a shared no-op object, so
+instrumented code costs one context-variable lookup. Plain Python only, so the
+ml modules can use it outside Django too.
+"""
+import functools
+import time
+from contextvars import ContextVar
+
+_current = ContextVar('finwise_trace', default=None)
+
+
+class Trace:
+    __slots__ = ('started', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # name -> [total seconds, count], in first-seen order
+
+    def add(self, name, seconds):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager timing a stage of the current trace (a no-op when none is active)"""
+    trace = _current.get()
+    return _NOOP if trace is None else _Span(trace, name)
+
+
+def traced(name=None):
+    """Decorator form of span(); defaults to the function's name"""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with _Span(trace, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace():
+    """Begin a trace in this context; returns (trace, token) for end_trace()"""
+    trace = Trace()
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    _current.reset(token)
+
+
+def current_trace():
+    return _current.get()
@@ -0,0 +1,210 @@
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import ArchivedMonth, Budget, CategorySpend, Transaction
+
+ALERT_THRESHOLDS = (80, 100)  # Percent of a category allocation
+UNCATEGORIZED = 'Uncategorized'
+
+
+def period_start(dt=None):
+    """First day of the (local) month containing dt"""
+    return timezone.localdate(dt).replace(day=1)
+
+
+def _to_decimal(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def alert_level(spent, allocation):
+    """Highest threshold in ALERT_THRESHOLDS reached by spent/allocation (0 if none)"""
+    if allocation is None or allocation <= 0:
+        return 0
+    used = spent * 100 / allocation
+    return max((t for t in ALERT_THRESHOLDS if used >= t), default=0)
+
+
+def _latest_allocation(user_id, category):
+    budget = Budget.objects.filter(user_id=user_id).only('allocations').order_by('-created_at').first()
+    if budget is None or category not in budget.allocations:
+        return None
+    return _to_decimal(budget.allocations[category])
+
+
+def record_spend(user_id, category, amount, when=None, count=1):
+    """Add amount to the user's running counter for (month, category) in O(1).
+
+    The increment is a single atomic UPDATE ... SET spent = spent + amount, which
+    row-locks the counter until commit, so parallel inserts for the same user
+    serialize on that row instead of losing updates. Returns the threshold newly
+    crossed by this update (e.g. 80 or 100), or None.
+    """
+    amount = _to_decimal(amount)
+    category = category or UNCATEGORIZED
+    period = period_start(when)
+
+    with db_transaction.atomic():
+        row, _ = CategorySpend.objects.get_or_create(
+            user_id=user_id, period=period, category=category,
+            defaults={'allocation': _latest_allocation(user_id, category)},
+        )
+        CategorySpend.objects.filter(pk=row.pk).update(
+            spent=F('spent') + amount,
+            transaction_count=F('transaction_count') + count,
+            updated_at=timezone.now(),
+        )
+        spent, allocation, current = CategorySpend.objects.filter(pk=row.pk).values_list(
+            'spent', 'allocation', 'alert_level').get()
+
+        level = alert_level(spent, allocation)
+        if level == current:
+            return None
+        # Conditional update: of several concurrent writers only one "fires" the alert
+        fired = CategorySpend.objects.filter(pk=row.pk, alert_level=current).update(alert_level=level)
+        return level if fired and level > current else None
+
+
+def record_transaction(tx):
+    category = tx.category.name if tx.category_id else UNCATEGORIZED
+    return record_spend(tx.user_id, category, tx.amount, tx.created_at)
+
+
+def reverse_transaction(tx):
+    category = tx.category.name if tx.category_id else UNCATEGORIZED
+    record_spend(tx.user_id, category, -_to_decimal(tx.amount), tx.created_at, count=-1)
+
+
+def stored_spend(pk):
+    """(user_id, category, amount, created_at) of a saved transaction, as its counter recorded it"""
+    row = Transaction.objects.filter(pk=pk).values_list('user_id', 'category__name', 'amount', 'created_at').first()
+    if row is None:
+        return None
+    user_id, category, amount, created_at = row
+    return user_id, category or UNCATEGORIZED, _to_decimal(amount), created_at
+
+
+def update_transaction(before, tx):
+    """Move an edited transaction's spend from the counter it was recorded in to its current one.
+
+    Returns the threshold newly crossed on the new counter, like record_spend().
+    """
+    user_id, category, amount, created_at = before
+    after = (tx.user_id, tx.category.name if tx.category_id else UNCATEGORIZED, _to_decimal(tx.amount))
+    if (user_id, category, amount) == after and period_start(created_at) == period_start(tx.created_at):
+        return None
+    with db_transaction.atomic():
+        record_spend(user_id, category, -amount, created_at, count=-1)
+        return record_transaction(tx)
+
+
+def uncategorize(category):
+    """Move a category's counted spend to Uncategorized before the category is deleted (its rows are SET_NULL)"""
+    rows = (Transaction.objects.filter(category=category)
+            .annotate(period=TruncMonth('created_at', output_field=DateField()))
+            .values('user_id', 'period').annotate(spent=Sum('amount'), count=Count('id')).order_by())
+    with db_transaction.atomic():
+        for row in rows:
+            when = timezone.make_aware(datetime.combine(row['period'], time(12)))
+            record_spend(row['user_id'], category.name, -row['spent'], when, count=-row['count'])
+            record_spend(row['user_id'], UNCATEGORIZED, row['spent'], when, count=row['count'])
+
+
+def apply_budget(budget):
+    """Refresh the allocation snapshot (and alert level) of the current month's counters"""
+    period = period_start()
+    allocations = {cat: _to_decimal(v) for cat, v in (budget.allocations or {}).items()}
+    with db_transaction.atomic():
+        rows = {r.category: r for r in CategorySpend.objects.select_for_update().filter(
+            user_id=budget.user_id, period=period)}
+        for cat, allocation in allocations.items():
+            row = rows.pop(cat, None)
+            if row is None:
+                CategorySpend.objects.create(user_id=budget.user_id, period=period, category=cat, allocation=allocation)
+                continue
+            row.allocation = allocation
+            row.alert_level = alert_level(row.spent, allocation)
+            row.save(update_fields=['allocation', 'alert_level', 'updated_at'])
+        # Categories the new budget no longer covers
+        for row in rows.values():
+            row.allocation = None
+            row.alert_level = 0
+            row.save(update_fields=['allocation', 'alert_level', 'updated_at'])
+
+
+def budget_status(user, period=None):
+    """Remaining budget per category for one month, read straight from the counters"""
+    period = period or period_start()
+    rows = list(CategorySpend.objects.filter(user=user, period=period).order_by('category'))
+
+    # Months without a snapshot yet (e.g. budget created mid-month) fall back to the latest budget
+    categories = {r.category: r for r in rows}
+    budget = Budget.objects.filter(user=user).order_by('-created_at').first()
+    fallback = {cat: _to_decimal(v) for cat, v in (budget.allocations if budget else {}).items()}
+
+    status = []
+    for cat in sorted(set(categories) | set(fallback)):
+        row = categories.get(cat)
+        spent = row.spent if row else Decimal('0.00')
+        allocation = row.allocation if row and row.allocation is not None else fallback.get(cat)
+        status.append({
+            'category': cat,
+            'allocation': float(allocation) if allocation is not None else None,
+            'spent': float(spent),
+            'remaining': float(allocation - spent) if allocation is not None else None,
+            'percent_used': round(float(spent * 100 / allocation), 1) if allocation else None,
+            'alert': row.alert_level if row else alert_level(spent, allocation),
+        })
+
+    return {
+        'period': period.strftime('%Y-%m'),
+        'categories': status,
+        'total_spent': float(sum((r.spent for r in rows), Decimal('0.00'))),
+        'alerts': [s['category'] for s in status if s['alert']],
+    }
+
+
+def rebuild_counters(user_ids=None):
+    """Recompute every monthly counter from Transaction history (backfill / repair).
+
+    Months moved to the archive (core.archive) count from their ArchivedMonth
+    summaries. Alert levels are re-derived against each user's latest budget.
+    """
+    qs = Transaction.objects.all()
+    archived = ArchivedMonth.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+        archived = archived.filter(user_id__in=user_ids)
+    rows = (qs.annotate(period=TruncMonth('created_at', output_field=DateField())).values('user_id', 'period', 'category__name')
+            .annotate(spent=Sum('amount'), count=Count('id')).order_by())
+
+    totals = {}
+    for row in rows.iterator():
+        key = (row['user_id'], row['period'], row['category__name'] or UNCATEGORIZED)
+        spent, count = totals.get(key, (Decimal('0.00'), 0))
+        totals[key] = (spent + row['spent'], count + row['count'])
+    for month in archived.iterator():
+        for category, (spent, count) in month.by_category.items():
+            key = (month.user_id, month.period, category)
+            total, n = totals.get(key, (Decimal('0.00'), 0))
+            totals[key] = (total + Decimal(spent), n + count)
+
+    allocations = {}
+    counters = []
+    for (user_id, period, category), (spent, count) in totals.items():
+        if user_id not in allocations:
+            budget = Budget.objects.filter(user_id=user_id).order_by('-created_at').first()
+            allocations[user_id] = {cat: _to_decimal(v) for cat, v in (budget.allocations if budget else {}).items()}
+        allocation = allocations[user_id].get(category)
+        counters.append(CategorySpend(
+            user_id=user_id, period=period, category=category, spent=spent, transaction_count=count,
+            allocation=allocation, alert_level=alert_level(spent, allocation),
+        ))
+
+    with db_transaction.atomic():
+        existing = CategorySpend.objects.all() if user_ids is None else CategorySpend.objects.filter(user_id__in=user_ids)
+        existing.delete()
+        CategorySpend.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
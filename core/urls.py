@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import  BudgetInitView,ExpenseInputView,AnalyticsView,ReportView,InflationForecastView,InvestmentView,ChatbotView
+from .views import  BudgetInitView,BudgetSimulateView,BudgetStatusView,ExpenseInputView,AnalyticsView,PeerComparisonView,SpendingTrendsView,SpendingHistoryView,TransactionExportView,ChartView,ReportView,InflationForecastView,SavingsPredictionView,InvestmentView,ChatbotView,MetricsView
+from .async_views import AsyncInvestmentView, AsyncChatbotView, AsyncReportView
 from django.contrib.auth.views import LogoutView
 urlpatterns = [
     #path('login/', login_view, name='login'),
@@ -7,10 +8,23 @@ urlpatterns = [
     #path('dashboard/', dashboard, name='dashboard'),
     #path('logout/', LogoutView.as_view(), name='logout'),
     path('api/budget/init/', BudgetInitView.as_view(), name='budget_init'),
+    path('api/budget/simulate/', BudgetSimulateView.as_view(), name='budget_simulate'),
+    path('api/budget/status/', BudgetStatusView.as_view(), name='budget_status'),
     path('api/expenses/input/', ExpenseInputView.as_view(), name='expenses_input'),
     path('api/analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('api/analytics/peers/', PeerComparisonView.as_view(), name='analytics_peers'),
+    path('api/analytics/trends/', SpendingTrendsView.as_view(), name='analytics_trends'),
+    path('api/analytics/history/', SpendingHistoryView.as_view(), name='analytics_history'),
+    path('api/transactions/export/', TransactionExportView.as_view(), name='transactions_export'),
+    path('api/charts/<str:key>/', ChartView.as_view(), name='chart'),
     path('api/report/', ReportView.as_view(), name='report'),
     path('api/inflation/', InflationForecastView.as_view(), name='inflation'),
+    path('api/savings/predict/', SavingsPredictionView.as_view(), name='savings_predict'),
     path('api/investment/', InvestmentView.as_view(), name='investment'),
     path('api/chatbot/', ChatbotView.as_view(), name='chatbot'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+    # Async variants for ASGI deployments (core/async_views.py)
+    path('api/async/investment/', AsyncInvestmentView.as_view(), name='investment_async'),
+    path('api/async/chatbot/', AsyncChatbotView.as_view(), name='chatbot_async'),
+    path('api/async/report/', AsyncReportView.as_view(), name='report_async'),
 ]
\ No newline at end of file
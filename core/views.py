@@ -1,35 +1,42 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from .models import Budget,Transaction
-from .serializers import BudgetSerializer,TransactionSerializer
-import pandas as pd  
-from ml.multi_modal_input import process_inputs 
+from .serializers import BudgetReadSerializer,TransactionReadSerializer
+from .tracker import budget_status
+from .timeseries import spending_trends
+from .savings import advice_savings, predict_user_savings, savings_features
+from .tracing import span
+from .response_cache import cached_response
+from . import archive, dedup
+from .receipts import save_receipt
+from . import metrics
+from ml.multi_modal_input import parse_inputs, categorize_inputs
+from ml.budget_initialization import initialize_budget
+from ml.budget_simulator import simulate_budgets
 from django.contrib.auth.models import User
-from ml.analytics import generate_analytics, generate_pdf_report
-from django.http import FileResponse
+from ml.analytics import generate_analytics, render_pdf_report
+from django.db import transaction as db_transaction
+from django.http import FileResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from ml.charts import get_chart, chart_format, CONTENT_TYPES
+from ml.cohort_stats import peer_comparison
+from ml.dataset import get_dataset
+from ml.savings_model import ModelUnavailable
 from ml.inflation_forecast import forecast_expenses
 from ml.investment_insights import investment_insights
+from ml.market_data import get_provider
 from ml.chatbot import chatbot_query
 from django.contrib.auth import authenticate, login
 from django.shortcuts import render, redirect
-def initialize_budget(income, fixed_expenses_dict, savings_percentage, user_data_file='ml/data.csv'): 
-    df = pd.read_csv(user_data_file)
-    avg_allocations = df[['Groceries', 'Transport', 'Eating_Out', 'Entertainment', 'Utilities', 'Healthcare', 'Education', 'Miscellaneous']].mean().to_dict()
-    total_avg = sum(avg_allocations.values())
-    alloc_ratios = {k: v / total_avg for k, v in avg_allocations.items()}
-    
-    fixed_total = sum(fixed_expenses_dict.values())
-    savings_goal = income * (savings_percentage / 100)
-    disposable = income - fixed_total - savings_goal
-    allocations = {cat: disposable * ratio for cat, ratio in alloc_ratios.items()}
-    
-    return {
-        'disposable_income': disposable,
-        'savings_goal': savings_goal,
-        'allocations': allocations,
-        'explanation': f"Based on average spending patterns from dataset. Total fixed: {fixed_total}. Aim to stay under allocations to meet {savings_percentage}% savings."
-    }
+import csv
+import logging
+from datetime import datetime, time, timedelta
+from io import BytesIO, StringIO
+
+logger = logging.getLogger('finwise.views')
 
 class BudgetInitView(APIView):
     def post(self, request):
@@ -65,48 +72,217 @@ class BudgetInitView(APIView):
         )
         budget.save()
         
-        serializer = BudgetSerializer(budget)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(BudgetReadSerializer.one(budget), status=status.HTTP_201_CREATED)
+class BudgetSimulateView(APIView):
+    def post(self, request):
+        # Read-only what-if grid: each field is a number, a list, or {start, stop, step|num}.
+        # Nothing is saved — the user commits a scenario through BudgetInitView.
+        try:
+            result = simulate_budgets(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+class BudgetStatusView(APIView):
+    def get(self, request):
+        user = request.user if request.user.is_authenticated else User.objects.first()
+        if not user:
+            return Response({"error": "No users — run createsuperuser"}, status=400)
+
+        # Optional ?period=YYYY-MM, defaults to the current month
+        period = request.query_params.get('period')
+        if period:
+            try:
+                period = datetime.strptime(period, '%Y-%m').date()
+            except ValueError:
+                return Response({'error': 'period must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(budget_status(user, period))
+
 class ExpenseInputView(APIView):
+    # Re-submissions get the stored transactions back (200) instead of new rows; see core/dedup.py
     def post(self, request):
         user = User.objects.first()
         if not user:
             return Response({"error": "No users found - create one with createsuperuser"}, status=400)# Assume auth
         input_data = request.data  # e.g., {'type': 'receipt_image', 'data': 'uploaded_image_path_or_text'}
-        
-        txs = process_inputs(input_data)
-        
-        saved_txs = []
+        bucket = dedup.time_bucket()
+
+        with span('dedup'):
+            input_key = dedup.input_key(user.pk, input_data, bucket)
+            request_key = None
+            if request.headers.get('Idempotency-Key'):
+                request_key = dedup.request_key(user.pk, request.headers['Idempotency-Key'])
+                previous = dedup.claim(request_key)
+                if previous == dedup.IN_PROGRESS:
+                    return Response({'error': 'A request with this Idempotency-Key is in progress'},
+                                    status=status.HTTP_409_CONFLICT)
+                if previous is not None:
+                    return Response([TransactionReadSerializer.one(tx) for tx in dedup.stored(user, previous)])
+            previous = dedup.stored(user, dedup.recall(input_key) or []) if input_key else []
+        if previous:  # Same input already ingested (and not deleted since): skip OCR and categorization
+            if request_key:
+                dedup.remember([request_key], [tx.pk for tx in previous])
+            return Response([TransactionReadSerializer.one(tx) for tx in previous])
+
+        try:
+            saved_txs, created = self._ingest(user, input_data, bucket)
+        except Exception:
+            if request_key:
+                dedup.release(request_key)
+            raise
+        if saved_txs is None:  # Nothing was stored; the key may be retried
+            if request_key:
+                dedup.release(request_key)
+            return Response({'error': created}, status=status.HTTP_400_BAD_REQUEST)
+
+        dedup.remember([key for key in (input_key, request_key) if key], [tx.pk for tx in saved_txs])
+        with span('serialize'):
+            data = [TransactionReadSerializer.one(tx) for tx in saved_txs]
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def _ingest(self, user, input_data, bucket):
+        """(transactions, number created), or (None, error message)"""
+        txs = parse_inputs(input_data)
         for tx in txs:
             if 'error' in tx:
-                return Response({'error': tx['error']}, status=status.HTTP_400_BAD_REQUEST)
-            transaction = Transaction(
-                user=user,
-                text=tx['text'],
-                amount=tx['amount'],
-                source=tx['source'],
-                category=tx.get('category_obj'),
-                confidence=tx.get('confidence', 0.0),
-                explanation=tx.get('explanation', '')
-            )
-            transaction.save()
-            saved_txs.append(TransactionSerializer(transaction).data)
-        
-        return Response(saved_txs, status=status.HTTP_201_CREATED)
+                return None, tx['error']
+        with span('dedup'):
+            dedup.fingerprint_all(user.pk, txs, bucket)
+            found = dedup.existing(tx['fingerprint'] for tx in txs)  # One set-based check for the batch
+        categorize_inputs([tx for tx in txs if tx['fingerprint'] not in found])
+
+        saved_txs, created = [], 0
+        for tx in txs:
+            transaction = found.get(tx['fingerprint'])
+            if transaction is None:
+                transaction = Transaction(
+                    user=user,
+                    text=tx['text'],
+                    amount=tx['amount'],
+                    source=tx['source'],
+                    category=tx.get('category_obj'),
+                    confidence=tx.get('confidence', 0.0),
+                    explanation=tx.get('explanation', ''),
+                    fingerprint=tx['fingerprint'],
+                )
+                with span('db_write'), db_transaction.atomic():  # Includes the anomaly scoring and spend tracking signals
+                    transaction, inserted = dedup.save_unique(transaction)
+                    if inserted and 'items' in tx:
+                        save_receipt(transaction, tx)
+                created += inserted
+            saved_txs.append(transaction)
+        return saved_txs, created
 
 class AnalyticsView(APIView):
+    @cached_response('analytics')
     def get(self, request):
         user_id = request.user.id if request.user.is_authenticated else None
         result = generate_analytics(user_id)
         return Response(result)
 
+class PeerComparisonView(APIView):
+    def get(self, request):
+        user_id = request.user.id if request.user.is_authenticated else None
+        analytics = generate_analytics(user_id)
+
+        # Income band comes from the user's latest budget; the demo (CSV) user uses the dataset row
+        budget = Budget.objects.filter(user_id=user_id).order_by('-created_at').first() if user_id else None
+        income = float(budget.income) if budget else get_dataset().row(0)['Income']
+
+        result = peer_comparison(income, analytics['summary'], analytics['potential_savings'])
+        return Response(result)
+
+class SpendingTrendsView(APIView):
+    def get(self, request):
+        user = request.user if request.user.is_authenticated else User.objects.first()
+        if not user:
+            return Response({"error": "No users — run createsuperuser"}, status=400)
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            return Response({'error': 'months must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(spending_trends(user, months))
+
+def _date_range(request):
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD, both optional and inclusive -> aware [start, end)
+    bounds = []
+    for name, shift in (('start', 0), ('end', 1)):
+        value = request.query_params.get(name)
+        day = parse_date(value) if value else None
+        if value and day is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+        bounds.append(timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min)) if day else None)
+    return bounds
+
+class TransactionExportView(APIView):
+    # CSV of the whole history in range, archived months included (core/archive.py); streamed, not buffered
+    permission_classes = [IsAuthenticated]  # Whole-history data: no first-user fallback here
+
+    def get(self, request):
+        user = request.user
+        try:
+            start, end = _date_range(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def lines():
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(archive.FIELDS)
+            for i, row in enumerate(archive.iter_transactions(user.pk, start, end), 1):
+                writer.writerow([row[field] for field in archive.FIELDS])
+                if i % 1000 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+        response = StreamingHttpResponse(lines(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
+
+class SpendingHistoryView(APIView):
+    # Category totals over any range; archived months are read from their summaries
+    permission_classes = [IsAuthenticated]  # Whole-history data: no first-user fallback here
+
+    def get(self, request):
+        user = request.user
+        try:
+            start, end = _date_range(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        summary = archive.spending_by_category(user.pk, start, end)
+        return Response({
+            'start': request.query_params.get('start'),
+            'end': request.query_params.get('end'),
+            'summary': {cat: round(total, 2) for cat, total in sorted(summary.items())},
+            'total': round(sum(summary.values()), 2),
+        })
+
+class ChartView(APIView):
+    def get(self, request, key):
+        # Charts are content-addressed, so a key always maps to the same image
+        data = get_chart(key)
+        if data is None:
+            raise Http404("Unknown chart")
+        response = HttpResponse(data, content_type=CONTENT_TYPES.get(chart_format(key), 'application/octet-stream'))
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
+class MetricsView(APIView):
+    def get(self, request):
+        # Prometheus text format; merges every worker's values when FINWISE_METRICS_DIR is set
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 class ReportView(APIView):
     def get(self, request):
         analytics = generate_analytics(request.user.id if request.user.is_authenticated else None)
-        pdf_path = generate_pdf_report(analytics)
-        return FileResponse(open(pdf_path, 'rb'), as_attachment=True, filename='spending_report.pdf')
+        pdf_bytes = render_pdf_report(analytics)  # In memory, so concurrent reports never share a file
+        return FileResponse(BytesIO(pdf_bytes), as_attachment=True, filename='spending_report.pdf')
     
 class InflationForecastView(APIView):
+    @cached_response('inflation')
     def get(self, request):
         # Use sample or from DB/user spending (for prototype, use sample)
         sample_spending = {"Groceries": 6659, "Transport": 2637, "Eating_Out": 1652,
@@ -115,9 +291,37 @@ class InflationForecastView(APIView):
         result = forecast_expenses(sample_spending)
         return Response(result)
     
+class SavingsPredictionView(APIView):
+    def get(self, request):
+        user = request.user if request.user.is_authenticated else User.objects.first()
+        if not user:
+            return Response({"error": "No users — run createsuperuser"}, status=400)
+        try:
+            result = predict_user_savings(user, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ModelUnavailable as e:
+            logger.warning("Savings model unavailable: %s", e)
+            return Response({'error': 'Savings prediction is temporarily unavailable'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if result is None:
+            return Response({'error': 'No budget yet — create one first'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+def _investment_user_id(request):
+    # Same fallback as the view: anonymous requests get the first user's advice
+    if request.user.is_authenticated:
+        return request.user.id
+    return User.objects.order_by('pk').values_list('pk', flat=True).first()
+
+def _market_snapshot(request):
+    return repr(sorted(get_provider().get().items()))  # In-memory snapshot; new prices -> new cache entry
+
 class InvestmentView(APIView):
+    @cached_response('investment', user_id=_investment_user_id, vary=_market_snapshot)
     def get(self, request):
-        savings = 15000  # Sample — later from user budget/DB
+        user = request.user if request.user.is_authenticated else User.objects.first()
+        savings = advice_savings(savings_features(user) if user else None)
         result = investment_insights(savings)
         return Response(result)
 
@@ -0,0 +1,102 @@
+"""Optional start-up warm-up, run from CoreConfig.ready().
+
+FINWISE_WARMUP (setting or environment variable) lists the tasks to run,
+comma separated, or 'all'; it is empty by default so management commands
+start fast. Run it in the server's master process so forked workers share
+the loaded models and memory-mapped caches copy-on-write, e.g.
+
+    FINWISE_WARMUP=all gunicorn --preload finwise.wsgi
+"""
+import os
+import time
+import logging
+
+logger = logging.getLogger('finwise.warmup')
+
+
+def _categorizer():
+    from ml.expense_categorizer import _load_models
+    _load_models()
+
+
+def _intent_index():
+    from ml.intent_index import get_index
+    get_index()
+
+
+def _dataset():
+    from ml.dataset import get_dataset
+    get_dataset()
+
+
+def _allocation_profile():
+    from ml.allocation_profile import get_profile
+    get_profile()
+
+
+def _cohort_stats():
+    from ml.cohort_stats import get_stats
+    get_stats()
+
+
+def _savings_model():
+    from ml.savings_model import get_model
+    get_model()
+
+
+def _charts():
+    from matplotlib.figure import Figure  # noqa: F401
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+
+
+def _reports():
+    from reportlab.pdfgen import canvas  # noqa: F401
+
+
+def _market_data():
+    from ml.market_data import get_provider
+    get_provider().refresh()  # Synchronous, so the snapshot exists before workers fork
+
+
+# Order matters: later tasks reuse what earlier ones loaded
+TASKS = {
+    'dataset': _dataset,
+    'allocation_profile': _allocation_profile,
+    'cohort_stats': _cohort_stats,
+    'savings_model': _savings_model,
+    'categorizer': _categorizer,
+    'intent_index': _intent_index,
+    'charts': _charts,
+    'reports': _reports,
+    'market_data': _market_data,
+}
+
+
+def configured_tasks(value=None):
+    if value is None:
+        from django.conf import settings
+        value = os.environ.get('FINWISE_WARMUP', getattr(settings, 'FINWISE_WARMUP', ''))
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(',') if name.strip()]
+    if 'all' in value:
+        return list(TASKS)
+    unknown = [name for name in value if name not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown FINWISE_WARMUP task(s): {', '.join(unknown)}")
+    return [name for name in TASKS if name in value]
+
+
+def run(names=None):
+    """Run the warm-up tasks; a failing task is reported and skipped, never fatal. Returns {name: seconds}"""
+    timings = {}
+    for name in configured_tasks(names):
+        start = time.perf_counter()
+        try:
+            TASKS[name]()
+        except Exception as e:
+            logger.warning("Warm-up '%s' failed: %s", name, e)
+            continue
+        timings[name] = time.perf_counter() - start
+    if timings:
+        logger.info("Warm-up: %s", ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()))
+    return timings
@@ -2,4 +2,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finwise.settings')
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# One event loop serves every request: the async views may keep a pooled client and refresh tasks on it
+from ml import market_data  # noqa: E402
+market_data.LONG_LIVED_LOOP = True
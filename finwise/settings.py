@@ -20,6 +20,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.TracingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,4 +88,57 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+REST_FRAMEWORK = {
+    # orjson-backed when orjson is installed, otherwise identical to DRF's JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Start-up warm-up tasks (see core/warmup.py): comma separated names or 'all'.
+# Set it for the server only, with --preload so workers share the result.
+FINWISE_WARMUP = ''
+
+# Per-request stage timings (core/tracing.py) in a Server-Timing header, and
+# optionally as one JSON line per request on the 'finwise.tracing' logger
+FINWISE_TRACING = True
+FINWISE_TRACE_LOG = False
+
+# Per-user response cache (core/response_cache.py), invalidated by Transaction/Budget
+# writes. The file cache is shared by every worker on the host; use LocMemCache in
+# tests, or DatabaseCache (manage.py createcachetable) / Redis across hosts.
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'responses',
+    },
+}
+FINWISE_RESPONSE_CACHE = 'responses'  # CACHES alias, or '' to turn response caching off
+FINWISE_RESPONSE_CACHE_SECONDS = 3600
+
+# Duplicate expense detection (core/dedup.py). Idempotency-Keys and raw inputs are
+# remembered in this cache for FINWISE_IDEMPOTENCY_SECONDS; identical transactions
+# within one FINWISE_DEDUP_WINDOW_SECONDS bucket share a fingerprint and are stored once.
+FINWISE_IDEMPOTENCY_CACHE = 'responses'
+FINWISE_IDEMPOTENCY_SECONDS = 86400
+FINWISE_DEDUP_WINDOW_SECONDS = 86400
+
+# Transaction archive (core/archive.py, manage.py archive_transactions): months older
+# than this many before the current one move to compressed per-user segment files.
+FINWISE_ARCHIVE_DIR = BASE_DIR / 'archive'
+FINWISE_ARCHIVE_AFTER_MONTHS = 12
+
+# Request latency/DB query metrics (core/metrics.py), scraped from /core/api/metrics/.
+# Under gunicorn also set FINWISE_METRICS_DIR so all workers report together.
+FINWISE_METRICS = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'finwise': {'handlers': ['console'], 'level': 'INFO'}},
+}
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+from bisect import bisect_right
+import numpy as np
+from ml.dataset import ML_DIR, DEFAULT_DATA_FILE, get_dataset
+
+PROFILE_FILE = os.path.join(ML_DIR, 'allocation_profile.json')
+
+# Bump whenever the profile layout or the way ratios are computed changes,
+# so stale artifacts on disk get rebuilt instead of silently reused.
+PROFILE_VERSION = 2
+
+ALLOCATION_CATEGORIES = ['Groceries', 'Transport', 'Eating_Out', 'Entertainment',
+                         'Utilities', 'Healthcare', 'Education', 'Miscellaneous']
+INCOME_BANDS = 5           # Quantile bands over the dataset's Income column
+RECHECK_SECONDS = 60       # How often a cached profile re-stats its source file
+
+_profiles = {}  # data_file -> (profile, checked_at)
+
+
+def _source_stamp(data_file):
+    try:
+        st = os.stat(data_file)
+    except FileNotFoundError:
+        return None
+    return {'mtime': st.st_mtime, 'size': st.st_size}
+
+
+def build_profile(data_file=DEFAULT_DATA_FILE, bands=INCOME_BANDS):
+    """Scan the dataset once and compute overall + per-income-band allocation ratios"""
+    ds = get_dataset(data_file)
+    income = np.asarray(ds.column('Income'), dtype=np.float64)
+    spending = ds.matrix(ALLOCATION_CATEGORIES)
+
+    # Same ratios as the old per-request code: column mean / sum of means
+    totals = spending.sum(axis=0)
+    overall = totals / totals.sum()
+
+    # Band edges are the inner income quantiles; band i covers [edges[i-1], edges[i])
+    edges = np.quantile(income, np.linspace(0, 1, bands + 1)[1:-1])
+    band_idx = np.searchsorted(edges, income, side='right')
+    band_totals = np.zeros((bands, len(ALLOCATION_CATEGORIES)))
+    np.add.at(band_totals, band_idx, spending)
+    band_sums = band_totals.sum(axis=1, keepdims=True)
+    # An empty band (tiny datasets) falls back to the overall ratios
+    band_ratios = np.where(band_sums > 0, band_totals / np.where(band_sums > 0, band_sums, 1), overall)
+
+    # Share of each category's spend the dataset marks as avoidable
+    savings_cols = [f'Potential_Savings_{cat}' for cat in ALLOCATION_CATEGORIES]
+    potential = np.array([float(ds.column(col).sum()) if col in ds else 0.0 for col in savings_cols])
+    savings_ratios = np.divide(potential, totals, out=np.zeros_like(potential), where=totals > 0)
+
+    return {
+        'version': PROFILE_VERSION,
+        'source': _source_stamp(data_file),
+        'categories': ALLOCATION_CATEGORIES,
+        'overall': overall.tolist(),
+        'income_edges': edges.tolist(),
+        'band_ratios': band_ratios.tolist(),
+        'savings_ratios': savings_ratios.tolist(),
+        'rows': len(ds),
+    }
+
+
+def _read_artifact(profile_file):
+    try:
+        with open(profile_file) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_artifact(profile, profile_file):
+    tmp_path = f"{profile_file}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, profile_file)  # Atomic, so concurrent workers never see half a file
+
+
+def _is_fresh(profile, stamp):
+    if profile is None or profile.get('version') != PROFILE_VERSION:
+        return False
+    # No source file (artifact-only deployment) -> trust the artifact
+    return stamp is None or profile.get('source') == stamp
+
+
+def get_profile(data_file=None, profile_file=None):
+    """Return the allocation profile, loading/building it at most once per process.
+
+    The source file is re-stat'ed at most every RECHECK_SECONDS, so the hot path
+    is a dict lookup with no file I/O.
+    """
+    data_file = data_file or DEFAULT_DATA_FILE
+    if profile_file is None:
+        profile_file = PROFILE_FILE if data_file == DEFAULT_DATA_FILE else f"{os.path.splitext(data_file)[0]}.allocation_profile.json"
+
+    now = time.monotonic()
+    cached = _profiles.get(data_file)
+    if cached is not None and now - cached[1] < RECHECK_SECONDS:
+        return cached[0]
+
+    stamp = _source_stamp(data_file)
+    if cached is not None and _is_fresh(cached[0], stamp):
+        _profiles[data_file] = (cached[0], now)
+        return cached[0]
+
+    profile = _read_artifact(profile_file)
+    if not _is_fresh(profile, stamp):
+        if stamp is None:
+            raise FileNotFoundError(f"Neither {data_file} nor a usable {profile_file} was found")
+        profile = build_profile(data_file)
+        _write_artifact(profile, profile_file)
+
+    _profiles[data_file] = (profile, now)
+    return profile
+
+
+def income_band(income, profile=None):
+    profile = profile or get_profile()
+    return bisect_right(profile['income_edges'], income)
+
+
+def allocation_ratios(income=None, profile=None):
+    """Category -> share of disposable income, for the user's income band (or overall)"""
+    profile = profile or get_profile()
+    ratios = profile['overall'] if income is None else profile['band_ratios'][income_band(income, profile)]
+    return dict(zip(profile['categories'], ratios))
+
+
+def savings_ratios(profile=None):
+    """Category -> fraction of spend that is typically avoidable (Potential_Savings_* / spend)"""
+    profile = profile or get_profile()
+    return dict(zip(profile['categories'], profile['savings_ratios']))
+
+
+def clear_cache():
+    _profiles.clear()
+
+
+# Build (or refresh) the artifact ahead of time, e.g. during deploy
+if __name__ == "__main__":
+    profile = get_profile()
+    print(f"Allocation profile v{profile['version']} from {profile['rows']} rows -> {PROFILE_FILE}")
+    for band, ratios in enumerate(profile['band_ratios']):
+        print(band, {cat: round(r, 3) for cat, r in zip(profile['categories'], ratios)})
@@ -1,29 +1,36 @@
 import os
-import pandas as pd
+from io import BytesIO
 import numpy as np 
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
-def generate_analytics(user_id=None, user_data_file=None):
-    if user_data_file is None:
-        current_dir = os.path.dirname(os.path.abspath(__file__)) 
-        project_root = os.path.abspath(os.path.join(current_dir, '..'))
-        user_data_file = os.path.join(project_root, 'data.csv')
-    
-    if not os.path.exists(user_data_file):
-        raise FileNotFoundError(f"data.csv not found at: {user_data_file}\n"
-                                f"Current ml directory: {current_dir}\n"
-                                f"Expected project root: {project_root}")
-
-    df = pd.read_csv(user_data_file)
-    if user_id is not None and 'user_id' in df.columns:
-        matched = df[df['user_id'] == user_id]
-        if len(matched) == 0:
+from ml.dataset import get_dataset
+from ml.charts import request_chart, get_chart, chart_url
+from core.tracing import span, traced
+from core.metrics import ANALYTICS_REQUESTS
+
+# 'db' aggregates the user's stored transactions (core.analytics); 'csv' reads data.csv.
+# The CSV path is also the fallback for anonymous users and users with no transactions.
+ANALYTICS_SOURCE = os.environ.get('FINWISE_ANALYTICS_SOURCE', 'db')
+
+def generate_analytics(user_id=None, user_data_file=None, source=None):
+    source = source or ANALYTICS_SOURCE
+    if source == 'db' and user_id is not None and user_data_file is None:
+        from core.analytics import cached_transaction_analytics
+        result = cached_transaction_analytics(user_id)
+        if result is not None:
+            ANALYTICS_REQUESTS.labels(source='db').inc()
+            return result
+    ANALYTICS_REQUESTS.labels(source='csv').inc()
+    return csv_analytics(user_id, user_data_file)
+
+@traced('analytics_csv')
+def csv_analytics(user_id=None, user_data_file=None):
+    # Shared columnar cache of data.csv (ml.dataset) — no CSV parse per call
+    ds = get_dataset(user_data_file)
+    if user_id is not None and 'user_id' in ds:
+        row_index = ds.find_row(user_id)
+        if row_index is None:
             raise ValueError(f"No user found with user_id = {user_id}")
-        user_row = matched.iloc[0]
     else:
-        user_row = df.iloc[0]  # Default: first row
+        row_index = 0  # Default: first row
 
     # Spending by category - use only columns that exist in data.csv
     all_possible_categories = ['Groceries', 'Transport', 'Eating_Out', 'Entertainment', 'Utilities', 
@@ -31,33 +38,28 @@ def generate_analytics(user_id=None, user_data_file=None):
                            'Insurance', 'Shopping', 'Travel', 'Subscriptions', 'Gym/Fitness']
 
 # Filter to only columns that exist in the CSV
-    categories = [cat for cat in all_possible_categories if cat in df.columns]
+    categories = [cat for cat in all_possible_categories if cat in ds]
 
 # If no categories found, fallback to all numeric columns (safety)
     if not categories:
-       categories = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+       categories = ds.numeric_columns()
 
-    print(f"Using categories: {categories}")  # For debugging
-    spending = user_row[categories].values
+    spending = np.array([ds.column(cat)[row_index] for cat in categories], dtype=float)
+
+    # Potential savings
+    potential_cols = [f'Potential_Savings_{cat}' for cat in categories if f'Potential_Savings_{cat}' in ds]
+    potential_savings = sum(float(ds.column(col)[row_index]) for col in potential_cols)
+
+    return build_analytics_result(categories, spending, potential_savings)
+
+def build_analytics_result(categories, spending, potential_savings):
+    """Shared response shape for every analytics backend"""
     total_spend = np.sum(spending)
     summary = {cat: float(val) for cat, val in zip(categories, spending)}  # Ensure float
 
-    # Potential savings
-    potential_cols = [f'Potential_Savings_{cat}' for cat in categories if f'Potential_Savings_{cat}' in df.columns]
-    potential_savings = user_row[potential_cols].sum() if potential_cols else 0.0
-
-    # Chart path — save in project root
-    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-    chart_path = os.path.join(project_root, 'spending_chart.png')
-
-    # Generate pie chart
-    plt.figure(figsize=(9, 7))
-    plt.pie(spending, labels=categories, autopct='%1.1f%%', startangle=90)
-    plt.title('Monthly Spending Breakdown', fontsize=16, pad=20)
-    plt.axis('equal')
-    plt.tight_layout()
-    plt.savefig(chart_path, dpi=200, bbox_inches='tight')
-    plt.close()  
+    # Content-addressed and rendered off the request path; repeat views reuse the cached image
+    with span('chart'):
+        chart_key = request_chart(categories, spending)
 
     # Insights
     top_category = max(summary, key=summary.get)
@@ -69,16 +71,20 @@ def generate_analytics(user_id=None, user_data_file=None):
         'summary': summary,
         'total_spend': float(total_spend),
         'potential_savings': float(potential_savings),
-        'chart_path': 'spending_chart.png',  
+        'chart_path': chart_url(chart_key),
+        'chart_key': chart_key,
         'insights': insights
     }
 
-def generate_pdf_report(analytics_result, pdf_path=None):
-    if pdf_path is None:
-        project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-        pdf_path = os.path.join(project_root, 'spending_report.pdf')
+@traced('pdf')
+def render_pdf_report(analytics_result, chart_bytes=None):
+    """Build the report in memory and return the PDF bytes (no shared files, safe to run concurrently)"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.utils import ImageReader, simpleSplit
 
-    c = canvas.Canvas(pdf_path, pagesize=letter)
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
 
     # Title
@@ -99,19 +105,28 @@ def generate_pdf_report(analytics_result, pdf_path=None):
     c.drawString(100, y, "Insights:")
     y -= 25
     # Wrap long text
-    from reportlab.lib.utils import simpleSplit
     lines = simpleSplit(analytics_result['insights'], "Helvetica", 12, width - 200)
     for line in lines:
         c.drawString(120, y, line)
         y -= 20
 
-    # Add chart
-    chart_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'spending_chart.png')
-    if os.path.exists(chart_path):
-        c.drawImage(chart_path, 80, y - 320, width=450, height=320, preserveAspectRatio=True)
+    # Add chart (this report's own chart, from the chart cache)
+    if chart_bytes is None and analytics_result.get('chart_key'):
+        with span('chart_render'):  # Waits for the background render if it hasn't finished
+            chart_bytes = get_chart(analytics_result['chart_key'])
+    if chart_bytes:
+        c.drawImage(ImageReader(BytesIO(chart_bytes)), 80, y - 320, width=450, height=320, preserveAspectRatio=True)
 
     c.showPage()
     c.save()
+    return buffer.getvalue()
+
+def generate_pdf_report(analytics_result, pdf_path=None):
+    if pdf_path is None:
+        project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        pdf_path = os.path.join(project_root, 'spending_report.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(render_pdf_report(analytics_result))
     return pdf_path
 
 # Test locally
@@ -122,6 +137,6 @@ if __name__ == "__main__":
         print(result)
         pdf = generate_pdf_report(result)
         print(f"\nPDF Report generated at: {pdf}")
-        print("Chart saved as: spending_chart.png")
+        print(f"Chart available at: {result['chart_path']}")
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
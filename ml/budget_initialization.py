@@ -1,35 +1,33 @@
-import pandas as pd
-import numpy as np
+from ml.allocation_profile import get_profile, allocation_ratios, income_band
+
+def initialize_budget(income, fixed_expenses_dict, savings_percentage, user_data_file=None):
+    # Allocation ratios come from the precomputed profile (built once from the dataset)
+    profile = get_profile(user_data_file)
+    alloc_ratios = allocation_ratios(income, profile)
 
-def initialize_budget(income, fixed_expenses_dict, savings_percentage, user_data_file='data.csv'):
-    # Load historical data for allocation insights
-    df = pd.read_csv(user_data_file)
-    avg_allocations = df[['Groceries', 'Transport', 'Eating_Out', 'Entertainment', 'Utilities', 'Healthcare', 'Education', 'Miscellaneous']].mean().to_dict()
-    total_avg = sum(avg_allocations.values())
-    alloc_ratios = {k: v / total_avg for k, v in avg_allocations.items()}
-    
     # Calculate fixed total
     fixed_total = sum(fixed_expenses_dict.values())  # e.g., {'Rent': 10000, 'Loan': 5000, 'Insurance': 2000}
-    
+
     # Savings goal
     savings_goal = income * (savings_percentage / 100)
-    
+
     # Disposable income
     disposable = income - fixed_total - savings_goal
-    
+
     # Suggested allocations
     allocations = {cat: disposable * ratio for cat, ratio in alloc_ratios.items()}
-    
+
+    band = income_band(income, profile)
     return {
         'disposable_income': disposable,
         'savings_goal': savings_goal,
         'allocations': allocations,
-        'explanation': f"Based on average spending patterns from dataset. Total fixed: {fixed_total}. Aim to stay under allocations to meet {savings_percentage}% savings."
+        'explanation': f"Based on spending patterns of users in income band {band + 1}/{len(profile['band_ratios'])}. Total fixed: {fixed_total}. Aim to stay under allocations to meet {savings_percentage}% savings."
     }
 
 # Example: From data.csv first row
-df = pd.read_csv('data.csv')
-income = df['Income'].iloc[0]
-fixed = {'Rent': df['Rent'].iloc[0], 'Loan_Repayment': df['Loan_Repayment'].iloc[0], 'Insurance': df['Insurance'].iloc[0]}
-savings_pct = df['Desired_Savings_Percentage'].iloc[0]
-print(initialize_budget(income, fixed, savings_pct))
\ No newline at end of file
+if __name__ == "__main__":
+    from ml.dataset import get_dataset
+    row = get_dataset().row(0)
+    fixed = {'Rent': row['Rent'], 'Loan_Repayment': row['Loan_Repayment'], 'Insurance': row['Insurance']}
+    print(initialize_budget(row['Income'], fixed, row['Desired_Savings_Percentage']))
@@ -0,0 +1,213 @@
+import os
+import io
+import json
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from ml.dataset import PROJECT_ROOT
+from core.metrics import CACHE_REQUESTS
+
+CHART_DIR = os.environ.get('FINWISE_CHART_DIR', os.path.join(PROJECT_ROOT, 'media', 'charts'))
+CHART_URL = '/core/api/charts/{key}/'
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+DISK_CACHE_BYTES = 256 * 1024 * 1024
+RENDER_WORKERS = 2
+PRUNE_EVERY = 50  # Disk writes between size checks of CHART_DIR
+
+DEFAULT_OPTIONS = {'format': 'png', 'dpi': 200, 'title': 'Monthly Spending Breakdown'}
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+class _BytesLRU:
+    """Thread-safe LRU of rendered charts, bounded by total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            self.size += len(data) - (len(old) if old else 0)
+            self._items[key] = data
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+_memory = _BytesLRU(MEMORY_CACHE_BYTES)
+_executor = None
+_pending = {}  # key -> Future, so concurrent requests for one chart render it once
+_lock = threading.Lock()
+_writes = 0
+_KEY_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def chart_key(categories, values, **options):
+    """Content hash of the spending vector + render options"""
+    options = {**DEFAULT_OPTIONS, **options}
+    payload = json.dumps([list(categories), [round(float(v), 2) for v in values], options], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _paths(key):
+    return os.path.join(CHART_DIR, f"{key}.json"), os.path.join(CHART_DIR, f"{key}.chart")
+
+
+def render_chart(categories, values, format='png', dpi=200, title=DEFAULT_OPTIONS['title']):
+    """Pie chart as bytes on the headless Agg backend (no pyplot, so it is thread-safe)"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(9, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if sum(values) > 0:
+        ax.pie(values, labels=categories, autopct='%1.1f%%', startangle=90)
+    else:
+        ax.text(0.5, 0.5, 'No spending recorded yet', ha='center', va='center', fontsize=14)
+    ax.set_title(title, fontsize=16, pad=20)
+    ax.axis('equal')
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format=format, dpi=dpi, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _prune_disk():
+    files = []
+    for name in os.listdir(CHART_DIR):
+        path = os.path.join(CHART_DIR, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= DISK_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _write_atomic(path, data, mode='wb'):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _render_and_store(key, spec):
+    global _writes
+    try:
+        data = render_chart(spec['categories'], spec['values'], **spec['options'])
+        _memory.put(key, data)
+        _write_atomic(_paths(key)[1], data)
+    finally:
+        # Also on failure: a failed render is not cached, the next request tries again
+        with _lock:
+            _pending.pop(key, None)
+    with _lock:
+        _writes += 1
+        prune = _writes % PRUNE_EVERY == 0
+    if prune:
+        _prune_disk()
+    return data
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='chart-render')
+    return _executor
+
+
+def request_chart(categories, values, **options):
+    """Register a chart and start rendering it in the background; returns its key.
+
+    Cheap when the chart was rendered before: the key is a hash, and a cached
+    chart never reaches matplotlib.
+    """
+    categories = list(categories)
+    values = [float(v) for v in values]
+    key = chart_key(categories, values, **options)
+    if _memory.get(key) is not None:
+        CACHE_REQUESTS.labels(cache='chart', result='hit').inc()
+        return key
+
+    spec_path, data_path = _paths(key)
+    if os.path.exists(data_path):
+        CACHE_REQUESTS.labels(cache='chart', result='disk').inc()
+        return key
+
+    CACHE_REQUESTS.labels(cache='chart', result='miss').inc()
+
+    spec = {'categories': categories, 'values': values, 'options': {**DEFAULT_OPTIONS, **options}}
+    os.makedirs(CHART_DIR, exist_ok=True)
+    _write_atomic(spec_path, json.dumps(spec), mode='w')  # Lets any worker process render it later
+    executor = _get_executor()
+    with _lock:
+        if key not in _pending:
+            _pending[key] = executor.submit(_render_and_store, key, spec)
+    return key
+
+
+def get_chart(key):
+    """Rendered chart bytes for key (waiting for/doing the render if needed), or None if unknown"""
+    if not _KEY_RE.fullmatch(key):
+        return None
+    data = _memory.get(key)
+    if data is not None:
+        return data
+
+    future = _pending.get(key)
+    if future is not None:
+        return future.result()
+
+    spec_path, data_path = _paths(key)
+    try:
+        with open(data_path, 'rb') as f:
+            data = f.read()
+        _memory.put(key, data)
+        return data
+    except FileNotFoundError:
+        pass
+
+    # Registered by another process but never rendered here
+    try:
+        with open(spec_path) as f:
+            spec = json.load(f)
+    except FileNotFoundError:
+        return None
+    return _render_and_store(key, spec)
+
+
+def chart_format(key):
+    try:
+        with open(_paths(key)[0]) as f:
+            return json.load(f)['options']['format']
+    except (FileNotFoundError, KeyError, ValueError):
+        return DEFAULT_OPTIONS['format']
+
+
+def chart_url(key):
+    return CHART_URL.format(key=key)
@@ -1,40 +1,142 @@
+import time
+import threading
+from collections import OrderedDict
 from ml.analytics import generate_analytics
 from ml.inflation_forecast import forecast_expenses
 from ml.investment_insights import investment_insights
+from ml import intent_index
+from core.metrics import CACHE_REQUESTS
+
+FACTS_TTL_SECONDS = 60   # How long a user's computed facts are reused across a conversation
+MAX_CACHED_USERS = 1024
+ANALYTICS_INTENTS = ('spending', 'savings', 'inflation', 'investment')  # Answers built on the user's analytics
+
+# Fallback for queries the intent index is unsure about. Checked in order,
+# so "investment tip" is an investment question
+INTENT_KEYWORDS = [
+    ('spending', ('spend', 'spent', 'expense')),
+    ('savings', ('savings', 'save')),
+    ('inflation', ('inflation', 'future', 'next year')),
+    ('investment', ('investment', 'invest')),
+    ('tips', ('tip', 'advice')),
+]
+
+_fact_cache = OrderedDict()  # user_id -> (expires_at, facts dict)
+_fact_lock = threading.Lock()
+
+
+def classify_intent(query):
+    query = query.lower().strip()
+    intent, _ = intent_index.get_index().match_one(query)
+    if intent is not None:
+        return intent
+    # Not close enough to any example utterance; fall back to plain keywords
+    for intent, keywords in INTENT_KEYWORDS:
+        if any(word in query for word in keywords):
+            return intent
+    return 'help'
+
+
+def _cached_facts(user_id):
+    """The user's fact dict, shared by requests within FACTS_TTL_SECONDS"""
+    now = time.monotonic()
+    with _fact_lock:
+        entry = _fact_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _fact_cache.move_to_end(user_id)
+            CACHE_REQUESTS.labels(cache='chat_facts', result='hit').inc()
+            return entry[1]
+        CACHE_REQUESTS.labels(cache='chat_facts', result='miss').inc()
+        facts = {}
+        _fact_cache[user_id] = (now + FACTS_TTL_SECONDS, facts)
+        while len(_fact_cache) > MAX_CACHED_USERS:
+            _fact_cache.popitem(last=False)
+        return facts
+
+
+def clear_fact_cache(user_id=None):
+    with _fact_lock:
+        if user_id is None:
+            _fact_cache.clear()
+        else:
+            _fact_cache.pop(user_id, None)
+
+
+class ChatFacts:
+    """Lazily computed, memoized facts about one user; nothing runs until an answer needs it"""
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self._values = _cached_facts(user_id)
+
+    def _get(self, name, compute):
+        if name not in self._values:
+            self._values[name] = compute()
+        return self._values[name]
+
+    def has(self, name):
+        return name in self._values
+
+    def prime(self, name, value):
+        """Supply a fact computed elsewhere (the async view reads analytics on the async ORM)"""
+        self._values.setdefault(name, value)
+
+    @property
+    def analytics(self):
+        return self._get('analytics', lambda: generate_analytics(self.user_id))
+
+    @property
+    def spending_summary(self):
+        return self.analytics['summary']
+
+    @property
+    def total_spend(self):
+        return self.analytics['total_spend']
+
+    @property
+    def potential_savings(self):
+        return self.analytics['potential_savings']
+
+    @property
+    def forecast(self):
+        return self._get('forecast', lambda: forecast_expenses(self.spending_summary))
+
+    @property
+    def investment(self):
+        return self._get('investment', lambda: investment_insights(self.potential_savings))
+
 
 def chatbot_query(query, user_id=None):
     query = query.lower().strip()
-    
-    analytics = generate_analytics(user_id)
-    
-    if "spend" in query or "spent" in query or "expense" in query:
+    return answer_intent(classify_intent(query), query, ChatFacts(user_id))
+
+
+def answer_intent(intent, query, facts):
+    if intent == 'spending':
         if "groceries" in query or "food" in query:
-            amount = analytics['summary']['Groceries']
+            amount = facts.spending_summary['Groceries']
             return f"You spent Rs {amount:.2f} on Groceries this month."
         elif "transport" in query:
-            amount = analytics['summary']['Transport']
+            amount = facts.spending_summary['Transport']
             return f"You spent Rs {amount:.2f} on Transport this month."
         else:
-            total = analytics['total_spend']
+            total = facts.total_spend
             return f"Your total spending this month is Rs {total:.2f}."
-    
-    if "savings" in query or "save" in query:
-        savings = analytics['potential_savings']
+
+    if intent == 'savings':
+        savings = facts.potential_savings
         return f"You could potentially save Rs {savings:.2f} by optimizing your spending!"
-    
-    if "inflation" in query or "future" in query or "next year" in query:
-        sample_spending = analytics['summary']
-        forecast = forecast_expenses(sample_spending)
+
+    if intent == 'inflation':
+        forecast = facts.forecast
         return f"With current inflation trends, your expenses may rise by {forecast['increase_percent']}%. Total spending could be Rs {forecast['forecast_total']:.2f} in 12 months."
-    
-    if "investment" in query or "invest" in query:
-        savings = analytics['potential_savings']
-        insights = investment_insights(savings)
-        return insights['advice']
-    
-    if "tip" in query or "advice" in query:
+
+    if intent == 'investment':
+        return facts.investment['advice']
+
+    if intent == 'tips':
         return "Tip: Track daily expenses and aim to keep discretionary spending (eating out, entertainment) under 20% of your budget."
-    
+
     return "I'm your FinWise assistant! Ask me about spending, savings, inflation, investments, or tips."
 
 # Test
@@ -42,4 +144,4 @@ if __name__ == "__main__":
     print(chatbot_query("How much did I spend on food?"))
     print(chatbot_query("What is my potential savings?"))
     print(chatbot_query("What about inflation next year?"))
-    print(chatbot_query("Give me an investment tip"))
\ No newline at end of file
+    print(chatbot_query("Give me an investment tip"))
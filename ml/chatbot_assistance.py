@@ -1,31 +1,22 @@
-import joblib
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+from ml.dataset import get_dataset
+from ml.intent_index import get_index
 
-vectorizer = joblib.load('expense_vectorizer.pkl')  
 responses = {
     'spending': 'Your monthly spending on {category} is {amount}.',
     'savings': 'You can potentially save {amount} by cutting {category}.',
     'tips': 'Tip: Track daily expenses to meet your {goal}% savings goal.'
 }
 
-def chatbot_query(user_query, user_data_file='data.csv'):
-    df = pd.read_csv(user_data_file)
-    user_row = df.iloc[0]  
-    # Vectorize query
-    query_vec = vectorizer.transform([user_query])
-    
-    # Simple matching
-    known_queries = ['how much spent on food', 'savings goal', 'financial tips']
-    known_vecs = vectorizer.transform(known_queries)
-    sim = cosine_similarity(query_vec, known_vecs)[0]
-    best_match = np.argmax(sim)
-    
-    if best_match == 0:  # Spending
+def chatbot_query(user_query, user_data_file=None):
+    # Intent comes from the shared index, vectorized once per process
+    intent, _ = get_index().match_one(user_query)
+    user_row = get_dataset(user_data_file).row(0)
+
+    if intent == 'spending':
         category = 'Groceries' if 'food' in user_query.lower() else 'Transport'
         amount = user_row[category]
         return responses['spending'].format(category=category, amount=amount)
-    elif best_match == 1:  # Savings
+    elif intent == 'savings':
         amount = user_row['Potential_Savings_Groceries']
         return responses['savings'].format(amount=amount, category='Groceries')
     else:
@@ -33,4 +24,5 @@ def chatbot_query(user_query, user_data_file='data.csv'):
         return responses['tips'].format(goal=goal)
 
 # Example
-print(chatbot_query('How much did I spend on food?'))
\ No newline at end of file
+if __name__ == "__main__":
+    print(chatbot_query('How much did I spend on food?'))
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import numpy as np
+from ml.dataset import ML_DIR, get_dataset
+from ml.allocation_profile import ALLOCATION_CATEGORIES, get_profile
+
+STATS_FILE = os.path.join(ML_DIR, 'cohort_stats.npz')
+STATS_VERSION = 1
+RECHECK_SECONDS = 60
+QUANTILES = np.linspace(0, 1, 101)  # Percentiles 0..100
+
+SPEND_METRICS = ALLOCATION_CATEGORIES
+SAVINGS_METRICS = [f'Potential_Savings_{cat}' for cat in ALLOCATION_CATEGORIES]
+METRICS = SPEND_METRICS + SAVINGS_METRICS + ['Potential_Savings_Total']
+
+_stats = None
+_checked_at = 0.0
+
+
+def build_stats(data_file=None):
+    """Per income band x metric quantiles and means over every user, in one vectorized pass"""
+    ds = get_dataset(data_file)
+    profile = get_profile(data_file)
+    edges = np.asarray(profile['income_edges'])
+
+    spend = ds.matrix(SPEND_METRICS)
+    savings = np.column_stack([ds.column(col) if col in ds else np.zeros(len(ds)) for col in SAVINGS_METRICS])
+    values = np.column_stack([spend, savings, savings.sum(axis=1)])  # (rows, metrics)
+
+    bands = np.searchsorted(edges, np.asarray(ds.column('Income')), side='right')
+    n_bands = len(edges) + 1
+
+    # Group rows by band once, then take all metric quantiles of each band in one call
+    order = np.argsort(bands, kind='stable')
+    bounds = np.searchsorted(bands[order], np.arange(n_bands + 1))
+    quantiles = np.full((n_bands, len(QUANTILES), len(METRICS)), np.nan)
+    means = np.full((n_bands, len(METRICS)), np.nan)
+    counts = np.diff(bounds)
+    for band in range(n_bands):
+        rows = order[bounds[band]:bounds[band + 1]]
+        if len(rows):
+            quantiles[band] = np.quantile(values[rows], QUANTILES, axis=0)
+            means[band] = values[rows].mean(axis=0)
+
+    return {
+        'meta': {'version': STATS_VERSION, 'source': os.path.basename(ds.cache_dir), 'metrics': METRICS},
+        'income_edges': edges,
+        'quantiles': quantiles,
+        'means': means,
+        'counts': counts,
+    }
+
+
+def _load(path):
+    try:
+        with np.load(path) as data:
+            stats = {name: data[name] for name in ('income_edges', 'quantiles', 'means', 'counts')}
+            stats['meta'] = json.loads(str(data['meta']))
+        return stats
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        return None
+
+
+def _save(stats, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, meta=json.dumps(stats['meta']), income_edges=stats['income_edges'],
+                        quantiles=stats['quantiles'], means=stats['means'], counts=stats['counts'])
+    os.replace(tmp_path, path)
+
+
+def _is_fresh(stats, source):
+    return stats is not None and stats['meta'].get('version') == STATS_VERSION and stats['meta'].get('source') == source
+
+
+def get_stats():
+    """Cohort statistics, rebuilt only when the underlying dataset cache changes"""
+    global _stats, _checked_at
+    now = time.monotonic()
+    if _stats is not None and now - _checked_at < RECHECK_SECONDS:
+        return _stats
+
+    source = os.path.basename(get_dataset().cache_dir)
+    if not _is_fresh(_stats, source):
+        stats = _load(STATS_FILE)
+        if not _is_fresh(stats, source):
+            stats = build_stats()
+            _save(stats, STATS_FILE)
+        _stats = stats
+    _checked_at = now
+    return _stats
+
+
+def peer_percentile(income, metric, value, stats=None):
+    """Share (0-100) of users in the same income band with a lower value for metric"""
+    stats = stats or get_stats()
+    band = int(np.searchsorted(stats['income_edges'], income, side='right'))
+    column = stats['quantiles'][band, :, METRICS.index(metric)]
+    if np.isnan(column[0]):
+        return None
+    # Binary search + linear interpolation into the precomputed quantile curve
+    return float(np.interp(value, column, QUANTILES * 100))
+
+
+def peer_comparison(income, summary, potential_savings=None):
+    """Percentile of each category (and potential savings) against the user's income band"""
+    stats = get_stats()
+    band = int(np.searchsorted(stats['income_edges'], income, side='right'))
+    categories = {}
+    insights = []
+    for cat in SPEND_METRICS:
+        if cat not in summary:
+            continue
+        pct = peer_percentile(income, cat, summary[cat], stats)
+        if pct is None:
+            continue
+        mean = float(stats['means'][band, METRICS.index(cat)])
+        categories[cat] = {'percentile': round(pct, 1), 'band_average': round(mean, 2)}
+        if pct >= 75:
+            insights.append(f"You spend more on {cat} than {pct:.0f}% of users in your income band.")
+        elif pct <= 25 and summary[cat] > 0:
+            insights.append(f"You spend less on {cat} than {100 - pct:.0f}% of users in your income band.")
+
+    result = {
+        'income_band': band + 1,
+        'band_count': len(stats['counts']),
+        'peers_in_band': int(stats['counts'][band]),
+        'categories': categories,
+        'insights': insights,
+    }
+    if potential_savings is not None:
+        pct = peer_percentile(income, 'Potential_Savings_Total', potential_savings, stats)
+        result['potential_savings_percentile'] = round(pct, 1) if pct is not None else None
+    return result
+
+
+# Build (or refresh) the artifact ahead of time
+if __name__ == "__main__":
+    start = time.perf_counter()
+    stats = build_stats()
+    _save(stats, STATS_FILE)
+    print(f"Cohort stats for {int(stats['counts'].sum())} users in {(time.perf_counter() - start) * 1000:.1f} ms -> {STATS_FILE}")
+    start = time.perf_counter()
+    for _ in range(1000):
+        peer_percentile(60000, 'Eating_Out', 4000, stats)
+    print(f"Peer lookup: {(time.perf_counter() - start) * 1000:.1f} us")
@@ -105,20 +105,21 @@ def create_variations(text):
     
     return variations
 
+# Realistic amount range per category in PKR
+AMOUNT_RANGES = {
+    'Groceries': (100, 15000),
+    'Transport': (50, 5000),
+    'Eating_Out': (200, 8000),
+    'Utilities': (500, 25000),
+    'Healthcare': (300, 50000),
+    'Entertainment': (500, 10000),
+    'Education': (1000, 100000),
+    'Miscellaneous': (100, 20000)
+}
+
 def generate_amount(category):
     """Generate realistic amounts for each category in PKR"""
-    amount_ranges = {
-        'Groceries': (100, 15000),
-        'Transport': (50, 5000),
-        'Eating_Out': (200, 8000),
-        'Utilities': (500, 25000),
-        'Healthcare': (300, 50000),
-        'Entertainment': (500, 10000),
-        'Education': (1000, 100000),
-        'Miscellaneous': (100, 20000)
-    }
-    
-    min_amt, max_amt = amount_ranges.get(category, (100, 10000))
+    min_amt, max_amt = AMOUNT_RANGES.get(category, (100, 10000))
     # Use log-normal distribution for more realistic amounts
     amount = np.random.lognormal(np.log(min_amt + (max_amt-min_amt)/4), 1)
     return min(max(amount, min_amt), max_amt)
@@ -161,26 +162,27 @@ def create_training_data(num_samples=1500):
     
     return pd.DataFrame(data)
 
-# Generate the training data
-print("Generating training data...")
-df_training = create_training_data(1500)
+if __name__ == "__main__":
+    # Generate the training data
+    print("Generating training data...")
+    df_training = create_training_data(1500)
 
-# Display statistics
-print(f"\nTotal samples generated: {len(df_training)}")
-print(f"\nCategory distribution:")
-print(df_training['category'].value_counts())
+    # Display statistics
+    print(f"\nTotal samples generated: {len(df_training)}")
+    print(f"\nCategory distribution:")
+    print(df_training['category'].value_counts())
 
-print(f"\nSample data:")
-print(df_training.sample(10))
+    print(f"\nSample data:")
+    print(df_training.sample(10))
 
-# Save to CSV
-df_training.to_csv('transaction_training_data.csv', index=False)
-print(f"\nTraining data saved to 'transaction_training_data.csv'")
+    # Save to CSV
+    df_training.to_csv('transaction_training_data.csv', index=False)
+    print(f"\nTraining data saved to 'transaction_training_data.csv'")
 
-# Show some interesting variations
-print("\nExample variations generated:")
-for category in ['Groceries', 'Transport', 'Eating_Out']:
-    samples = df_training[df_training['category'] == category].sample(3)
-    print(f"\n{category}:")
-    for _, row in samples.iterrows():
-        print(f"  - {row['description']} : PKR {row['amount']}")
\ No newline at end of file
+    # Show some interesting variations
+    print("\nExample variations generated:")
+    for category in ['Groceries', 'Transport', 'Eating_Out']:
+        samples = df_training[df_training['category'] == category].sample(3)
+        print(f"\n{category}:")
+        for _, row in samples.iterrows():
+            print(f"  - {row['description']} : PKR {row['amount']}")
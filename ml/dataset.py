@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+CACHE_ROOT = os.path.join(ML_DIR, '.dataset_cache')
+
+# Bump when the on-disk layout changes so old caches are rebuilt
+CACHE_VERSION = 1
+RECHECK_SECONDS = 60  # How often a loaded dataset re-stats its source CSV
+
+
+def resolve_data_file():
+    """data.csv location: $FINWISE_DATA_FILE, else ml/data.csv, else <project root>/data.csv"""
+    env_path = os.environ.get('FINWISE_DATA_FILE')
+    if env_path:
+        return env_path
+    for candidate in (os.path.join(ML_DIR, 'data.csv'), os.path.join(PROJECT_ROOT, 'data.csv')):
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join(ML_DIR, 'data.csv')
+
+
+DEFAULT_DATA_FILE = resolve_data_file()
+
+
+class Dataset:
+    """Read-only, column-oriented view of a converted CSV.
+
+    Every column is a .npy file opened as a memmap, so column access is zero-copy
+    and only the pages actually touched are read. If the CSV has an integer
+    user_id column, a dense user_id -> row array gives O(1) row lookups.
+    """
+
+    def __init__(self, cache_dir, meta):
+        self.cache_dir = cache_dir
+        self.meta = meta
+        self.columns = meta['columns']
+        self._columns = {}
+        self._user_index = None
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __contains__(self, name):
+        return name in self.meta['files']
+
+    def column(self, name):
+        col = self._columns.get(name)
+        if col is None:
+            if name not in self.meta['files']:
+                raise KeyError(f"Column '{name}' not in dataset")
+            col = np.load(os.path.join(self.cache_dir, self.meta['files'][name]), mmap_mode='r')
+            self._columns[name] = col
+        return col
+
+    def numeric_columns(self):
+        return [name for name in self.columns if self.meta['kinds'][name] == 'numeric']
+
+    def matrix(self, names, rows=None):
+        """2-D float array of the given columns (a copy; optionally only some rows)"""
+        cols = [self.column(name) if rows is None else self.column(name)[rows] for name in names]
+        return np.column_stack(cols).astype(np.float64, copy=False)
+
+    def row(self, index):
+        return {name: self.column(name)[index].item() for name in self.columns}
+
+    def find_row(self, user_id):
+        """Row index of the first row with this user_id, or None"""
+        if self._user_index is None:
+            if 'user_index' not in self.meta:
+                # Non-integer ids can't use the dense index; fall back to a column scan
+                if 'user_id' not in self:
+                    return None
+                matches = np.flatnonzero(self.column('user_id') == user_id)
+                return int(matches[0]) if len(matches) else None
+            self._user_index = np.load(os.path.join(self.cache_dir, self.meta['user_index']), mmap_mode='r')
+        if not 0 <= user_id < len(self._user_index):
+            return None
+        index = int(self._user_index[user_id])
+        return index if index >= 0 else None
+
+
+def _source_stamp(data_file):
+    st = os.stat(data_file)
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _cache_dir_for(data_file, stamp):
+    stem = os.path.splitext(os.path.basename(data_file))[0]
+    path_key = hashlib.md5(os.path.abspath(data_file).encode()).hexdigest()[:8]  # Keeps same-named files apart
+    return os.path.join(CACHE_ROOT, f"{stem}-{path_key}-v{CACHE_VERSION}-{stamp['mtime_ns']}-{stamp['size']}")
+
+
+def convert_csv(data_file, cache_dir):
+    """One full parse of the CSV into per-column .npy files plus a user_id index"""
+    import pandas as pd
+
+    df = pd.read_csv(data_file)
+    tmp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    meta = {'version': CACHE_VERSION, 'source': _source_stamp(data_file), 'rows': int(len(df)),
+            'columns': list(df.columns), 'files': {}, 'kinds': {}}
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        if pd.api.types.is_numeric_dtype(series):
+            values, kind = series.to_numpy(), 'numeric'
+        else:
+            values, kind = series.astype(str).to_numpy(dtype=str), 'text'  # Fixed-width, so mmap-able
+        filename = f"{i:03d}.npy"
+        np.save(os.path.join(tmp_dir, filename), values)
+        meta['files'][name] = filename
+        meta['kinds'][name] = kind
+
+    if 'user_id' in df.columns and pd.api.types.is_integer_dtype(df['user_id']) and len(df):
+        ids = df['user_id'].to_numpy()
+        if ids.min() >= 0:
+            index = np.full(int(ids.max()) + 1, -1, dtype=np.int64)
+            rows = np.arange(len(ids), dtype=np.int64)
+            index[ids[::-1]] = rows[::-1]  # Reversed so the first occurrence wins, like the old mask lookup
+            np.save(os.path.join(tmp_dir, 'user_index.npy'), index)
+            meta['user_index'] = 'user_index.npy'
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        # Another worker finished the same conversion first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return cache_dir
+
+
+def _prune_stale(keep_dir):
+    stem = os.path.basename(keep_dir).rsplit('-v', 1)[0]
+    for name in os.listdir(CACHE_ROOT):
+        path = os.path.join(CACHE_ROOT, name)
+        if path != keep_dir and name.startswith(stem + '-v') and not name.endswith('.tmp'):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+_datasets = {}  # data_file -> (Dataset, checked_at)
+
+
+def get_dataset(data_file=None):
+    """Shared, lazily revalidated Dataset for data_file (default: resolve_data_file())"""
+    data_file = data_file or DEFAULT_DATA_FILE
+    now = time.monotonic()
+    cached = _datasets.get(data_file)
+    if cached is not None and now - cached[1] < RECHECK_SECONDS:
+        return cached[0]
+
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"data.csv not found at: {data_file}")
+    cache_dir = _cache_dir_for(data_file, _source_stamp(data_file))
+    if cached is not None and cached[0].cache_dir == cache_dir:
+        _datasets[data_file] = (cached[0], now)
+        return cached[0]
+
+    if not os.path.exists(os.path.join(cache_dir, 'meta.json')):
+        os.makedirs(CACHE_ROOT, exist_ok=True)
+        convert_csv(data_file, cache_dir)
+        _prune_stale(cache_dir)
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        dataset = Dataset(cache_dir, json.load(f))
+
+    _datasets[data_file] = (dataset, now)
+    return dataset
+
+
+def clear_cache():
+    _datasets.clear()
+
+
+# Convert ahead of time (e.g. during deploy) and show what was cached
+if __name__ == "__main__":
+    ds = get_dataset()
+    print(f"{len(ds)} rows, {len(ds.columns)} columns cached in {ds.cache_dir}")
+    print(ds.row(0))
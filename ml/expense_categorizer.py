@@ -1,7 +1,13 @@
 import os
+import time
 import pickle
-import pandas as pd
+import logging
 import numpy as np
+from core.tracing import span
+from core.metrics import CATEGORIZE_SECONDS, CATEGORIZE_BATCH_SIZE, CATEGORIZE_ERRORS, MODEL_LOAD_SECONDS
+
+logger = logging.getLogger('finwise.ml')
+
 _model = None
 _vectorizer = None
 _label_encoder = None
@@ -33,14 +39,13 @@ def _load_models():
             "\nPlease ensure you've trained the model first!"
         )
 
-    with open(model_path, 'rb') as f:
-        _model = pickle.load(f)
-    with open(vectorizer_path, 'rb') as f:
-        _vectorizer = pickle.load(f)
-    with open(label_encoder_path, 'rb') as f:
-        _label_encoder = pickle.load(f)
-
-    print("ML models loaded successfully from ml/")
+    with span('model_load'), MODEL_LOAD_SECONDS.labels(model='categorizer').time():
+        with open(model_path, 'rb') as f:
+            _model = pickle.load(f)
+        with open(vectorizer_path, 'rb') as f:
+            _vectorizer = pickle.load(f)
+        with open(label_encoder_path, 'rb') as f:
+            _label_encoder = pickle.load(f)
 
 def categorize_expense(description, explain=False):
     _load_models()  # Load models only when needed
@@ -62,19 +67,22 @@ def categorize_expense(description, explain=False):
             "explanation": "Empty description after cleaning"
         }
 
+    start = time.perf_counter()
     try:
         # Step 1: Vectorize
-        text_vector = _vectorizer.transform([description])
+        with span('vectorize'):
+            text_vector = _vectorizer.transform([description])
 
-        # Step 2: Predict category
-        prediction_encoded = _model.predict(text_vector)[0]
-        category = _label_encoder.inverse_transform([prediction_encoded])[0]
+        with span('predict'):
+            # Step 2: Predict category
+            prediction_encoded = _model.predict(text_vector)[0]
+            category = _label_encoder.inverse_transform([prediction_encoded])[0]
 
-        # Step 3: Get confidence
-        confidence = 0.0
-        if hasattr(_model, "predict_proba"):
-            probabilities = _model.predict_proba(text_vector)[0]
-            confidence = round(max(probabilities) * 100, 2)
+            # Step 3: Get confidence
+            confidence = 0.0
+            if hasattr(_model, "predict_proba"):
+                probabilities = _model.predict_proba(text_vector)[0]
+                confidence = round(max(probabilities) * 100, 2)
 
         result = {
             "category": category,
@@ -84,18 +92,22 @@ def categorize_expense(description, explain=False):
 
         # Optional: Explainability - Get top features (words) using feature importance
         if explain:
-            feature_names = _vectorizer.get_feature_names_out()
-            if hasattr(_model, 'feature_importances_'):
-                importances = _model.feature_importances_
-                top_indices = np.argsort(importances)[-5:]  # Top 5 features
-                top_features = [feature_names[i] for i in top_indices if importances[i] > 0]
-                result["explanation"] = f"Top contributing words: {', '.join(top_features or ['No significant features'])} (matched to {category})"
-            else:
-                result["explanation"] = "No feature importance available for this model type."
-
+            with span('explain'):
+                feature_names = _vectorizer.get_feature_names_out()
+                if hasattr(_model, 'feature_importances_'):
+                    importances = _model.feature_importances_
+                    top_indices = np.argsort(importances)[-5:]  # Top 5 features
+                    top_features = [feature_names[i] for i in top_indices if importances[i] > 0]
+                    result["explanation"] = f"Top contributing words: {', '.join(top_features or ['No significant features'])} (matched to {category})"
+                else:
+                    result["explanation"] = "No feature importance available for this model type."
+
+        CATEGORIZE_SECONDS.labels(mode='single').observe(time.perf_counter() - start)
+        CATEGORIZE_BATCH_SIZE.labels(mode='single').observe(1)
         return result
     except Exception as e:
-        print(f"Prediction error: {e}")
+        CATEGORIZE_ERRORS.inc()
+        logger.warning("Categorizer prediction failed: %s", e)
         return {
             "category": "Miscellaneous",
             "confidence": 0.0,
@@ -110,16 +122,21 @@ def categorize_multiple_expenses(descriptions):
     
     # Clean descriptions
     cleaned = [str(d).strip() if d else "" for d in descriptions]
+    start = time.perf_counter()
     
     # Vectorize all at once (faster than one-by-one)
-    text_vectors = _vectorizer.transform(cleaned)
-    
-    # Predict all
-    predictions_encoded = _model.predict(text_vectors)
-    
-    # Convert all back to names
-    categories = _label_encoder.inverse_transform(predictions_encoded)
+    with span('vectorize'):
+        text_vectors = _vectorizer.transform(cleaned)
     
+    with span('predict'):
+        # Predict all
+        predictions_encoded = _model.predict(text_vectors)
+
+        # Convert all back to names
+        categories = _label_encoder.inverse_transform(predictions_encoded)
+
+    CATEGORIZE_SECONDS.labels(mode='batch').observe(time.perf_counter() - start)
+    CATEGORIZE_BATCH_SIZE.labels(mode='batch').observe(len(cleaned))
     return list(categories)
 
 # Test the function
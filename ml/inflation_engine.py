@@ -0,0 +1,120 @@
+import numpy as np
+
+MAX_HORIZON = 60  # Months
+# Category-specific multipliers on the headline rate (food inflates more)
+CATEGORY_MULTIPLIERS = {
+    'Groceries': 1.3, 'Eating_Out': 1.2, 'Transport': 1.1,
+    'Utilities': 1.15, 'Healthcare': 1.1,
+}
+DEFAULT_MULTIPLIER = 1.0
+# Deterministic scenarios as offsets (percentage points) from the base annual rate
+SCENARIO_OFFSETS = {'low': -2.0, 'base': 0.0, 'high': 3.0}
+
+MC_PATHS = 1000
+RATE_VOLATILITY = 2.0     # Std-dev (pct points) of the annual rate after 12 months of drift
+BAND_QUANTILES = (0.05, 0.5, 0.95)
+BAND_CHUNK_ELEMENTS = 20_000_000  # Bounds the users x horizons x paths block for total bands
+
+
+def horizons_array(horizons=None):
+    """Months ahead as an int array; default is every month 1..12"""
+    h = np.arange(1, 13) if horizons is None else np.atleast_1d(np.asarray(horizons, dtype=np.int64))
+    if h.size == 0 or h.min() < 1 or h.max() > MAX_HORIZON:
+        raise ValueError(f"Horizons must be between 1 and {MAX_HORIZON} months")
+    return h
+
+
+def category_multipliers(categories):
+    return np.array([CATEGORY_MULTIPLIERS.get(cat, DEFAULT_MULTIPLIER) for cat in categories])
+
+
+def scenario_rates(base_rate, offsets=None):
+    """{scenario: annual rate in percent} around base_rate"""
+    offsets = SCENARIO_OFFSETS if offsets is None else offsets
+    return {name: base_rate + offset for name, offset in offsets.items()}
+
+
+def scenario_growth(categories, horizons, rates):
+    """(categories, horizons, scenarios) price multipliers for constant annual rates"""
+    m = category_multipliers(categories)[:, None, None]
+    h = horizons_array(horizons)[None, :, None]
+    r = np.asarray(rates, dtype=np.float64)[None, None, :] / 100
+    return (1 + r * m) ** (h / 12)
+
+
+def monte_carlo_growth(categories, horizons, base_rate, volatility=RATE_VOLATILITY, paths=MC_PATHS, seed=None):
+    """(categories, horizons, paths) price multipliers under randomly drifting rates.
+
+    The annual rate follows a random walk from base_rate, so uncertainty
+    widens with the horizon; each month compounds one twelfth of that
+    month's rate (scaled by the category multiplier).
+    """
+    h = horizons_array(horizons)
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, volatility / np.sqrt(12), size=(h.max(), paths))
+    rates = np.maximum(base_rate + np.cumsum(steps, axis=0), -50.0) / 100  # (months, paths)
+    m = category_multipliers(categories)[:, None, None]
+    log_growth = np.cumsum(np.log1p(rates[None] * m) / 12, axis=1)  # (categories, months, paths)
+    return np.exp(log_growth[:, h - 1, :])
+
+
+def forecast_batch(spending, categories, base_rate, horizons=None, scenarios=None,
+                   monte_carlo=True, paths=MC_PATHS, quantiles=BAND_QUANTILES, seed=None):
+    """Project spending for many users at once.
+
+    spending is a (users, categories) array of current monthly spend. Returns
+    arrays indexed [user, category, horizon, scenario] (projections) and
+    [user, horizon, scenario] (totals); with monte_carlo, confidence bands
+    indexed [user, category, horizon, quantile] and [user, horizon, quantile].
+    """
+    spending = np.atleast_2d(np.asarray(spending, dtype=np.float64))
+    if spending.shape[1] != len(categories):
+        raise ValueError(f"spending has {spending.shape[1]} columns for {len(categories)} categories")
+    h = horizons_array(horizons)
+    rates = scenario_rates(base_rate, scenarios)
+
+    growth = scenario_growth(categories, h, list(rates.values()))
+    projections = spending[:, :, None, None] * growth[None]
+    result = {
+        'categories': list(categories),
+        'horizons': h,
+        'scenarios': list(rates),
+        'scenario_rates': np.array(list(rates.values())),
+        'current_totals': spending.sum(axis=1),
+        'projections': projections,
+        'totals': projections.sum(axis=1),
+    }
+
+    if monte_carlo:
+        q = np.asarray(quantiles)
+        paths_growth = monte_carlo_growth(categories, h, base_rate, paths=paths, seed=seed)
+        # Quantiles of a non-negative multiple are the multiple of the quantiles, so per-category
+        # bands need the path dimension only once, not per user
+        growth_q = np.moveaxis(np.quantile(paths_growth, q, axis=-1), 0, -1)  # (categories, horizons, quantiles)
+        # Totals mix categories, so they are summed per path; users go in chunks to bound memory
+        totals_q = np.empty((len(spending), len(h), len(q)))
+        chunk = max(1, BAND_CHUNK_ELEMENTS // (len(h) * paths))
+        flat_growth = paths_growth.reshape(len(categories), -1)
+        for start in range(0, len(spending), chunk):
+            users = spending[start:start + chunk]
+            block = (users @ flat_growth).reshape(len(users), len(h), paths)  # One matmul per chunk
+            totals_q[start:start + chunk] = np.moveaxis(np.quantile(block, q, axis=-1), 0, -1)
+        result['bands'] = {
+            'quantiles': q,
+            'projections': spending[:, :, None, None] * growth_q[None],
+            'totals': totals_q,
+        }
+    return result
+
+
+# Test
+if __name__ == "__main__":
+    import time
+    from ml.allocation_profile import ALLOCATION_CATEGORIES
+    rng = np.random.default_rng(0)
+    for users in (1, 1000, 10000):
+        spend = rng.uniform(0, 10000, size=(users, len(ALLOCATION_CATEGORIES)))
+        start = time.perf_counter()
+        out = forecast_batch(spend, ALLOCATION_CATEGORIES, 6.0, horizons=[1, 3, 6, 12, 24, 36, 60], seed=0)
+        print(f"{users:>6} users: {(time.perf_counter() - start) * 1000:8.1f} ms  "
+              f"projections {out['projections'].shape}  bands {out['bands']['totals'].shape}")
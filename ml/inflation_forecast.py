@@ -1,5 +1,4 @@
-import requests
-import os
+from ml.inflation_engine import forecast_batch
 
 def get_pakistan_inflation_rate():
     # Latest from searches (Dec 2025: 5.6%, 2026 forecast ~6%)
@@ -8,28 +7,21 @@ def get_pakistan_inflation_rate():
     return {"current": current_rate, "forecast_2026": forecast_2026}
 
 def forecast_expenses(current_spending_dict, months=12):
+    # Single user, single horizon, base scenario of the vectorized engine
     rates = get_pakistan_inflation_rate()
-    forecast_rate = rates["forecast_2026"] / 100  # Decimal
-    
-    # Category-specific multipliers (food inflates more)
-    multipliers = {
-        'Groceries': 1.3, 'Eating_Out': 1.2, 'Transport': 1.1,
-        'Utilities': 1.15, 'Healthcare': 1.1, 'default': 1.0
-    }
-    
-    forecasted = {}
-    for cat, amount in current_spending_dict.items():
-        mult = multipliers.get(cat, multipliers['default'])
-        future = amount * ((1 + forecast_rate * mult) ** (months / 12))
-        forecasted[cat] = round(future, 2)
-    
+    categories = list(current_spending_dict)
+    result = forecast_batch([list(current_spending_dict.values())], categories, rates["forecast_2026"],
+                            horizons=[months], scenarios={'base': 0.0}, monte_carlo=False)
+    future = result['projections'][0, :, 0, 0]
+    forecasted = {cat: round(float(amount), 2) for cat, amount in zip(categories, future)}
+
     total_current = sum(current_spending_dict.values())
     total_future = sum(forecasted.values())
     
     return {
         "current_total": round(total_current, 2),
         "forecast_total": round(total_future, 2),
-        "increase_percent": round(((total_future - total_current) / total_current) * 100, 1),
+        "increase_percent": round(((total_future - total_current) / total_current) * 100, 1) if total_current else 0.0,
         "forecasted_spending": forecasted,
         "inflation_info": f"Based on Dec 2025 rate {rates['current']}% and 2026 forecast ~{rates['forecast_2026']}%. Food categories adjusted higher."
     }
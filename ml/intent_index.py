@@ -0,0 +1,158 @@
+import threading
+import numpy as np
+from core.metrics import MODEL_LOAD_SECONDS
+
+MIN_CONFIDENCE = 0.35  # Below this cosine similarity the query is treated as unrecognised
+
+# Example utterances per intent. Add phrasings here rather than keywords in the chatbot.
+INTENT_EXAMPLES = {
+    'spending': [
+        "how much did i spend",
+        "how much did i spend on food",
+        "how much have i spent this month",
+        "what did i spend on groceries",
+        "show my spending",
+        "my total spending",
+        "how much money went on transport",
+        "what are my expenses",
+        "monthly expenses breakdown",
+        "where is my money going",
+        "spending on eating out",
+        "how much did i pay for utilities",
+        "total expenses this month",
+        "what have i spent on entertainment",
+    ],
+    'savings': [
+        "what is my potential savings",
+        "what are my savings",
+        "how much can i save",
+        "how can i save more money",
+        "savings goal",
+        "am i saving enough",
+        "where can i cut costs",
+        "how much money could i save",
+        "ways to reduce my expenses",
+        "how to save on groceries",
+        "what can i cut back on",
+        "help me save money",
+        "how much should i be saving",
+    ],
+    'inflation': [
+        "what about inflation next year",
+        "how will inflation affect me",
+        "future expenses",
+        "what will my expenses be next year",
+        "forecast my spending",
+        "how much will prices rise",
+        "expected cost increase",
+        "projected spending in 12 months",
+        "will my bills go up",
+        "inflation impact on my budget",
+        "predict my future costs",
+    ],
+    'investment': [
+        "give me an investment tip",
+        "where should i invest",
+        "how should i invest my savings",
+        "should i buy bitcoin",
+        "is crypto a good investment",
+        "what about gold",
+        "investment options",
+        "best place to put my money",
+        "should i invest in stocks",
+        "how to grow my savings",
+        "current bitcoin price",
+        "is it a good time to invest",
+    ],
+    'tips': [
+        "give me some advice",
+        "financial tips",
+        "any tips for budgeting",
+        "how do i manage my money better",
+        "budgeting advice",
+        "money management tips",
+        "how to stick to a budget",
+        "give me a tip",
+        "personal finance advice",
+        "how to be better with money",
+    ],
+    'help': [
+        "hello",
+        "hi there",
+        "hey",
+        "what can you do",
+        "help",
+        "who are you",
+        "what can i ask you",
+        "good morning",
+        "how does this work",
+    ],
+}
+
+
+class IntentIndex:
+    """Example utterances vectorized and L2-normalized once; queries are matched in batches"""
+
+    def __init__(self, examples=None, min_confidence=MIN_CONFIDENCE):
+        # scikit-learn costs ~1s to import, so it loads with the first index, not with the chatbot
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.preprocessing import normalize
+
+        examples = examples or INTENT_EXAMPLES
+        self.intents = list(examples)
+        self.min_confidence = min_confidence
+
+        texts = [text for intent in self.intents for text in examples[intent]]
+        sizes = [len(examples[intent]) for intent in self.intents]
+        # Examples are stored grouped by intent; offsets mark where each group starts
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        # Character n-grams within words cope with typos and word forms ("spend"/"spent"/"spending")
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)
+        matrix = self.vectorizer.fit_transform(texts)
+        self.matrix_t = normalize(matrix, norm='l2').T.tocsr()  # (features, examples)
+
+    def scores(self, queries):
+        """(queries, intents) best cosine similarity of each query against each intent's examples"""
+        from sklearn.preprocessing import normalize
+        query_vecs = normalize(self.vectorizer.transform([q.lower() for q in queries]), norm='l2')
+        sims = (query_vecs @ self.matrix_t).toarray()  # One sparse product for the whole batch
+        return np.maximum.reduceat(sims, self.offsets, axis=1)
+
+    def match(self, queries):
+        """[(intent or None, confidence)] for each query; None when below the threshold"""
+        if not queries:
+            return []
+        scores = self.scores(queries)
+        best = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(queries)), best]
+        return [(self.intents[i] if c >= self.min_confidence else None, float(c))
+                for i, c in zip(best, confidence)]
+
+    def match_one(self, query):
+        return self.match([query])[0]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                with MODEL_LOAD_SECONDS.labels(model='intent_index').time():
+                    _index = IntentIndex()
+    return _index
+
+
+def match(queries):
+    return get_index().match(queries)
+
+
+# Test
+if __name__ == "__main__":
+    queries = ["How much did I spend on food?", "Should I buy some gold?", "hows the weather", "any budgetting tips"]
+    for query, (intent, confidence) in zip(queries, match(queries)):
+        print(f"{query!r}: {intent} ({confidence:.2f})")
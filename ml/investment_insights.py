@@ -1,19 +1,12 @@
-import requests
+from ml.market_data import get_provider
 
 def get_market_data():
-    try:
-        # Gold in PKR (from coingecko proxy or hardcode latest)
-        gold_url = "https://api.coingecko.com/api/v3/simple/price?ids=gold&vs_currencies=pkr"
-        btc_url = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=pkr"
-        gold = requests.get(gold_url).json().get('gold', {}).get('pkr', 22000)  # gram approx
-        btc = requests.get(btc_url).json().get('bitcoin', {}).get('pkr', 18000000)
-    except:
-        gold = 22000  # fallback
-        btc = 18000000
-    return {"gold_per_gram_pkr": gold, "bitcoin_pkr": btc}
+    # Cached snapshot, refreshed in the background; see ml/market_data.py
+    return get_provider().get()
 
-def investment_insights(savings_amount):
-    market = get_market_data()
+def investment_insights(savings_amount, market=None):
+    # Async views pass prices from get_provider().aget()
+    market = market or get_market_data()
     if savings_amount > 20000:
         advice = "Strong savings! Consider Meezan Gold Fund or NBP Islamic Stock Fund."
     elif savings_amount > 10000:
@@ -0,0 +1,389 @@
+"""Market prices for investment insights, served from a process-wide cache.
+
+Requests read the cached snapshot and never wait on the network once it is
+warm; a snapshot older than FRESH_SECONDS is refreshed in the background
+(stale-while-revalidate). Upstream calls share a pooled session with strict
+timeouts, and a circuit breaker stops calling an upstream that keeps failing.
+
+Async views use aget() instead: the same cache, with the cold fetch and
+background refreshes running on the event loop through an httpx AsyncClient.
+Only an ASGI server (finwise/asgi.py sets LONG_LIVED_LOOP) keeps that client and
+those refresh tasks across requests; under WSGI each async view call runs on an
+event loop of its own, so the fetch gets a client that is closed before the
+loop is, and background refreshes go to the thread as they do for get().
+
+The source is chosen with FINWISE_MARKET_SOURCE:
+    coingecko              CoinGecko public API (default)
+    http://127.0.0.1:8080  any CoinGecko-compatible base URL, e.g. a local stub server
+    file:/path/prices.json a fixture file: {"gold_per_gram_pkr": 22000, "bitcoin_pkr": 18000000}
+    static                 the built-in fallback prices, no network at all
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.metrics import CACHE_REQUESTS, MARKET_FETCHES
+
+COINGECKO_URL = 'https://api.coingecko.com/api/v3'
+MARKET_SOURCE = os.environ.get('FINWISE_MARKET_SOURCE', 'coingecko')
+FRESH_SECONDS = 300        # Snapshot age that triggers a background refresh
+LONG_LIVED_LOOP = False    # True under ASGI: one event loop serves many requests
+CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT = 3.0
+FAILURE_THRESHOLD = 3      # Consecutive failures that open the circuit...
+RESET_SECONDS = 60         # ...and how long it stays open before one trial call
+RETRY_SECONDS = 30         # Gap between background attempts while serving fallback prices
+
+# Snapshot key -> (CoinGecko id, currency)
+ASSETS = {
+    'gold_per_gram_pkr': ('gold', 'pkr'),
+    'bitcoin_pkr': ('bitcoin', 'pkr'),
+}
+FALLBACK_PRICES = {'gold_per_gram_pkr': 22000, 'bitcoin_pkr': 18000000}
+
+
+class CircuitBreaker:
+    """Closed -> open after FAILURE_THRESHOLD failures -> one half-open trial after RESET_SECONDS"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.opened_at = time.monotonic()  # Let one trial through; the rest wait another period
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def _by_currency(assets):
+    ids = {}
+    for coin_id, currency in assets.values():
+        ids.setdefault(currency, []).append(coin_id)
+    return ids
+
+
+def _prices(assets, responses):
+    """Snapshot from (currency, simple/price body) pairs"""
+    quotes = {}
+    for currency, body in responses:
+        for coin_id, prices in body.items():
+            if currency in prices:
+                quotes[(coin_id, currency)] = prices[currency]
+    # Assets the upstream does not know are simply missing; the provider fills them in
+    return {name: quotes[spec] for name, spec in assets.items() if spec in quotes}
+
+
+class CoinGeckoSource:
+    """CoinGecko simple/price, one request per currency, issued concurrently"""
+
+    def __init__(self, base_url=COINGECKO_URL, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.reset()
+
+    def reset(self):
+        """Fresh connection pool and threads (also needed in a forked child)"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='market-data')
+        self._async_client = None  # httpx.AsyncClient, tied to the event loop that created it
+        self._async_loop = None
+
+    def _fetch(self, ids, currency):
+        response = self.session.get(f"{self.base_url}/simple/price",
+                                    params={'ids': ','.join(ids), 'vs_currencies': currency},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return currency, response.json()
+
+    def fetch(self, assets):
+        futures = [self._executor.submit(self._fetch, ids, cur) for cur, ids in _by_currency(assets).items()]
+        return _prices(assets, [future.result() for future in futures])
+
+    def _new_client(self):
+        import httpx
+
+        connect, read = self.timeout
+        return httpx.AsyncClient(timeout=httpx.Timeout(read, connect=connect),
+                                 limits=httpx.Limits(max_connections=8, max_keepalive_connections=2))
+
+    def _client(self):
+        # Shared by the requests of one long-lived loop; a client can't move to another loop
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            old_client, old_loop = self._async_client, self._async_loop
+            if old_client is not None and not old_loop.is_closed():
+                asyncio.run_coroutine_threadsafe(old_client.aclose(), old_loop)
+            self._async_client = self._new_client()
+            self._async_loop = loop
+        return self._async_client
+
+    async def _afetch(self, client, ids, currency):
+        response = await client.get(f"{self.base_url}/simple/price",
+                                    params={'ids': ','.join(ids), 'vs_currencies': currency})
+        response.raise_for_status()
+        return currency, response.json()
+
+    def _afetch_all(self, client, assets):
+        return asyncio.gather(*(self._afetch(client, ids, cur) for cur, ids in _by_currency(assets).items()))
+
+    async def afetch(self, assets):
+        import httpx
+
+        try:
+            if LONG_LIVED_LOOP:
+                responses = await self._afetch_all(self._client(), assets)
+            else:
+                async with self._new_client() as client:
+                    responses = await self._afetch_all(client, assets)
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"{type(e).__name__}: {e}") from e  # Same failure path as requests' errors
+        return _prices(assets, responses)
+
+
+class FileSource:
+    """Prices from a JSON fixture file, re-read on every refresh"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, assets):
+        with open(self.path) as f:
+            prices = json.load(f)
+        return {name: prices[name] for name in assets if name in prices}
+
+    async def afetch(self, assets):
+        return self.fetch(assets)  # A small local file
+
+
+class StaticSource:
+    def fetch(self, assets):
+        return {name: FALLBACK_PRICES[name] for name in assets if name in FALLBACK_PRICES}
+
+    async def afetch(self, assets):
+        return self.fetch(assets)
+
+
+def make_source(spec=None):
+    spec = spec or MARKET_SOURCE
+    if spec == 'static':
+        return StaticSource()
+    if spec == 'coingecko':
+        return CoinGeckoSource()
+    if spec.startswith('file:'):
+        return FileSource(spec[len('file:'):])
+    if spec.startswith(('http://', 'https://')):
+        return CoinGeckoSource(spec)
+    raise ValueError(f"Unknown market data source: {spec!r}")
+
+
+class MarketDataProvider:
+    def __init__(self, source=None, assets=None, fresh_seconds=FRESH_SECONDS, breaker=None):
+        self.source = source or make_source()
+        self.assets = assets or ASSETS
+        self.fresh_seconds = fresh_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.prices = None
+        self.updated_at = None      # Wall clock of the last successful fetch, for display
+        self.fetched_at = None      # Monotonic time of the last successful fetch (None: serving fallbacks)
+        self.last_error = None
+        self.attempted_at = None
+        self._refreshing = False
+        self._task = None  # Event-loop refresh, shared by concurrent aget() calls
+        self._lock = threading.Lock()
+        self._cold_lock = threading.Lock()
+
+    def _attempt(self):
+        self.attempted_at = time.monotonic()
+        if not self.breaker.allow():
+            MARKET_FETCHES.labels(result='circuit_open').inc()
+            return False
+        return True
+
+    def _failed(self, e):
+        MARKET_FETCHES.labels(result='error').inc()
+        self.breaker.record_failure()
+        self.last_error = f"{type(e).__name__}: {e}"
+        return False
+
+    def refresh(self):
+        """Fetch from the source now; returns True on success"""
+        if not self._attempt():
+            return False
+        try:
+            fetched = self.source.fetch(self.assets)
+        except Exception as e:  # Network errors, and upstream bodies that aren't the expected shape
+            return self._failed(e)
+        return self._store(fetched)
+
+    async def arefresh(self):
+        """refresh() on the event loop, with the source's async fetch"""
+        if not self._attempt():
+            return False
+        try:
+            fetched = await self.source.afetch(self.assets)
+        except Exception as e:
+            return self._failed(e)
+        return self._store(fetched)
+
+    def _store(self, fetched):
+        MARKET_FETCHES.labels(result='ok').inc()
+        self.breaker.record_success()
+        with self._lock:
+            # Keep the last known (or fallback) value for anything the source left out
+            previous = self.prices or FALLBACK_PRICES
+            self.prices = {name: fetched.get(name, previous.get(name)) for name in self.assets}
+            self.updated_at = time.time()
+            self.fetched_at = time.monotonic()
+            self.last_error = None
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh_async(self):
+        """Start a background refresh unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, name='market-data-refresh', daemon=True).start()
+
+    def _use_fallbacks(self):
+        # Unreachable: serve fallbacks, and keep retrying in the background
+        with self._lock:
+            self.prices = self.prices or {name: FALLBACK_PRICES.get(name) for name in self.assets}
+
+    def _due(self):
+        now = time.monotonic()
+        if self.fetched_at is not None:
+            return now - self.fetched_at >= self.fresh_seconds
+        return now - self.attempted_at >= RETRY_SECONDS
+
+    def get(self):
+        """Current prices. Only the first call in a process may wait on the network (bounded by the timeouts)."""
+        cold = self.prices is None
+        if cold:
+            with self._cold_lock:  # Concurrent first requests share one fetch
+                if self.prices is None and not self.refresh():
+                    self._use_fallbacks()
+        due = self._due()
+        if due:
+            self.refresh_async()
+        CACHE_REQUESTS.labels(cache='market_data', result='miss' if cold else 'stale' if due else 'hit').inc()
+        return dict(self.prices)
+
+    def _refresh_task(self):
+        loop = asyncio.get_running_loop()
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._task = loop.create_task(self.arefresh())
+        return task
+
+    async def aget(self):
+        """get() for async views: never blocks the event loop, and refreshes as a task on it"""
+        cold = self.prices is None
+        if cold:
+            # Concurrent first requests await one fetch; shielded so a cancelled request doesn't cancel it
+            if not await asyncio.shield(self._refresh_task()) and self.prices is None:
+                self._use_fallbacks()
+        due = self._due()
+        if due:
+            if LONG_LIVED_LOOP:
+                self._refresh_task()
+            else:
+                self.refresh_async()  # A task would die with this request's loop
+        CACHE_REQUESTS.labels(cache='market_data', result='miss' if cold else 'stale' if due else 'hit').inc()
+        return dict(self.prices)
+
+    def after_fork(self):
+        # Threads and pooled sockets don't survive fork; the snapshot itself is kept
+        self._refreshing = False
+        self._task = None
+        self._lock = threading.Lock()
+        self._cold_lock = threading.Lock()
+        if hasattr(self.source, 'reset'):
+            self.source.reset()
+
+    def status(self):
+        return {
+            'source': type(self.source).__name__,
+            'updated_at': self.updated_at,
+            'age_seconds': round(time.monotonic() - self.fetched_at, 1) if self.fetched_at else None,
+            'circuit': self.breaker.state,
+            'last_error': self.last_error,
+        }
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = MarketDataProvider()
+    return _provider
+
+
+def get_market_data():
+    return get_provider().get()
+
+
+def _after_fork_in_child():
+    global _provider_lock
+    _provider_lock = threading.Lock()
+    if _provider is not None:
+        _provider.after_fork()
+
+
+# Pre-fork servers (gunicorn --preload) may warm the provider in the master process
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+# Test
+if __name__ == "__main__":
+    provider = get_provider()
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        prices = provider.get()
+        print(f"{label}: {prices} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(provider.status())
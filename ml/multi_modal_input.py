@@ -1,64 +1,125 @@
+import os
 import re
 import xml.etree.ElementTree as ET
-import cv2  # From opencv-python
-import pytesseract  # For real OCR
 from ml.expense_categorizer import categorize_expense  # Assume from your ml folder (Module 3)
-from core.models import Category
-# Configure Tesseract path if needed (Windows default: C:\Program Files\Tesseract-OCR\tesseract.exe)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'  # Adjust if different
+from core.tracing import span, traced
+from core.metrics import CATEGORIES_CREATED, OCR_SECONDS
+
+# OpenCV and pytesseract are imported on first OCR, not at startup.
+# Tesseract binary: $TESSERACT_CMD, else the Windows default if present, else whatever is on PATH
+WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+_tesseract_ready = False
+
+def _ocr_modules():
+    global _tesseract_ready
+    import cv2  # From opencv-python
+    import pytesseract  # For real OCR
+    if not _tesseract_ready:
+        cmd = os.environ.get('TESSERACT_CMD')
+        if not cmd and os.name == 'nt' and os.path.exists(WINDOWS_TESSERACT):
+            cmd = WINDOWS_TESSERACT
+        if cmd:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+        _tesseract_ready = True
+    return cv2, pytesseract
+
 def get_or_create_category(name):
+    from core.models import Category
     cat, created = Category.objects.get_or_create(
         name=name,
         defaults={'description': f"Auto-created category for {name}"}  # Default value
     )
     if created:
-        print(f"Created new category: {name}")
+        CATEGORIES_CREATED.inc()
     return cat
 def parse_receipt_image(image_path):
     try:
-        img = cv2.imread(image_path)
-        if img is None:
-            return [{'error': f"Failed to load image: {image_path}"}]
-        
-        # Preprocess image for better OCR (grayscale, threshold)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        
-        # OCR extract text
-        text = pytesseract.image_to_string(thresh)
+        with span('ocr'), OCR_SECONDS.time():
+            cv2, pytesseract = _ocr_modules()
+            img = cv2.imread(image_path)
+            if img is None:
+                return [{'error': f"Failed to load image: {image_path}"}]
+
+            # Preprocess image for better OCR (grayscale, threshold)
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+            # OCR extract text
+            text = pytesseract.image_to_string(thresh)
         
-        # Split into lines/items
-        lines = text.splitlines()
-        transactions = []
-        for line in lines:
-            if line.strip():  # Skip empty
-                # Improved regex: Handles Rs.500.00, PKR 100, 2.50 FS, $5.99 N, etc.
-                amount_match = re.search(r'(Rs\.?|PKR|Rs|₹|\$)?\s*(\d+\.?\d*)\s*(FS|F|N)?$', line, re.IGNORECASE) or re.search(r'(\d+\.?\d*)\s*(Rs\.?|PKR|Rs|₹|\$)?', line, re.IGNORECASE)
-                amount = float(amount_match.group(1) or amount_match.group(2)) if amount_match else 0.0
-                desc = re.sub(r'(Rs\.?|PKR|Rs|₹|\$)?\s*\d+\.?\d*\s*(FS|F|N)?', '', line).strip()
-                transactions.append({'text': desc, 'amount': amount, 'source': 'receipt'})
-        return transactions
+        return parse_receipt_text(text, image_path)
     except Exception as e:
         return [{'error': f"OCR failed for {image_path}: {str(e)}"}]
 
+# Receipt lines that are not purchases. A total line sets the receipt amount; the rest are skipped
+TOTAL_LINE = re.compile(r'\b(grand\s*total|total|amount\s*due|balance\s*due|net\s*(amount|payable)|to\s*pay)\b', re.IGNORECASE)
+SUMMARY_LINE = re.compile(r'\b(sub\s*-?\s*total|cash|change|tender(ed)?|card|visa|master\s*card|paid|balance|saving)\b', re.IGNORECASE)
+MAX_DESCRIPTION = 200
+
+def build_receipt(lines, image=None):
+    """One transaction for a whole receipt from its (text, amount, is_total) lines.
+
+    The amount is the last total line's, or the sum of the items if the receipt
+    has none, so totals are never added on top of the items. Subtotal and
+    payment lines are dropped; the first zero-amount line (the header) names the merchant.
+    """
+    merchant, printed_total, items = '', None, []
+    for text, amount, is_total in lines:
+        if is_total or (TOTAL_LINE.search(text) and not SUMMARY_LINE.search(text)):
+            if amount > 0:
+                printed_total = amount
+        elif SUMMARY_LINE.search(text):
+            continue
+        elif amount > 0:
+            items.append([text, round(amount, 2)])
+        elif text and not merchant:
+            merchant = text
+    if not items and printed_total is None:
+        return {'error': f"No line items found in receipt{' ' + image if image else ''}"}
+    total = printed_total if printed_total is not None else sum(amount for _, amount in items)
+    names = ', '.join(text for text, _ in items if text)
+    description = f"{merchant}: {names}" if merchant and names else merchant or names or 'Receipt'
+    return {'text': description[:MAX_DESCRIPTION], 'amount': round(total, 2), 'source': 'receipt', 'items': items,
+            'merchant': merchant, 'printed_total': printed_total, 'image': image or ''}
+
+@traced('parse')
+def parse_receipt_text(text, image=None):
+    # Split into lines/items
+    lines = []
+    for line in text.splitlines():
+        if line.strip():  # Skip empty
+            # Improved regex: Handles Rs.500.00, PKR 100, 2.50 FS, $5.99 N, etc.
+            amount_match = re.search(r'(Rs\.?|PKR|Rs|₹|\$)?\s*(\d+\.?\d*)\s*(FS|F|N)?$', line, re.IGNORECASE) or re.search(r'(\d+\.?\d*)\s*(Rs\.?|PKR|Rs|₹|\$)?', line, re.IGNORECASE)
+            amount = float(amount_match.group(1) or amount_match.group(2)) if amount_match else 0.0
+            desc = re.sub(r'(Rs\.?|PKR|Rs|₹|\$)?\s*\d+\.?\d*\s*(FS|F|N)?', '', line).strip()
+            lines.append((desc, amount, False))
+    return [build_receipt(lines, image)]
+
+@traced('parse')
 def parse_receipt_annotations(xml_file='annotations.xml'):
     try:
         tree = ET.parse(xml_file)
         root = tree.getroot()
-        transactions = []
+        receipts = []
         for image in root.findall('image'):
             image_name = image.get('name')  # e.g., images/0.jpg
+            lines = []
             for box in image.findall('box'):
                 if box.get('label') in ['item', 'total']:
                     text = box.find('attribute').text if box.find('attribute') is not None else ''
                     amount_match = re.search(r'(Rs\.?|PKR|Rs|₹|\$)?\s*(\d+\.?\d*)\s*(FS|F|N)?', text, re.IGNORECASE)
                     amount = float(amount_match.group(2)) if amount_match else 0.0
                     desc = re.sub(r'(Rs\.?|PKR|Rs|₹|\$)?\s*\d+\.?\d*\s*(FS|F|N)?', '', text).strip()
-                    transactions.append({'text': desc, 'amount': amount, 'source': 'receipt_annotation', 'image': image_name})
-        return transactions
+                    lines.append((desc, amount, box.get('label') == 'total'))
+            receipt = build_receipt(lines, image_name)
+            if 'error' not in receipt:  # Images without priced boxes
+                receipt['source'] = 'receipt_annotation'
+                receipts.append(receipt)
+        return receipts
     except Exception as e:
         return [{'error': f"Failed to parse annotations: {str(e)}"}]
 
+@traced('parse')
 def voice_input_simulation(voice_text):
     if not voice_text:
         return {'error': 'No voice input provided'}
@@ -67,6 +128,7 @@ def voice_input_simulation(voice_text):
     desc = re.sub(r'(Rs\.?|PKR|Rs|₹|\$)?\s*\d+\.?\d*', '', voice_text).strip()
     return {'text': desc, 'amount': amount, 'source': 'voice'}
 
+@traced('parse')
 def manual_input(text, amount_str):
     try:
         amount_match = re.search(r'(\d+\.?\d*)', amount_str)
@@ -75,6 +137,7 @@ def manual_input(text, amount_str):
     except ValueError:
         return {'error': 'Invalid amount for manual input'}
 
+@traced('parse')
 def sms_sync_simulation(sms_text):
     # Pakistan formats: HBL "A/c XX Debited Rs500.00 on 27-12-25 by UPI Txn ID:XXX Ref Grocery", Ufone "Rs.100 deducted for Transport"
     amount_match = re.search(r'(Rs\.?|PKR|Rs|₹)?\s*(\d+\.?\d*)', sms_text, re.IGNORECASE)
@@ -84,34 +147,39 @@ def sms_sync_simulation(sms_text):
     return {'text': desc, 'amount': amount, 'source': 'sms'}
 
 # Batch process and integrate with transaction management (categorize & return for DB save)
-def process_inputs(input_data):
+def parse_inputs(input_data):
+    """Raw transactions (text, amount, source) from one input, before categorization"""
     input_type = input_data.get('type')
     data = input_data.get('data')
     
     if input_type == 'receipt_image':
-        txs = parse_receipt_image(data)  # data = 'images/0.jpg'
+        return parse_receipt_image(data)  # data = 'images/0.jpg'
     elif input_type == 'receipt_annotation':
-        txs = parse_receipt_annotations(data)  # data = 'annotations.xml'
+        return parse_receipt_annotations(data)  # data = 'annotations.xml'
     elif input_type == 'voice':
-        txs = [voice_input_simulation(data)]
+        return [voice_input_simulation(data)]
     elif input_type == 'manual':
         text, amount_str = data.split('|') if '|' in data else (data, '0')
-        txs = [manual_input(text, amount_str)]
+        return [manual_input(text, amount_str)]
     elif input_type == 'sms':
-        txs = [sms_sync_simulation(data)]
-    else:
-        return [{'error': 'Invalid input type'}]
-    
+        return [sms_sync_simulation(data)]
+    return [{'error': 'Invalid input type'}]
+
+def categorize_inputs(txs):
     # Integrate with Module 3: Categorize each
     for tx in txs:
         if 'error' not in tx:
-            cat_result = categorize_expense(tx['text'], explain=True)
-            category_obj = get_or_create_category(cat_result['category'])
+            with span('categorize'):
+                cat_result = categorize_expense(tx['text'], explain=True)
+            with span('category_lookup'):
+                category_obj = get_or_create_category(cat_result['category'])
             tx['category_obj'] = category_obj  # Save object for DB
             tx['confidence'] = cat_result['confidence']
             tx['explanation'] = cat_result['explanation']
-    
     return txs
+
+def process_inputs(input_data):
+    return categorize_inputs(parse_inputs(input_data))
 '''
 # Example testing (run in code_execution if needed)
 example_inputs = {
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from ml.dataset import ML_DIR, get_dataset
+from ml.allocation_profile import ALLOCATION_CATEGORIES
+from core.metrics import MODEL_LOAD_SECONDS
+
+MODEL_FILE = os.path.join(ML_DIR, 'savings_prediction_model.h5')
+EXPORT_FILE = os.path.join(ML_DIR, 'savings_model.npz')
+EXPORT_VERSION = 1
+RECHECK_SECONDS = 60
+
+# Feature layout from the training notebook: scaled numericals, then one-hot
+# categoricals with the first (alphabetical) level dropped
+NUMERICAL_FEATURES = ['Income', 'Age', 'Dependents', 'Disposable_Income', 'Desired_Savings'] + ALLOCATION_CATEGORIES
+CATEGORICAL_FEATURES = {
+    'Occupation': ['Professional', 'Retired', 'Self_Employed', 'Student'],
+    'City_Tier': ['Tier_1', 'Tier_2', 'Tier_3'],
+}
+TARGETS = [f'Potential_Savings_{cat}' for cat in ALLOCATION_CATEGORIES]
+DENSE_LAYERS = ['dense', 'dense_1', 'dense_2', 'dense_3']
+
+_model = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class ModelUnavailable(RuntimeError):
+    """The model could not be loaded: no h5py, no .h5 or export, or a corrupt one"""
+
+
+def _source(model_file, data_file):
+    st = os.stat(model_file)
+    return {'model': [st.st_mtime_ns, st.st_size], 'data': os.path.basename(get_dataset(data_file).cache_dir)}
+
+
+def export_model(model_file=None, data_file=None, export_file=None):
+    """Convert the Keras .h5 weights (plus the training scaler) into a NumPy .npz.
+
+    Only h5py is needed, not TensorFlow. The scaler was fit on the whole
+    dataset before the train/test split, so it is recomputed from data.csv.
+    """
+    import h5py
+
+    model_file = model_file or MODEL_FILE
+    export_file = export_file or EXPORT_FILE
+    arrays = {}
+    with h5py.File(model_file, 'r') as f:
+        weights = f['model_weights']
+        for name in DENSE_LAYERS:
+            arrays[f'{name}_kernel'] = weights[name][name]['kernel'][()]
+            arrays[f'{name}_bias'] = weights[name][name]['bias'][()]
+        arrays['att_weight'] = weights['attention_layer']['attention_layer']['att_weight'][()]
+        arrays['att_bias'] = weights['attention_layer']['attention_layer']['att_bias'][()]
+
+    expected_inputs = len(NUMERICAL_FEATURES) + sum(len(levels) - 1 for levels in CATEGORICAL_FEATURES.values())
+    if arrays['dense_kernel'].shape[0] != expected_inputs or arrays['dense_3_kernel'].shape[1] != len(TARGETS):
+        raise ValueError(f"Unexpected model shape {arrays['dense_kernel'].shape} -> {arrays['dense_3_kernel'].shape}")
+
+    numerical = get_dataset(data_file).matrix(NUMERICAL_FEATURES)
+    arrays['mean'] = numerical.mean(axis=0)
+    scale = numerical.std(axis=0)
+    arrays['scale'] = np.where(scale > 0, scale, 1.0)  # Same zero-variance guard as StandardScaler
+
+    meta = {'version': EXPORT_VERSION, 'source': _source(model_file, data_file)}
+    tmp_path = f"{export_file}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, meta=json.dumps(meta), **arrays)
+    os.replace(tmp_path, export_file)
+    return SavingsModel(arrays, meta)
+
+
+class SavingsModel:
+    """The savings network as a pure-NumPy forward pass (inference only, so dropout is a no-op)"""
+
+    def __init__(self, arrays, meta=None):
+        self.meta = meta or {}
+        self.params = {name: np.asarray(value, dtype=np.float32) for name, value in arrays.items()}
+        self.mean = np.asarray(arrays['mean'], dtype=np.float64)
+        self.scale = np.asarray(arrays['scale'], dtype=np.float64)
+
+    @classmethod
+    def load(cls, export_file=None):
+        with np.load(export_file or EXPORT_FILE) as data:
+            meta = json.loads(str(data['meta']))
+            return cls({name: data[name] for name in data.files if name != 'meta'}, meta)
+
+    def features(self, records):
+        """(records, inputs) model inputs from dicts keyed like data.csv columns; missing numbers are 0"""
+        numerical = np.array([[float(r.get(name) or 0) for name in NUMERICAL_FEATURES] for r in records])
+        parts = [(numerical - self.mean) / self.scale]
+        for name, levels in CATEGORICAL_FEATURES.items():
+            values = np.array([str(r.get(name, levels[0])) for r in records])
+            parts.append((values[:, None] == np.array(levels[1:])[None, :]).astype(np.float64))
+        return np.hstack(parts).astype(np.float32)
+
+    def predict(self, X):
+        p = self.params
+        h = np.maximum(X @ p['dense_kernel'] + p['dense_bias'], 0)             # (batch, 128)
+        # AttentionLayer over the 128 units reshaped to (128, 1): scalar score per unit, softmax, weighted sum
+        scores = h * p['att_weight'][0, 0] + p['att_bias'][:, 0]
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        weights = scores / scores.sum(axis=1, keepdims=True)
+        attended = (h * weights).sum(axis=1, keepdims=True)                    # (batch, 1)
+        h = np.maximum(attended @ p['dense_1_kernel'] + p['dense_1_bias'], 0)
+        h = np.maximum(h @ p['dense_2_kernel'] + p['dense_2_bias'], 0)
+        return h @ p['dense_3_kernel'] + p['dense_3_bias']                     # (batch, 8)
+
+    def predict_records(self, records):
+        return self.predict(self.features(records))
+
+
+def get_model():
+    """Shared NumPy model, exported from the .h5 on first use or when the model/data change"""
+    global _model, _checked_at
+    now = time.monotonic()
+    if _model is not None and now - _checked_at < RECHECK_SECONDS:
+        return _model
+    with _lock:
+        try:
+            source = _source(MODEL_FILE, None)
+            if _model is None or _model.meta.get('source') != source:
+                with MODEL_LOAD_SECONDS.labels(model='savings').time():
+                    model = None
+                    if os.path.exists(EXPORT_FILE):
+                        model = SavingsModel.load()
+                        if model.meta.get('version') != EXPORT_VERSION or model.meta.get('source') != source:
+                            model = None
+                    _model = model or export_model()
+        except Exception as e:
+            raise ModelUnavailable(f"{type(e).__name__}: {e}") from e
+        _checked_at = now
+    return _model
+
+
+def predict_savings(records):
+    """Predicted monthly potential savings per category (and total) for each record, in one batch"""
+    if not records:
+        return []
+    predictions = np.maximum(get_model().predict_records(records), 0)  # Negative savings are noise
+    return [{'per_category': {cat: round(float(v), 2) for cat, v in zip(ALLOCATION_CATEGORIES, row)},
+             'total': round(float(row.sum()), 2)} for row in predictions]
+
+
+def load_keras_model(model_file=None):
+    """The original Keras model (imports TensorFlow); for checking the export and benchmarks"""
+    import tensorflow as tf
+
+    class AttentionLayer(tf.keras.layers.Layer):
+        def build(self, input_shape):
+            self.W = self.add_weight(name='att_weight', shape=(input_shape[-1], 1), initializer='normal')
+            self.b = self.add_weight(name='att_bias', shape=(input_shape[1], 1), initializer='zeros')
+            super().build(input_shape)
+
+        def call(self, x):
+            e = tf.squeeze(tf.matmul(x, self.W) + self.b, -1)
+            a = tf.expand_dims(tf.nn.softmax(e), -1)
+            return tf.reduce_sum(x * a, axis=1)
+
+    return tf.keras.models.load_model(model_file or MODEL_FILE, custom_objects={'AttentionLayer': AttentionLayer},
+                                      compile=False)
+
+
+# Export ahead of time (e.g. during deploy)
+if __name__ == "__main__":
+    start = time.perf_counter()
+    model = export_model()
+    print(f"Exported in {(time.perf_counter() - start) * 1000:.1f} ms -> {EXPORT_FILE}")
+    ds = get_dataset()
+    rows = [ds.row(i) for i in range(min(5, len(ds)))]
+    for row, prediction in zip(rows, predict_savings(rows)):
+        actual = sum(row.get(t, 0) for t in TARGETS)
+        print(f"predicted total {prediction['total']:10.2f}   dataset total {actual:10.2f}")